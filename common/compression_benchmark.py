@@ -0,0 +1,115 @@
+"""Бенчмарк CompressionMiddleware: байты на ответ и процессорное время на запрос.
+
+Ответ приложения - готовое JSON-тело списка (задачи, опросы, товары, посты
+из common/serialization_benchmark.py), middleware вызывается напрямую по
+ASGI, без сети. Режимы:
+- identity - клиент без Accept-Encoding (считается только ETag);
+- gzip/br - сжатие каждого ответа заново (кэш сжатых тел выключен);
+- gzip cached/br cached - то же тело повторно, сжатое берется из кэша;
+- 304 - клиент прислал If-None-Match с текущим ETag.
+Время - процессорное (time.process_time), вместе с потоками сжатия.
+
+Запуск из корня репозитория:
+    python -m common.compression_benchmark
+    python -m common.compression_benchmark --items 100 100000 --payloads products
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Optional, Tuple
+
+from common.compression import CompressionMiddleware, brotli
+from common.serialization import dumps
+from common.serialization_benchmark import PAYLOADS
+
+# Режим -> (Accept-Encoding, кэш сжатых тел включен, прислать If-None-Match)
+MODES = {
+    "identity": ("", False, False),
+    "gzip": ("gzip", False, False),
+    "gzip cached": ("gzip", True, False),
+    "br": ("br, gzip", False, False),
+    "br cached": ("br, gzip", True, False),
+    "304": ("br, gzip", True, True),
+}
+
+
+def json_app(body: bytes):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def request(middleware, accept_encoding: str, if_none_match: Optional[str]) -> Tuple[int, dict]:
+    """Один GET через middleware; возвращает (байт тела на проводе, заголовки ответа)."""
+    headers = [(b"accept-encoding", accept_encoding.encode())]
+    if if_none_match:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    scope = {"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    response_headers = {name.decode(): value.decode() for name, value in sent[0]["headers"]}
+    return sum(len(message.get("body", b"")) for message in sent[1:]), response_headers
+
+
+def measure(loop, middleware, accept_encoding: str, if_none_match: Optional[str], min_time: float) -> float:
+    """Среднее процессорное время запроса за min_time секунд (не меньше 3 запросов)."""
+    count = 0
+    started = time.process_time()
+    while True:
+        loop.run_until_complete(request(middleware, accept_encoding, if_none_match))
+        count += 1
+        elapsed = time.process_time() - started
+        if elapsed >= min_time and count >= 3:
+            return elapsed / count
+
+
+def run(payloads: List[str], sizes: List[int], min_time: float):
+    modes = [mode for mode in MODES if brotli is not None or not mode.startswith("br")]
+    if brotli is None:
+        print("пакет brotli не установлен - режимы br пропущены")
+    print(f"{'ответ':<10}{'элементов':>11}{'тело, КБ':>11}  " + "".join(f"{mode:>14}" for mode in modes))
+    loop = asyncio.new_event_loop()
+    for name in payloads:
+        _, make = PAYLOADS[name]
+        for size in sizes:
+            body = dumps(make(size, random.Random(0)))
+            wire, cpu = [], []
+            for mode in modes:
+                accept_encoding, cached, conditional = MODES[mode]
+                middleware = CompressionMiddleware(json_app(body), cache_bytes=64 * 1024 * 1024 if cached else 0)
+                # Первый запрос: ETag для If-None-Match и прогрев кэша сжатых тел
+                _, headers = loop.run_until_complete(request(middleware, accept_encoding, None))
+                if_none_match = headers["etag"] if conditional else None
+                sent, _ = loop.run_until_complete(request(middleware, accept_encoding, if_none_match))
+                wire.append(sent)
+                cpu.append(measure(loop, middleware, accept_encoding, if_none_match, min_time))
+            print(f"{name:<10}{size:>11,}{len(body) / 1024:>11.1f}  "
+                  + "".join(f"{sent / 1024:>11.1f} КБ" for sent in wire))
+            print(f"{'':<10}{'':>11}{'':>11}  " + "".join(f"{seconds * 1e3:>11.3f} мс" for seconds in cpu))
+    loop.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payloads", nargs="+", choices=list(PAYLOADS), default=list(PAYLOADS))
+    parser.add_argument("--items", nargs="+", type=int, default=[100, 10_000])
+    parser.add_argument("--min-time", type=float, default=0.3, help="сколько секунд повторять каждый замер")
+    args = parser.parse_args(argv)
+    run(args.payloads, args.items, args.min_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+# --- Стоимость scrypt (через переменные окружения) ---
+# N=2**14, r=8 - около 16 МБ памяти и десятков миллисекунд на один хэш
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+# Сколько хэшей считается одновременно; остальные запросы ждут своей очереди
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+
+PREFIX = "scrypt"
+
+
+class PasswordHasher:
+    """Хэширование паролей scrypt в отдельном пуле потоков.
+
+    hashlib.scrypt отпускает GIL, поэтому в пуле хэши считаются параллельно,
+    а цикл событий продолжает обслуживать другие запросы. Размер пула
+    ограничивает число одновременных вычислений (и память под них): всплеск
+    попыток входа ждет в очереди пула, а не занимает все ядра.
+
+    Формат хэша: scrypt$N$r$p$соль$хэш (соль и хэш в base64). Запись без
+    префикса считается старым паролем в открытом виде.
+    """
+
+    def __init__(self, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P, workers: int = HASH_WORKERS):
+        self.n, self.r, self.p = n, r, p
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._dummy_hash: Optional[str] = None
+
+    @property
+    def dummy_hash(self) -> str:
+        """Запись со случайными солью и хэшем: с ней сверяется пароль неизвестного
+        пользователя. Проверка стоит ровно один scrypt, а совпасть ей не с чем."""
+        if self._dummy_hash is None:
+            self._dummy_hash = "$".join([
+                PREFIX, str(self.n), str(self.r), str(self.p),
+                base64.b64encode(secrets.token_bytes(16)).decode(), base64.b64encode(secrets.token_bytes(64)).decode(),
+            ])
+        return self._dummy_hash
+
+    # --- Синхронные функции (для пула потоков и начального заполнения БД) ---
+    @staticmethod
+    def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p + 2 ** 20)
+
+    def hash_sync(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return "$".join([
+            PREFIX, str(self.n), str(self.r), str(self.p),
+            base64.b64encode(salt).decode(), base64.b64encode(digest).decode(),
+        ])
+
+    def verify_sync(self, stored: Optional[str], password: str) -> Tuple[bool, Optional[str]]:
+        """Проверяет пароль. Второе значение - новый хэш, если запись нужно обновить.
+
+        stored=None - пользователь не найден: scrypt все равно считается (по
+        фиктивному хэшу), чтобы по времени ответа нельзя было узнать, есть ли
+        такое имя.
+        """
+        if stored is None:
+            self.verify_sync(self.dummy_hash, password)
+            return False, None
+        if not stored.startswith(PREFIX + "$"):
+            # Старая запись в открытом виде: при успешном входе заменяем ее хэшем
+            if hmac.compare_digest(stored.encode(), password.encode()):
+                return True, self.hash_sync(password)
+            return False, None
+        try:
+            _, n, r, p, salt, digest = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            actual = self._derive(password, base64.b64decode(salt), n, r, p)
+            expected = base64.b64decode(digest)
+        except ValueError:
+            # Испорченная запись (binascii.Error - тоже ValueError): вход невозможен, но не 500
+            return False, None
+        if not hmac.compare_digest(actual, expected):
+            return False, None
+        if (n, r, p) != (self.n, self.r, self.p):
+            # Стоимость изменили в настройках - пересчитываем хэш с новыми параметрами
+            return True, self.hash_sync(password)
+        return True, None
+
+    # --- Асинхронные обертки для обработчиков FastAPI ---
+    async def hash(self, password: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.hash_sync, password)
+
+    async def verify(self, stored: Optional[str], password: str) -> Tuple[bool, Optional[str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.verify_sync, stored, password)
+
+
+# Общий экземпляр для бэкендов
+password_hasher = PasswordHasher()
@@ -0,0 +1,350 @@
+"""Нагрузочные тесты всех бэкендов: пропускная способность и задержки p50/p95/p99.
+
+Запуск из корня репозитория:
+    python -m common.loadtest list
+    python -m common.loadtest run --output results.json
+    python -m common.loadtest run --apps blog products --mode uvicorn --baseline results.json
+    python -m common.loadtest run --apps todo --env TODO_STORAGE=sqlite
+
+Каждый бэкенд запускается в отдельном процессе во временной копии своей папки
+backend, так что файлы данных в репозитории не меняются. Приложение работает
+либо в том же процессе через ASGI-транспорт httpx (--mode asgi, без сети),
+либо под настоящим uvicorn (--mode uvicorn). Запросы к OpenWeatherMap уходят
+на локальный мок (common/mock_weather.py). Сценарии - в common/workloads.py.
+
+Результат - JSON (--output); с --baseline результаты сравниваются с прошлым
+прогоном: при просадке больше --tolerance, росте доли ошибок или упавшем
+(пропавшем) сценарии команда завершается с кодом 1.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from common.mock_weather import MockWeatherServer
+from common.workloads import WORKLOADS, Scenario, Workload
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Файлы состояния, которые не копируются в рабочую копию: каждый прогон начинается с нуля
+STATE_FILES = ("__pycache__", "*.db", "*.db-wal", "*.db-shm", "*.journal", "polls.json", "data", "static", ".env")
+
+
+# --- Статистика ---
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль q (0..100) методом ближайшего ранга."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, state: dict,
+                       requests: int, concurrency: int, warmup: int) -> dict:
+    """requests запросов сценария, concurrency одновременных клиентов."""
+    for i in range(warmup):
+        try:
+            await scenario.request(client, state, i)
+        except httpx.HTTPError:
+            pass
+    latencies: List[float] = []
+    errors = 0
+    numbers = itertools.count(warmup)
+    end = warmup + requests
+
+    async def user():
+        nonlocal errors
+        for i in numbers:
+            if i >= end:
+                return
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, state, i)
+                ok = response.status_code in scenario.expect
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+# --- Запуск приложения ---
+@asynccontextmanager
+async def asgi_lifespan(app):
+    """Прогоняет startup/shutdown приложения: ASGITransport из httpx их не отправляет."""
+    inbox: asyncio.Queue = asyncio.Queue()
+    outbox: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, inbox.get, outbox.put))
+    await inbox.put({"type": "lifespan.startup"})
+    message = await outbox.get()
+    if message["type"] == "lifespan.startup.failed":
+        raise RuntimeError(f"Приложение не запустилось: {message.get('message')}")
+    try:
+        yield
+    finally:
+        await inbox.put({"type": "lifespan.shutdown"})
+        await outbox.get()
+        await task
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def app_client(mode: str, concurrency: int):
+    """httpx-клиент к приложению main:app из текущей папки."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if mode == "asgi":
+        sys.path.insert(0, os.getcwd())
+        import main
+        async with asgi_lifespan(main.app):
+            # Исключение в приложении - это ответ 500 и ошибка сценария, а не падение прогона
+            transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+                yield client
+        return
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+            deadline = time.monotonic() + 120
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn завершился с кодом {server.returncode}")
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn не начал принимать запросы за 120 с")
+                    await asyncio.sleep(0.1)
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def run_workload(workload: Workload, mode: str, requests: int, concurrency: int, warmup: int) -> Dict[str, dict]:
+    async with app_client(mode, concurrency) as client:
+        state = await workload.setup(client) if workload.setup else {}
+        return {
+            scenario.name: await run_scenario(client, scenario, state, requests, concurrency, warmup)
+            for scenario in workload.scenarios
+        }
+
+
+def worker(args):
+    """Процесс одного бэкенда: текущая папка - его рабочая копия."""
+    results = asyncio.run(run_workload(WORKLOADS[args.app], args.mode, args.requests, args.concurrency, args.warmup))
+    Path(args.output).write_text(json.dumps(results), encoding="utf-8")
+
+
+def run_backend(name: str, args, extra_env: Dict[str, str], mock: Optional[MockWeatherServer]) -> dict:
+    """Копирует бэкенд во временную папку и гоняет его сценарии в отдельном процессе."""
+    workload = WORKLOADS[name]
+    with tempfile.TemporaryDirectory(prefix=f"loadtest-{name}-") as tmp:
+        # Та же глубина вложенности, что в репозитории: <проект>/backend
+        workdir = Path(tmp) / workload.backend / "backend"
+        shutil.copytree(REPO_ROOT / workload.backend / "backend", workdir, ignore=shutil.ignore_patterns(*STATE_FILES))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+        env.update(workload.env)
+        if workload.prepare:
+            env.update(workload.prepare(workdir))
+        if workload.mock_weather:
+            env["OPENWEATHER_BASE_URL"] = mock.base_url
+        env.update(extra_env)
+        output = Path(tmp) / "result.json"
+        command = [
+            sys.executable, "-m", "common.loadtest", "worker", "--app", name, "--mode", args.mode,
+            "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+            "--warmup", str(args.warmup), "--output", str(output),
+        ]
+        completed = subprocess.run(command, cwd=workdir, env=env)
+        if completed.returncode != 0:
+            return {"error": f"процесс завершился с кодом {completed.returncode}"}
+        return json.loads(output.read_text(encoding="utf-8"))
+
+
+# --- Сравнение с прошлым прогоном ---
+def error_rate(stats: dict) -> float:
+    return stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+
+
+def compare(report: dict, baseline: dict, tolerance: float, apps: List[str]) -> List[str]:
+    """Печатает изменения относительно baseline и возвращает список просадок.
+
+    Просадка - падение пропускной способности или рост p95 больше tolerance,
+    любой рост доли ошибок, а также сценарий из baseline, который в этом
+    прогоне упал или пропал. Бэкенды baseline, не выбранные в apps, пропускаются.
+    """
+    regressions = []
+    print(f"\nСравнение с базовым прогоном (допуск {tolerance:.0%}):")
+    print(f"  {'сценарий':28} {'запр/с было':>12} {'стало':>10} {'Δ':>7} {'p95 мс было':>12} {'стало':>9} {'Δ':>7}"
+          f" {'ошибок было':>12} {'стало':>7}")
+    baseline_results = baseline.get("results", {})
+    for app in list(report["results"]) + [app for app in baseline_results if app not in report["results"]]:
+        before_scenarios = baseline_results.get(app, {})
+        if app not in report["results"]:
+            if app in WORKLOADS and app not in apps:
+                continue
+            regressions.append(app)
+            print(f"  {app:28} нет в этом прогоне  <- просадка")
+            continue
+        scenarios = report["results"][app]
+        if "error" in scenarios:
+            flag = ""
+            if "error" not in before_scenarios:
+                regressions.append(app)
+                flag = "  <- просадка"
+            print(f"  {app:28} ошибка: {scenarios['error']}{flag}")
+            continue
+        for scenario in list(scenarios) + [name for name in before_scenarios if name not in scenarios]:
+            label = f"{app}/{scenario}"
+            stats = scenarios.get(scenario)
+            before = before_scenarios.get(scenario)
+            if not isinstance(before, dict) or "throughput" not in before:
+                continue  # новый сценарий или бэкенд, упавший в baseline: сравнивать не с чем
+            if stats is None:
+                regressions.append(label)
+                print(f"  {label:28} нет в этом прогоне  <- просадка")
+                continue
+            throughput_change = stats["throughput"] / before["throughput"] - 1 if before["throughput"] else 0.0
+            p95_before = before["latency_ms"]["p95"]
+            p95_change = stats["latency_ms"]["p95"] / p95_before - 1 if p95_before else 0.0
+            flag = ""
+            if throughput_change < -tolerance or p95_change > tolerance or error_rate(stats) > error_rate(before):
+                regressions.append(label)
+                flag = "  <- просадка"
+            print(f"  {label:28} {before['throughput']:12,.0f} {stats['throughput']:10,.0f} {throughput_change:+7.0%}"
+                  f" {p95_before:12.2f} {stats['latency_ms']['p95']:9.2f} {p95_change:+7.0%}"
+                  f" {before['errors']:12} {stats['errors']:7}{flag}")
+    return regressions
+
+
+def print_results(report: dict):
+    print(f"  {'сценарий':28} {'запр/с':>10} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'ошибок':>7}")
+    for app, scenarios in report["results"].items():
+        if "error" in scenarios:
+            print(f"  {app:28} ошибка: {scenarios['error']}")
+            continue
+        for scenario, stats in scenarios.items():
+            latency = stats["latency_ms"]
+            print(f"  {app + '/' + scenario:28} {stats['throughput']:10,.0f} {latency['p50']:8.2f}"
+                  f" {latency['p95']:8.2f} {latency['p99']:8.2f} {stats['errors']:7}")
+
+
+def run(args) -> int:
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    names = args.apps or list(WORKLOADS)
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "env": extra_env,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": {},
+    }
+    with MockWeatherServer(args.upstream_latency) as mock:
+        for name in names:
+            print(f"{name}: {WORKLOADS[name].backend} ({args.mode})", flush=True)
+            report["results"][name] = run_backend(name, args, extra_env, mock)
+    print_results(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    failed = any("error" in scenarios for scenarios in report["results"].values())
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance, names)
+        if regressions:
+            print(f"Просадки: {', '.join(regressions)}")
+            failed = True
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="бэкенды и их сценарии")
+
+    run_parser = sub.add_parser("run", help="прогнать сценарии и вывести результаты")
+    run_parser.add_argument("--apps", nargs="+", choices=list(WORKLOADS), help="какие бэкенды (по умолчанию все)")
+    run_parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    run_parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="одновременных клиентов")
+    run_parser.add_argument("--warmup", type=int, default=50, help="запросов прогрева (не учитываются)")
+    run_parser.add_argument("--upstream-latency", type=float, default=0.0, help="задержка мока OpenWeatherMap, секунд")
+    run_parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="переменные окружения бэкендов")
+    run_parser.add_argument("--output", help="куда записать JSON с результатами")
+    run_parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    run_parser.add_argument("--tolerance", type=float, default=0.15, help="допустимая просадка (0.15 = 15%%)")
+
+    worker_parser = sub.add_parser("worker", help="служебная: один бэкенд в текущей папке")
+    worker_parser.add_argument("--app", choices=list(WORKLOADS), required=True)
+    worker_parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    worker_parser.add_argument("--requests", type=int, default=2000)
+    worker_parser.add_argument("--concurrency", type=int, default=16)
+    worker_parser.add_argument("--warmup", type=int, default=50)
+    worker_parser.add_argument("--output", required=True)
+
+    args = parser.parse_args()
+    if args.command == "list":
+        for name, workload in WORKLOADS.items():
+            print(f"{name:10} {workload.backend:28} {', '.join(scenario.name for scenario in workload.scenarios)}")
+    elif args.command == "run":
+        sys.exit(run(args))
+    elif args.command == "worker":
+        worker(args)
+
+
+if __name__ == "__main__":
+    main()
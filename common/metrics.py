@@ -0,0 +1,340 @@
+import bisect
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+# --- Границы корзин гистограмм ---
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Эндпоинты профилировщика открыты только с этим токеном (заголовок X-Profiler-Token)
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+PROFILER_INTERVAL = 0.005  # секунд между снимками стеков по умолчанию
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Гистограмма в стиле Prometheus: счетчики по корзинам, сумма и число наблюдений."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escape = lambda value: value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """Метрики процесса: гистограммы и счетчики по наборам меток, вывод в формате Prometheus.
+
+    Наблюдения приходят и из цикла событий, и из пула потоков (синхронные
+    эндпоинты, запросы к БД), поэтому обновление идет под одним локом.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}  # имя -> (тип, описание)
+        self._buckets: Dict[str, Sequence[float]] = {}
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self._help[name] = ("histogram", description)
+        self._buckets[name] = buckets
+        self._histograms.setdefault(name, {})
+
+    def gauge(self, name: str, description: str):
+        self._help[name] = ("gauge", description)
+        self._gauges.setdefault(name, {(): 0})
+
+    def observe(self, name: str, value: float, labels: Labels = ()):
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self._buckets[name])
+            histogram.observe(value)
+
+    def add(self, name: str, delta: float, labels: Labels = ()):
+        with self._lock:
+            series = self._gauges[name]
+            series[labels] = series.get(labels, 0) + delta
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, description) in self._help.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "gauge":
+                    for labels, value in self._gauges[name].items():
+                        lines.append(f"{name}{format_labels(labels)} {value:g}")
+                    continue
+                for labels, histogram in self._histograms[name].items():
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Общий реестр процесса (у каждого воркера uvicorn - свой)
+REGISTRY = MetricsRegistry()
+REGISTRY.histogram("http_request_duration_seconds", "Время обработки запроса по маршруту")
+REGISTRY.histogram("http_response_size_bytes", "Размер тела ответа по маршруту", SIZE_BUCKETS)
+REGISTRY.gauge("http_requests_in_flight", "Запросы, которые обрабатываются прямо сейчас")
+REGISTRY.histogram("storage_operation_duration_seconds", "Время операций хранилища: БД, файлы, внешние API")
+
+
+@contextmanager
+def timed(backend: str, operation: str, registry: MetricsRegistry = REGISTRY) -> Iterator[None]:
+    """Замеряет время блока как операцию хранилища: with timed("file", "read"): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe("storage_operation_duration_seconds", time.perf_counter() - started,
+                         (("backend", backend), ("operation", operation)))
+
+
+def sql_operation(statement: str) -> str:
+    """Первое слово SQL-запроса (SELECT, INSERT, BEGIN...) - метка operation."""
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+
+
+class TimedConnection(sqlite3.Connection):
+    """Соединение sqlite3, которое замеряет каждый запрос: sqlite3.connect(..., factory=TimedConnection).
+
+    Как и в instrument_sqlalchemy, операция - первое слово запроса; время
+    ожидания блокировки попадает в BEGIN/COMMIT транзакции. Строки, которые
+    читаются после execute (fetchall), в замер не входят. Запрос к SQLite
+    длится единицы микросекунд, поэтому замер сделан без timed(): метки
+    кэшируются по тексту запроса (в хранилищах он постоянный).
+    """
+
+    _labels: Dict[str, Labels] = {}
+
+    def _observe(self, sql: str, started: float):
+        elapsed = time.perf_counter() - started
+        labels = self._labels.get(sql)
+        if labels is None:
+            labels = (("backend", "sqlite"), ("operation", sql_operation(sql)))
+            if len(self._labels) < 1000:
+                self._labels[sql] = labels
+        REGISTRY.observe("storage_operation_duration_seconds", elapsed, labels)
+
+    def execute(self, sql: str, parameters=(), /) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, started)
+
+    def executemany(self, sql: str, parameters, /) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self._observe(sql, started)
+
+    def executescript(self, sql_script: str, /) -> sqlite3.Cursor:
+        with timed("sqlite", "SCRIPT"):
+            return super().executescript(sql_script)
+
+
+def instrument_sqlalchemy(engine, registry: MetricsRegistry = REGISTRY):
+    """Замеряет каждый SQL-запрос движка SQLAlchemy; операция - первое слово запроса (SELECT, INSERT...)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        registry.observe("storage_operation_duration_seconds", elapsed,
+                         (("backend", engine.dialect.name), ("operation", sql_operation(statement))))
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время, размер ответа и число одновременных HTTP-запросов по маршруту.
+
+    Маршрут берется из шаблона пути FastAPI ("/api/posts/{slug}"), а не из
+    самого URL, чтобы число рядов метрик не росло с числом разных ссылок.
+    Запросы, не попавшие ни в один маршрут (404, статика), идут под "unmatched".
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        registry = self.registry
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        registry.add("http_requests_in_flight", 1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.add("http_requests_in_flight", -1)
+            route = scope.get("route")
+            labels = (
+                ("method", scope["method"]),
+                ("route", getattr(route, "path", "unmatched")),
+                ("status", str(status_code)),
+            )
+            registry.observe("http_request_duration_seconds", elapsed, labels)
+            registry.observe("http_response_size_bytes", size, labels[:2])
+
+
+# --- Профилировщик ---
+class SamplingProfiler:
+    """Семплирующий профилировщик: фоновый поток раз в interval секунд снимает
+    стеки всех потоков процесса и считает одинаковые стеки.
+
+    Результат - "свернутые" стеки (одна строка на стек: функции через ";"
+    и число снимков), их понимают flamegraph.pl и speedscope. Пока
+    профилировщик выключен, он ничего не стоит.
+    """
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+        self.interval = PROFILER_INTERVAL
+        self.started_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # samples читают эндпоинты, пока поток их пополняет
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float = PROFILER_INTERVAL) -> bool:
+        if self.running:
+            return False
+        self.samples = Counter()
+        self.interval = interval
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> bool:
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return True
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        with self._lock:
+            top = self.samples.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in top)
+
+    def status(self) -> dict:
+        with self._lock:
+            samples = sum(self.samples.values())
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "started_at": self.started_at,
+            "samples": samples,
+        }
+
+
+profiler = SamplingProfiler()
+
+
+def profiler_access(x_profiler_token: Optional[str] = Header(None)):
+    """Пропускает только запросы с верным X-Profiler-Token (без PROFILER_TOKEN эндпоинты закрыты)."""
+    # Сравниваем байты: compare_digest на строках с не-ASCII символами бросает TypeError
+    if (not PROFILER_TOKEN or not x_profiler_token
+            or not secrets.compare_digest(x_profiler_token.encode(), PROFILER_TOKEN.encode())):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Доступ запрещен")
+
+
+def install_metrics(app: FastAPI, registry: MetricsRegistry = REGISTRY):
+    """Подключает к приложению MetricsMiddleware, /metrics и эндпоинты профилировщика."""
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/debug/profiler", include_in_schema=False, dependencies=[Depends(profiler_access)])
+    async def profiler_status(limit: Optional[int] = Query(None, ge=1)):
+        """Состояние профилировщика и стеки, собранные к этому моменту."""
+        return {**profiler.status(), "collapsed": profiler.collapsed(limit)}
+
+    @app.post("/debug/profiler/start", include_in_schema=False, dependencies=[Depends(profiler_access)])
+    async def profiler_start(interval: float = Query(PROFILER_INTERVAL, ge=0.001, le=1.0)):
+        if not profiler.start(interval):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Профилировщик уже запущен")
+        return profiler.status()
+
+    @app.post("/debug/profiler/stop", include_in_schema=False, dependencies=[Depends(profiler_access)])
+    def profiler_stop():
+        """Останавливает профилировщик и возвращает свернутые стеки (text/plain).
+
+        Обычная функция: FastAPI вызовет ее в пуле потоков, и ожидание потока
+        профилировщика (join) не блокирует цикл событий.
+        """
+        if not profiler.stop():
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Профилировщик не запущен")
+        return PlainTextResponse(profiler.collapsed())
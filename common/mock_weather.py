@@ -0,0 +1,110 @@
+"""Локальный мок OpenWeatherMap для нагрузочных тестов погодного бэкенда.
+
+Отдает правдоподобные ответы /weather и /forecast без обращения в интернет,
+с необязательной искусственной задержкой (как у настоящего API).
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+UNKNOWN_CITY = "nowhere"  # город, для которого мок отвечает 404
+
+
+def weather_payload(city: str) -> dict:
+    return {
+        "name": city,
+        "main": {"temp": 21.5, "feels_like": 20.9, "humidity": 40},
+        "weather": [{"description": "ясно", "icon": "01d"}],
+    }
+
+
+def forecast_payload(city: str) -> dict:
+    start = datetime(2025, 7, 1)
+    return {
+        "city": {"name": city},
+        "list": [
+            {
+                "dt_txt": (start + timedelta(hours=3 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+                "main": {"temp": 15 + i % 8},
+                "weather": [{"description": "облачно", "icon": "03d"}],
+            }
+            for i in range(40)  # 5 дней с шагом 3 часа, как у OpenWeatherMap
+        ],
+    }
+
+
+class MockWeatherServer:
+    """HTTP-сервер мока в фоновом потоке; адрес для OPENWEATHER_BASE_URL - base_url."""
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                url = urlparse(self.path)
+                city = parse_qs(url.query).get("q", ["Москва"])[0]
+                if url.path.endswith("/weather"):
+                    status, payload = 200, weather_payload(city)
+                elif url.path.endswith("/forecast"):
+                    status, payload = 200, forecast_payload(city)
+                else:
+                    status, payload = 404, {"message": "not found"}
+                if city.lower() == UNKNOWN_CITY:
+                    status, payload = 404, {"cod": "404", "message": "city not found"}
+                if server.latency:
+                    time.sleep(server.latency)
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/data/2.5"
+
+    def start(self) -> "MockWeatherServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, секунд")
+    args = parser.parse_args()
+    mock = MockWeatherServer(args.latency, port=args.port).start()
+    print(f"OPENWEATHER_BASE_URL={mock.base_url}")
+    try:
+        mock._thread.join()
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,117 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from starlette.formparsers import MultiPartException
+
+# --- Лимиты попыток входа по умолчанию: (попыток, окно в секундах) ---
+LOGIN_LIMIT_PER_USERNAME = (5, 60)
+LOGIN_LIMIT_PER_IP = (20, 60)
+MAX_TRACKED_KEYS = 1_000_000  # сколько ключей помнить; самые давние вытесняются (LRU)
+
+# Упаковка записи в одно целое: номер окна | счетчик прошлого окна | счетчик текущего
+_COUNT_BITS = 20
+_COUNT_MASK = (1 << _COUNT_BITS) - 1
+
+
+class SlidingWindowLimiter:
+    """Ограничитель частоты по ключу со скользящим окном на двух счетчиках.
+
+    Для ключа хранятся только номер текущего окна и число запросов в текущем
+    и прошлом окне - все упаковано в одно целое. Число запросов за последние
+    window секунд оценивается как prev * (доля прошлого окна) + curr.
+    Ключи лежат в OrderedDict в порядке последнего обращения; при превышении
+    max_keys вытесняется самый давний, так что память ограничена.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = MAX_TRACKED_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """Учитывает запрос. Возвращает 0, если он разрешен, иначе - сколько секунд подождать."""
+        if now is None:
+            now = time.monotonic()
+        window_index = int(now // self.window)
+        entry = self._entries.get(key)
+        prev = curr = 0
+        if entry is not None:
+            self._entries.move_to_end(key)
+            entry_index = entry >> (2 * _COUNT_BITS)
+            if entry_index == window_index:
+                prev, curr = (entry >> _COUNT_BITS) & _COUNT_MASK, entry & _COUNT_MASK
+            elif entry_index == window_index - 1:
+                prev = entry & _COUNT_MASK
+
+        elapsed = now - window_index * self.window
+        weight = 1 - elapsed / self.window
+        if prev * weight + curr >= self.limit:
+            self._entries[key] = (window_index << (2 * _COUNT_BITS)) | (prev << _COUNT_BITS) | curr
+            if curr >= self.limit:
+                return self.window - elapsed
+            # Ждем, пока вклад прошлого окна уменьшится настолько, чтобы освободилось место
+            return max(self.window * (1 - (self.limit - curr) / prev) - elapsed, 0.001)
+
+        curr = min(curr + 1, _COUNT_MASK)
+        self._entries[key] = (window_index << (2 * _COUNT_BITS)) | (prev << _COUNT_BITS) | curr
+        if entry is None and len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        return 0.0
+
+
+async def _login_username(request: Request) -> Optional[str]:
+    """Имя пользователя из тела запроса на вход (форма OAuth2 или JSON).
+
+    Нечитаемое тело дает None: попытка учитывается только лимитом по IP, а
+    ошибку формата вернет сам обработчик (422), а не 500 отсюда.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            data = await request.json()
+        else:
+            data = await request.form()
+    except (ValueError, MultiPartException, HTTPException):
+        # JSONDecodeError и UnicodeDecodeError - подклассы ValueError;
+        # битую multipart-форму Starlette отдает как HTTPException(400)
+        return None
+    username = data.get("username") if hasattr(data, "get") else None
+    return username if isinstance(username, str) else None
+
+
+class LoginThrottle:
+    """Зависимость FastAPI: ограничивает попытки входа по IP клиента и по имени пользователя.
+
+    Подключается к эндпоинту входа: dependencies=[Depends(login_throttle)].
+    Лишние попытки получают 429 до того, как обработчик начнет считать хэш
+    пароля или обращаться к базе. Тело запроса Starlette кэширует, поэтому
+    обработчик читает его как обычно.
+    """
+
+    def __init__(self, per_username=LOGIN_LIMIT_PER_USERNAME, per_ip=LOGIN_LIMIT_PER_IP,
+                 max_keys: int = MAX_TRACKED_KEYS):
+        self.by_username = SlidingWindowLimiter(*per_username, max_keys=max_keys)
+        self.by_ip = SlidingWindowLimiter(*per_ip, max_keys=max_keys)
+
+    def check(self, username: Optional[str], ip: str) -> float:
+        """0 - попытка разрешена, иначе через сколько секунд можно повторить."""
+        retry_after = self.by_ip.hit(ip)
+        if retry_after == 0 and username:
+            retry_after = self.by_username.hit(username)
+        return retry_after
+
+    async def __call__(self, request: Request):
+        ip = request.client.host if request.client else "unknown"
+        retry_after = self.check(await _login_username(request), ip)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много попыток входа, попробуйте позже",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
@@ -0,0 +1,70 @@
+"""Быстрая отдача JSON: orjson и ответы без повторной проверки response_model.
+
+Если обработчик возвращает словари или модели, FastAPI прогоняет каждый
+элемент через response_model (проверка + сериализация) на каждом запросе.
+Для больших списков, которые и так собраны из проверенных данных, это
+основная часть времени ответа. Обработчик может вернуть FastJSONResponse:
+FastAPI отдаст готовый Response как есть, а response_model останется только
+для документации (/docs).
+"""
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def _default(value: Any):
+    # orjson сам сериализует dict/list/str/числа/datetime/UUID/dataclass, модели - нет
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    # OPT_UTC_Z: время в UTC с "Z" на конце, как его пишет pydantic
+    return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+class FastJSONResponse(Response):
+    """JSON-ответ через orjson; content может быть и уже готовыми байтами."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class SerializedCache:
+    """Последний сериализованный ответ для коллекции и ее версия.
+
+    Пока версия коллекции не изменилась, ответ отдается готовыми байтами без
+    сборки словарей и сериализации. Версия - любой счетчик изменений
+    хранилища (номер последнего изменения, версия каталога). Ее нужно
+    прочитать до сборки данных: тогда данные не старше версии, под которой
+    они сохранены.
+    """
+
+    def __init__(self):
+        self._entry: Optional[Tuple[Hashable, bytes]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: Hashable, build: Callable[[], Any]) -> bytes:
+        """Байты ответа для версии version; build() вызывается только при промахе."""
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        body = dumps(build())
+        # Одно присваивание кортежа: читатель видит либо старую, либо новую пару.
+        # Если параллельный запрос положит ответ другой версии, это будет лишь
+        # промахом при следующем запросе - байты всегда соответствуют своей версии
+        self._entry = (version, body)
+        return body
+
+    def response(self, version: Hashable, build: Callable[[], Any]) -> FastJSONResponse:
+        return FastJSONResponse(self.get(version, build))
@@ -0,0 +1,174 @@
+"""Микробенчмарк сериализации больших списков: response_model против FastJSONResponse.
+
+Для каждого вида ответа (задачи, опросы, товары, посты) считается время
+ответа тремя способами:
+- response_model - как FastAPI отдает возвращенные словари: проверка через
+  модель ответа и сериализация pydantic;
+- orjson - FastJSONResponse: сразу orjson, без проверки;
+- cached - SerializedCache при неизменной версии коллекции: готовые байты.
+Заодно проверяется, что все способы дают одинаковый JSON.
+
+Запуск из корня репозитория:
+    python -m common.serialization_benchmark
+    python -m common.serialization_benchmark --items 1000 100000 --payloads products posts
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import BaseModel
+
+from common.serialization import FastJSONResponse, SerializedCache
+
+
+# --- Модели ответов в том виде, как они объявлены в бэкендах ---
+class TodoItem(BaseModel):
+    id: str
+    task: str
+    completed: bool = False
+
+
+class PollResponse(BaseModel):
+    id: str
+    question: str
+    options: Dict[str, Dict[str, int | str]]
+    created_at: str
+    version: int = 0
+
+
+class Product(BaseModel):
+    id: int
+    name: str
+    category: str
+    price: float
+
+
+class PostRead(BaseModel):
+    id: int
+    text: str
+    timestamp: datetime
+    owner_id: int
+    owner_username: str
+    likes_count: int
+    liked_by_me: bool = False
+
+
+WORDS = ["fastapi", "python", "next", "react", "база", "данных", "кэш", "индекс", "поиск", "сервер"]
+
+
+def make_todos(count: int, rng: random.Random) -> List[dict]:
+    return [
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "task": " ".join(rng.choices(WORDS, k=4)),
+         "completed": rng.random() < 0.3}
+        for _ in range(count)
+    ]
+
+
+def make_polls(count: int, rng: random.Random) -> Dict[str, dict]:
+    polls = {}
+    for i in range(count):
+        poll_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        polls[poll_id] = {
+            "id": poll_id,
+            "question": f"Вопрос {i}: {' '.join(rng.choices(WORDS, k=3))}?",
+            "options": {f"option_{j}": {"label": rng.choice(WORDS), "votes": rng.randrange(10_000)} for j in range(4)},
+            "created_at": (datetime(2025, 1, 1) + timedelta(minutes=i)).isoformat(),
+            "version": i + 1,
+        }
+    return polls
+
+
+def make_products(count: int, rng: random.Random) -> List[dict]:
+    return [
+        {"id": i + 1, "name": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rng.randrange(1000)}",
+         "category": rng.choice(["Электроника", "Одежда", "Книги", "Дом", "Спорт"]),
+         "price": rng.randrange(100, 200000) / 100}
+        for i in range(count)
+    ]
+
+
+def make_posts(count: int, rng: random.Random) -> List[dict]:
+    # Время из SQLite приходит без часового пояса, как в ленте микроблога
+    start = datetime(2025, 7, 1, 12, 0, 0, 123456)
+    return [
+        {"id": i + 1, "text": " ".join(rng.choices(WORDS, k=rng.randrange(5, 40))),
+         "timestamp": start - timedelta(seconds=37 * i), "owner_id": 1 + i % 2,
+         "owner_username": f"user{1 + i % 2}", "likes_count": rng.randrange(50), "liked_by_me": i % 3 == 0}
+        for i in range(count)
+    ]
+
+
+# Вид ответа -> (модель ответа эндпоинта, генератор данных)
+PAYLOADS: Dict[str, tuple] = {
+    "todos": (List[TodoItem], make_todos),          # GET /api/todos
+    "polls": (Dict[str, PollResponse], make_polls),  # GET /api/polls
+    "products": (List[Product], make_products),     # GET /api/products
+    "posts": (List[PostRead], make_posts),          # GET /api/posts
+}
+
+
+def measure(function: Callable[[], bytes], min_time: float = 0.5) -> float:
+    """Лучшее время одного вызова из повторов в течение min_time секунд."""
+    best = float("inf")
+    deadline = time.perf_counter() + min_time
+    while True:
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        if started + elapsed >= deadline:
+            return best
+
+
+def run(payloads: List[str], sizes: List[int], min_time: float):
+    print("response_model и orjson - мкс на элемент; cached - мкс на весь ответ")
+    print(f"{'ответ':<10}{'элементов':>11}{'response_model':>16}{'orjson':>10}{'ускорение':>11}{'cached':>10}")
+    for name in payloads:
+        response_model, make = PAYLOADS[name]
+        # Так FastAPI создает поле ответа для response_model эндпоинта
+        field = create_model_field(name=f"Response_{name}", type_=response_model, mode="serialization")
+        for size in sizes:
+            content = make(size, random.Random(0))
+            loop = asyncio.new_event_loop()
+
+            def with_response_model() -> bytes:
+                return loop.run_until_complete(
+                    serialize_response(field=field, response_content=content, dump_json=True)
+                )
+
+            def with_orjson() -> bytes:
+                return FastJSONResponse(content).body
+
+            cache = SerializedCache()
+            cache.get(1, lambda: content)
+
+            def cached() -> bytes:
+                return cache.response(1, lambda: content).body
+
+            bodies = [with_response_model(), with_orjson(), cached()]
+            if not all(json.loads(body) == json.loads(bodies[0]) for body in bodies[1:]):
+                raise AssertionError(f"{name}: JSON отличается от response_model")
+            times = [measure(function, min_time) for function in (with_response_model, with_orjson, cached)]
+            loop.close()
+            print(f"{name:<10}{size:>11,}{times[0] / size * 1e6:>16.3f}{times[1] / size * 1e6:>10.3f}"
+                  f"{times[0] / times[1]:>10.1f}x{times[2] * 1e6:>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payloads", nargs="+", choices=list(PAYLOADS), default=list(PAYLOADS))
+    parser.add_argument("--items", nargs="+", type=int, default=[100, 10_000])
+    parser.add_argument("--min-time", type=float, default=0.5, help="сколько секунд повторять каждый замер")
+    args = parser.parse_args(argv)
+    run(args.payloads, args.items, args.min_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Сценарии нагрузки для каждого бэкенда (запускаются из common/loadtest.py).
+
+У каждого бэкенда есть подготовка данных через его же API (setup) и набор
+сценариев - функций, которые делают i-й запрос. prepare, если задан,
+выполняется до старта приложения в его рабочей копии и возвращает
+переменные окружения (например, файл с большим каталогом товаров).
+"""
+import asyncio
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+Request = Callable[[httpx.AsyncClient, dict, int], Awaitable[httpx.Response]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    request: Request
+    expect: Tuple[int, ...] = (200,)  # статусы, которые не считаются ошибкой
+
+
+@dataclass
+class Workload:
+    backend: str  # папка проекта в корне репозитория
+    scenarios: List[Scenario]
+    setup: Optional[Callable[[httpx.AsyncClient], Awaitable[dict]]] = None
+    prepare: Optional[Callable[[Path], Dict[str, str]]] = None
+    env: Dict[str, str] = field(default_factory=dict)
+    mock_weather: bool = False  # нужен ли мок OpenWeatherMap
+
+
+def checked(response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+# --- project-1: to-do ---
+async def todo_setup(client):
+    operations = [{"op": "create", "task": f"Задача {i}"} for i in range(500)]
+    result = checked(await client.post("/api/todos/batch", json={"operations": operations})).json()
+    return {"ids": [item["todo"]["id"] for item in result["results"]]}
+
+
+async def todo_toggle(client, state, i):
+    return await client.patch(f"/api/todos/{state['ids'][i % len(state['ids'])]}")
+
+
+# --- project-2: блог ---
+def blog_prepare(workdir: Path) -> Dict[str, str]:
+    posts_dir = workdir / "posts"
+    posts_dir.mkdir(exist_ok=True)
+    rng = random.Random(0)
+    words = ["fastapi", "python", "next", "react", "база", "данных", "кэш", "индекс", "поиск", "сервер"]
+    for i in range(1000):
+        text = " ".join(rng.choices(words, k=rng.randrange(50, 300)))
+        (posts_dir / f"post-{i}.md").write_text(
+            f"---\ntitle: Пост {i} про {rng.choice(words)}\nauthor: Автор\n"
+            f"date: 20{rng.randrange(20, 26)}-{rng.randrange(1, 13):02}-{rng.randrange(1, 29):02}\n"
+            f"category: {rng.choice(['Бэкенд', 'Фронтенд', 'Базы данных'])}\n---\n\n{text}\n",
+            encoding="utf-8",
+        )
+    return {"POSTS_DIR": str(posts_dir)}
+
+
+# --- project-3: погода (upstream - мок из common/mock_weather.py) ---
+CITIES = ["Москва", "Алматы", "Berlin", "Paris", "Tokyo"]
+
+
+# --- project-4: сокращатель ссылок ---
+async def shortener_setup(client):
+    codes = []
+    for i in range(200):
+        response = checked(await client.post("/api/shorten", json={"long_url": f"https://example.com/page/{i}"}))
+        codes.append(response.json()["short_url"].rsplit("/", 1)[1])
+    return {"codes": codes}
+
+
+# --- project-5: опросы ---
+async def poll_setup(client):
+    response = checked(await client.post(
+        "/api/poll/create", json={"question": "Лучший фреймворк?", "options": ["FastAPI", "Django", "Flask", "Express"]}
+    ))
+    return {"poll_id": response.json()["id"]}
+
+
+# --- project-6: галерея ---
+# Минимальный PNG-заголовок и случайные байты: сервер проверяет только content-type и размер
+IMAGE = b"\x89PNG\r\n\x1a\n" + random.Random(0).randbytes(100 * 1024)
+
+
+# --- project-7: гостевая книга ---
+async def guestbook_setup(client):
+    for i in range(100):
+        checked(await client.post("/api/entries", json={"name": f"Гость {i}", "message": "Привет!"}))
+    return {}
+
+
+# --- project-8: фильтр товаров ---
+PRODUCT_WORDS = ["смартфон", "ноутбук", "наушники", "футболка", "джинсы", "книга", "часы", "худи", "alpha", "pro"]
+PRODUCT_CATEGORIES = ["Электроника", "Одежда", "Книги", "Дом", "Спорт"]
+PRODUCTS_ADMIN_TOKEN = "loadtest"
+
+
+def products_prepare(workdir: Path) -> Dict[str, str]:
+    rng = random.Random(0)
+    catalog = workdir / "catalog.jsonl"
+    with open(catalog, "w", encoding="utf-8") as f:
+        for i in range(100_000):
+            f.write(json.dumps({
+                "id": i + 1,
+                "name": f"{rng.choice(PRODUCT_WORDS).capitalize()} {rng.choice(PRODUCT_WORDS)} {rng.randrange(1000)}",
+                "category": rng.choice(PRODUCT_CATEGORIES),
+                "price": rng.randrange(100, 200000) / 100,
+            }, ensure_ascii=False) + "\n")
+    return {"CATALOG_FILE": str(catalog), "ADMIN_TOKEN": PRODUCTS_ADMIN_TOKEN}
+
+
+async def products_setup(client):
+    # Каталог грузится в фоне - ждем, пока он появится
+    headers = {"X-Admin-Token": PRODUCTS_ADMIN_TOKEN}
+    for _ in range(600):
+        status = checked(await client.get("/api/admin/catalog", headers=headers)).json()
+        if not status["loading"] and status["products"]:
+            return {}
+        if status["error"]:
+            raise RuntimeError(f"Каталог не загрузился: {status['error']}")
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Каталог не загрузился за 60 с")
+
+
+def product_query(i: int) -> dict:
+    rng = random.Random(i)
+    params = {"search": rng.choice(PRODUCT_WORDS)[:rng.randrange(3, 6)]}
+    if i % 2:
+        params["category"] = rng.choice(PRODUCT_CATEGORIES)
+    if i % 3 == 0:
+        params["sort"] = "price_asc"
+    return params
+
+
+# --- project-9: авторизация ---
+async def auth_setup(client):
+    response = checked(await client.post("/api/login", data={"username": "user", "password": "password"}))
+    return {"headers": {"Authorization": f"Bearer {response.json()['access_token']}"}}
+
+
+# --- project-10: микроблог ---
+async def microblog_setup(client):
+    headers = {"Authorization": "Bearer user1"}  # токен микроблога - имя пользователя
+    ids = []
+    for i in range(200):
+        response = checked(await client.post("/api/posts", json={"text": f"Пост номер {i}"}, headers=headers))
+        ids.append(response.json()["id"])
+    for post_id in ids[::3]:
+        checked(await client.post(f"/api/posts/{post_id}/like", headers={"Authorization": "Bearer user2"}))
+    return {"headers": headers, "ids": ids}
+
+
+async def microblog_like(client, state, i):
+    # Лайк и снятие лайка по очереди, чтобы запросы не упирались в "Already liked"
+    post_id = state["ids"][(i // 2) % len(state["ids"])]
+    if i % 2 == 0:
+        return await client.post(f"/api/posts/{post_id}/like", headers=state["headers"])
+    return await client.delete(f"/api/posts/{post_id}/like", headers=state["headers"])
+
+
+WORKLOADS: Dict[str, Workload] = {
+    "todo": Workload(
+        "project-1-fullstack-todo",
+        setup=todo_setup,
+        scenarios=[
+            Scenario("list", lambda client, state, i: client.get("/api/todos")),
+            Scenario("create", lambda client, state, i: client.post("/api/todos", json={"task": f"Новая {i}"}), (201,)),
+            Scenario("toggle", todo_toggle),
+        ],
+    ),
+    "blog": Workload(
+        "project-2-minimalist-blog",
+        prepare=blog_prepare,
+        scenarios=[
+            Scenario("post", lambda client, state, i: client.get(f"/api/posts/post-{i % 1000}")),
+            Scenario("list_page", lambda client, state, i: client.get(
+                "/api/posts", params={"limit": 20, "offset": 20 * (i % 10)})),
+            Scenario("search", lambda client, state, i: client.get(
+                "/api/search", params={"q": ["fastapi кэш", "поис", "python сервер", "инд"][i % 4]})),
+        ],
+    ),
+    "weather": Workload(
+        "project-3-weather-app",
+        mock_weather=True,
+        env={"OPENWEATHER_API_KEY": "loadtest"},
+        scenarios=[
+            Scenario("weather", lambda client, state, i: client.get(f"/api/weather/{CITIES[i % len(CITIES)]}")),
+            Scenario("forecast", lambda client, state, i: client.get(f"/api/forecast/{CITIES[i % len(CITIES)]}")),
+        ],
+    ),
+    "shortener": Workload(
+        "project-4-url-shortener",
+        setup=shortener_setup,
+        scenarios=[
+            Scenario("redirect", lambda client, state, i: client.get(f"/{state['codes'][i % len(state['codes'])]}"), (307,)),
+            Scenario("shorten", lambda client, state, i: client.post(
+                "/api/shorten", json={"long_url": f"https://example.com/new/{i}"})),
+        ],
+    ),
+    "poll": Workload(
+        "project-5-real-time-poll",
+        setup=poll_setup,
+        scenarios=[
+            Scenario("vote", lambda client, state, i: client.post(f"/api/poll/{state['poll_id']}/vote/option_{i % 4}")),
+            Scenario("read", lambda client, state, i: client.get(f"/api/poll/{state['poll_id']}")),
+        ],
+    ),
+    "gallery": Workload(
+        "project-6-image-gallery",
+        scenarios=[
+            Scenario("upload", lambda client, state, i: client.post(
+                "/api/upload", files={"file": (f"photo-{i}.png", IMAGE, "image/png")})),
+            Scenario("list", lambda client, state, i: client.get("/api/images")),
+        ],
+    ),
+    "guestbook": Workload(
+        "project-7-json-guestbook",
+        setup=guestbook_setup,
+        scenarios=[
+            Scenario("write", lambda client, state, i: client.post(
+                "/api/entries", json={"name": f"Гость {i}", "message": "Отличный сайт!"}), (201,)),
+            Scenario("read", lambda client, state, i: client.get("/api/entries", params={"page": 1 + i % 5})),
+        ],
+    ),
+    "products": Workload(
+        "project-8-product-filter",
+        prepare=products_prepare,
+        setup=products_setup,
+        scenarios=[
+            Scenario("filter", lambda client, state, i: client.get("/api/products", params=product_query(i))),
+            Scenario("page", lambda client, state, i: client.get("/api/products/page", params=product_query(i))),
+        ],
+    ),
+    "auth": Workload(
+        "project-9-simple-auth",
+        setup=auth_setup,
+        scenarios=[
+            Scenario("secret", lambda client, state, i: client.get("/api/secret-data", headers=state["headers"])),
+        ],
+    ),
+    "microblog": Workload(
+        "project-10-microblog-app",
+        setup=microblog_setup,
+        scenarios=[
+            Scenario("feed", lambda client, state, i: client.get("/api/posts", headers=state["headers"])),
+            # Параллельные запросы могут обогнать друг друга: 400/404 - это уже поставленный/снятый лайк
+            Scenario("like", microblog_like, (201, 204, 400, 404)),
+        ],
+    ),
+}
@@ -0,0 +1,217 @@
+"""Benchmarks for the to-do storage.
+
+Run from the backend folder:
+    python benchmark.py store --todos 100000
+    python benchmark.py crud --workers 1 2 4 --todos 1000
+    python benchmark.py sync --todos 10000 --changes 20
+
+The crud benchmark starts one process per simulated uvicorn worker. Each has
+its own SQLiteTodoStore on a shared database file and runs a CRUD mix.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Shared modules (common/) live at the repository root; store.py imports them
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from store import SQLiteTodoStore, TodoStore, apply_operation
+
+
+# --- The previous list-based storage, kept for comparison ---
+class ListTodoStore:
+    """A plain list scanned on every mutation, as main.py used to do."""
+
+    def __init__(self):
+        self._todos = []
+
+    def create(self, task: str) -> dict:
+        todo = {"id": str(uuid.uuid4()), "task": task, "completed": False}
+        self._todos.append(todo)
+        return todo
+
+    def toggle(self, todo_id: str):
+        for todo in self._todos:
+            if todo["id"] == todo_id:
+                todo["completed"] = not todo["completed"]
+                return todo
+        return None
+
+    def update(self, todo_id: str, task: str):
+        for todo in self._todos:
+            if todo["id"] == todo_id:
+                todo["task"] = task
+                return todo
+        return None
+
+    def delete(self, todo_id: str) -> bool:
+        todo_to_delete = None
+        for todo in self._todos:
+            if todo["id"] == todo_id:
+                todo_to_delete = todo
+                break
+        if not todo_to_delete:
+            return False
+        self._todos.remove(todo_to_delete)
+        return True
+
+    def delete_completed(self) -> int:
+        before = len(self._todos)
+        self._todos = [todo for todo in self._todos if not todo["completed"]]
+        return before - len(self._todos)
+
+
+def timed(operation, ids) -> float:
+    """Average microseconds per call of operation(todo_id)."""
+    started = time.perf_counter()
+    for todo_id in ids:
+        operation(todo_id)
+    return (time.perf_counter() - started) / len(ids) * 1e6
+
+
+# --- Per-operation cost at N todos ---
+def bench_store(count: int, operations: int):
+    print(f"todos: {count:,}, sampled operations: {operations:,}")
+    print(f"  {'store':12} {'toggle, us':>11} {'update, us':>11} {'delete, us':>11} {'clear completed, ms':>20}")
+    for name, store in (("list", ListTodoStore()), ("TodoStore", TodoStore())):
+        ids = [store.create(f"task {i}")["id"] for i in range(count)]
+        rng = random.Random(0)
+        # Sample ids across the whole list so the list scan pays its average cost
+        toggle_us = timed(store.toggle, rng.sample(ids, operations))
+        update_us = timed(lambda todo_id: store.update(todo_id, "renamed"), rng.sample(ids, operations))
+        delete_us = timed(store.delete, rng.sample(ids, operations))
+        started = time.perf_counter()
+        removed = store.delete_completed()
+        clear_ms = (time.perf_counter() - started) * 1000
+        print(f"  {name:12} {toggle_us:11.2f} {update_us:11.2f} {delete_us:11.2f} {clear_ms:20.2f}"
+              f"  (cleared {removed:,})")
+
+
+# --- CRUD operations per second for 1 and N worker processes ---
+def crud_round(store, rng, ids: list, reads_per_write: int) -> int:
+    """One round of client traffic: create, toggle, update and delete, each followed
+    by reads_per_write list calls (other clients refreshing). Returns the number of operations."""
+    def refresh():
+        for _ in range(reads_per_write):
+            store.list()
+
+    created = store.create("new task")
+    refresh()
+    store.toggle(rng.choice(ids))
+    refresh()
+    store.update(rng.choice(ids), "renamed")
+    refresh()
+    store.delete(created["id"])
+    refresh()
+    return 4 * (1 + reads_per_write)
+
+
+def crud_worker(db_file: str, ids: list, seconds: float, cache: bool, reads_per_write: int, result_queue):
+    store = SQLiteTodoStore(db_file, cache=cache)
+    rng = random.Random(os.getpid())
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        done += crud_round(store, rng, ids, reads_per_write)
+    result_queue.put(done)
+
+
+def run_crud(db_file: str, ids: list, workers: int, seconds: float, cache: bool, reads_per_write: int) -> float:
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=crud_worker, args=(db_file, ids, seconds, cache, reads_per_write, queue))
+        for _ in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    total = sum(queue.get() for _ in processes)
+    for p in processes:
+        p.join()
+    return total / seconds
+
+
+def bench_crud(worker_counts: list, todos: int, seconds: float, reads_per_write: int):
+    memory = TodoStore()
+    ids = [memory.create(f"task {i}")["id"] for i in range(todos)]
+    rng = random.Random(0)
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        done += crud_round(memory, rng, ids, reads_per_write)
+    print(f"todos: {todos:,}; {reads_per_write} list calls after every create/toggle/update/delete")
+    print(f"  in-memory TodoStore, 1 process: {done / seconds:12,.0f} ops/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "todos.db")
+        store = SQLiteTodoStore(db_file, cache=False)
+        ids = [store.create(f"task {i}")["id"] for i in range(todos)]
+        print(f"  {'workers':>8} {'list cache':>11} {'ops/s':>12}")
+        for workers in worker_counts:
+            for cache in (False, True):
+                rate = run_crud(db_file, ids, workers, seconds, cache, reads_per_write)
+                print(f"  {workers:>8} {'on' if cache else 'off':>11} {rate:12,.0f}")
+
+
+# --- Keeping a client in sync: full reloads vs deltas, single requests vs a batch ---
+def bench_sync(todos: int, changes: int):
+    print(f"todos: {todos:,}, client edits: {changes}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, store in (("memory", TodoStore()), ("sqlite", SQLiteTodoStore(os.path.join(tmp, "todos.db")))):
+            ids = [todo["id"] for _, todo in store.batch([("create", None, f"task {i}") for i in range(todos)])]
+            rng = random.Random(0)
+            operations = [("toggle", todo_id, None) for todo_id in rng.sample(ids, changes)]
+
+            # Before: one request per edit, each followed by a full reload of the list
+            since = store.last_seq()
+            started = time.perf_counter()
+            full_bytes = 0
+            for operation in operations:
+                apply_operation(store, *operation)
+                full_bytes += len(json.dumps(store.list()))
+            single_ms = (time.perf_counter() - started) * 1000
+
+            # After: one batch request, then only the deltas since the last sync
+            started = time.perf_counter()
+            store.batch(operations)
+            _, delta = store.changes_since(since + len(operations))
+            delta_bytes = len(json.dumps(delta))
+            batch_ms = (time.perf_counter() - started) * 1000
+            print(f"  {name:7} single requests + full list: {single_ms:8.1f} ms, {full_bytes / 1024:9.1f} KiB"
+                  f" | batch + changes: {batch_ms:6.1f} ms, {delta_bytes / 1024:6.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    store = sub.add_parser("store", help="per-operation cost: list scan vs id-indexed store")
+    store.add_argument("--todos", type=int, default=100_000)
+    store.add_argument("--operations", type=int, default=1000)
+
+    crud = sub.add_parser("crud", help="CRUD ops/sec on SQLite for 1 and N worker processes")
+    crud.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    crud.add_argument("--todos", type=int, default=1000)
+    crud.add_argument("--seconds", type=float, default=3.0)
+    crud.add_argument("--reads-per-write", type=int, default=5)
+
+    sync = sub.add_parser("sync", help="full reloads vs change log, single requests vs batch")
+    sync.add_argument("--todos", type=int, default=10_000)
+    sync.add_argument("--changes", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "store":
+        bench_store(args.todos, args.operations)
+    elif args.command == "crud":
+        bench_crud(args.workers, args.todos, args.seconds, args.reads_per_write)
+    elif args.command == "sync":
+        bench_sync(args.todos, args.changes)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
-import uuid
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Literal, Optional
+import sys
+from pathlib import Path
+
+# Shared modules for all backends live in common/ at the repository root.
+# Only entry points set up the path; store.py imports common as well
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.metrics import install_metrics
+from common.serialization import SerializedCache
+
+from store import create_store
 
 # --- App Configuration ---
 app = FastAPI()
@@ -26,6 +36,12 @@ app.add_middleware(
     allow_headers=["*"], # Allows all headers
 )
 
+# --- Response compression and ETags (before metrics, so they see compressed sizes) ---
+install_compression(app)
+
+# --- Metrics (/metrics) and profiler ---
+install_metrics(app)
+
 
 # --- Pydantic Models (Data Shape) ---
 class TodoItem(BaseModel):
@@ -39,70 +55,123 @@ class TodoCreate(BaseModel):
 class TodoUpdate(BaseModel):
     task: str
 
+class TodoOperation(BaseModel):
+    op: Literal["create", "toggle", "update", "delete"]
+    id: Optional[str] = None   # required for toggle, update and delete
+    task: Optional[str] = None # required for create and update
+
+class TodoBatch(BaseModel):
+    operations: List[TodoOperation]
+
+class TodoOperationResult(BaseModel):
+    op: str
+    ok: bool                   # False if the todo was not found
+    todo: Optional[TodoItem] = None
+
+class TodoBatchResult(BaseModel):
+    results: List[TodoOperationResult]
+    last_seq: int
+
+class TodoChange(BaseModel):
+    seq: int
+    id: str
+    todo: Optional[TodoItem] = None  # None means the todo was deleted
+
+class TodoChanges(BaseModel):
+    last_seq: int
+    changes: List[TodoChange] = []
+    todos: Optional[List[TodoItem]] = None  # full list when `since` is older than the change log
+
+MAX_BATCH_SIZE = 1000
+
 
-# --- In-Memory Database (a simple Python list) ---
-# This list will act as our database. It will reset when the server restarts.
-fake_todo_db: List[TodoItem] = []
+# --- Database ---
+# By default todos live in memory and reset when the server restarts.
+# TODO_STORAGE=sqlite switches to a SQLite file shared by all workers (see store.py).
+todo_db = create_store()
+
+# The full list is serialized once per change: last_seq grows with every
+# create/toggle/update/delete, so an unchanged list is served as cached bytes
+todos_json = SerializedCache()
 
 
 # --- API Endpoints ---
+# Endpoints are plain functions: FastAPI runs them in a thread pool,
+# so blocking SQLite calls do not stall the event loop.
 
 @app.get("/api/todos", response_model=List[TodoItem])
-async def get_all_todos():
+def get_all_todos():
     """Returns all items in the to-do list."""
-    return fake_todo_db
+    # The stored todos are already valid, so response_model only documents the shape
+    return todos_json.response(todo_db.last_seq(), todo_db.list)
 
 @app.post("/api/todos", response_model=TodoItem, status_code=201)
-async def create_todo(todo_data: TodoCreate):
+def create_todo(todo_data: TodoCreate):
     """Creates a new to-do item."""
-    new_todo = TodoItem(
-        id=str(uuid.uuid4()), # Generate a unique ID
-        task=todo_data.task,
-        completed=False
+    return todo_db.create(todo_data.task)
+
+@app.post("/api/todos/batch", response_model=TodoBatchResult)
+def apply_todo_batch(batch: TodoBatch):
+    """Applies many create/toggle/update/delete operations in one request, in order."""
+    if len(batch.operations) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} operations per batch")
+    for operation in batch.operations:
+        if operation.op != "create" and not operation.id:
+            raise HTTPException(status_code=422, detail=f"'{operation.op}' needs an id")
+        if operation.op in ("create", "update") and operation.task is None:
+            raise HTTPException(status_code=422, detail=f"'{operation.op}' needs a task")
+    results = todo_db.batch([(operation.op, operation.id, operation.task) for operation in batch.operations])
+    return TodoBatchResult(
+        results=[
+            TodoOperationResult(op=operation.op, ok=ok, todo=todo)
+            for operation, (ok, todo) in zip(batch.operations, results)
+        ],
+        last_seq=todo_db.last_seq(),
+    )
+
+@app.get("/api/todos/changes", response_model=TodoChanges)
+def get_todo_changes(since: int = Query(0, ge=0, description="last_seq the client has already applied")):
+    """Returns todos changed after `since` (latest state per todo), or the full list if the log is too short."""
+    last_seq, changes = todo_db.changes_since(since)
+    if changes is None:
+        # The list may already include a few changes after last_seq; they come
+        # again on the next poll, which is harmless since each carries the full todo
+        return TodoChanges(last_seq=last_seq, todos=todo_db.list())
+    return TodoChanges(
+        last_seq=last_seq,
+        changes=[TodoChange(seq=seq, id=todo_id, todo=todo) for seq, todo_id, todo in changes],
     )
-    fake_todo_db.append(new_todo)
-    return new_todo
 
 @app.patch("/api/todos/{todo_id}", response_model=TodoItem)
-async def update_todo_status(todo_id: str):
+def update_todo_status(todo_id: str):
     """Toggles the 'completed' status of a to-do item."""
-    for todo in fake_todo_db:
-        if todo.id == todo_id:
-            todo.completed = not todo.completed
-            return todo
-    raise HTTPException(status_code=404, detail="Todo not found")
+    todo = todo_db.toggle(todo_id)
+    if todo is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return todo
 
 @app.delete("/api/todos/completed", status_code=204)
-async def delete_completed_todos():
+def delete_completed_todos():
     """Deletes all completed to-do items."""
-    global fake_todo_db
-    print(f"Before deletion: {len(fake_todo_db)} todos")
-    fake_todo_db = [todo for todo in fake_todo_db if not todo.completed]
-    print(f"After deletion: {len(fake_todo_db)} todos")
+    print(f"Before deletion: {len(todo_db)} todos")
+    todo_db.delete_completed()
+    print(f"After deletion: {len(todo_db)} todos")
     return
 
 @app.delete("/api/todos/{todo_id}", status_code=204)
-async def delete_todo(todo_id: str):
+def delete_todo(todo_id: str):
     """Deletes a to-do item."""
-    todo_to_delete = None
-    for todo in fake_todo_db:
-        if todo.id == todo_id:
-            todo_to_delete = todo
-            break
-    if not todo_to_delete:
+    if not todo_db.delete(todo_id):
         raise HTTPException(status_code=404, detail="Todo not found")
-
-    fake_todo_db.remove(todo_to_delete)
     # No content is returned for a 204 response
     return
 
 @app.put("/api/todos/{todo_id}", response_model=TodoItem)
-async def update_todo(todo_id: str, todo_data: TodoUpdate):
-    for todo in fake_todo_db:
-        if todo.id == todo_id:
-            todo.task = todo_data.task
-            return todo
-    raise HTTPException(status_code=404, detail="Todo not found")
+def update_todo(todo_id: str, todo_data: TodoUpdate):
+    todo = todo_db.update(todo_id, todo_data.task)
+    if todo is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return todo
 
 # A simple root endpoint to confirm the server is running
 @app.get("/")
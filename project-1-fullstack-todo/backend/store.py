@@ -0,0 +1,320 @@
+import os
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from common.metrics import TimedConnection
+
+# --- Storage settings (environment variables) ---
+# TODO_STORAGE=memory  - a dict in the process memory (single worker, resets on restart)
+# TODO_STORAGE=sqlite  - a shared SQLite file in WAL mode, safe for several uvicorn workers
+TODO_STORAGE = os.getenv("TODO_STORAGE", "memory")
+TODO_DB_FILE = os.getenv("TODO_DB_FILE", "todos.db")
+TODO_CACHE = os.getenv("TODO_CACHE", "1") == "1"  # per-process cache of the full list (sqlite only)
+CHANGE_LOG_SIZE = int(os.getenv("TODO_CHANGE_LOG_SIZE", "10000"))  # how many recent changes to keep
+
+# A change is (seq, todo_id, todo); todo is None when the item was deleted
+Change = Tuple[int, str, Optional[dict]]
+
+
+def coalesce_changes(changes) -> List[Change]:
+    """Keeps only the latest change per todo, in sequence order."""
+    latest: Dict[str, Change] = {}
+    for change in changes:
+        latest.pop(change[1], None)  # re-insert so dict order follows the latest seq
+        latest[change[1]] = change
+    return list(latest.values())
+
+
+def apply_operation(store, op: str, todo_id: Optional[str], task: Optional[str]) -> Tuple[bool, Optional[dict]]:
+    """Applies one batch operation; returns (ok, todo). ok is False when the todo does not exist."""
+    if op == "create":
+        return True, store.create(task)
+    if op == "toggle":
+        todo = store.toggle(todo_id)
+        return todo is not None, todo
+    if op == "update":
+        todo = store.update(todo_id, task)
+        return todo is not None, todo
+    if op == "delete":
+        return store.delete(todo_id), None
+    raise ValueError(f"Unknown operation {op!r}")
+
+
+class TodoStore:
+    """In-memory to-do storage with O(1) lookups by id.
+
+    Todos live in a dict keyed by id. Dicts keep insertion order, so listing
+    still returns todos in the order they were created. A secondary set holds
+    the ids of completed todos, which lets "clear completed" touch only those
+    items instead of rebuilding the whole list.
+
+    Every mutation also gets the next sequence number and a copy of the todo
+    is appended to a bounded change log, so clients can fetch deltas.
+
+    Endpoints run in FastAPI's thread pool, so mutations take a lock to keep
+    the dict, the completed set and the log consistent with each other.
+    """
+
+    def __init__(self, change_log_size: int = CHANGE_LOG_SIZE):
+        self._todos: Dict[str, dict] = {}
+        self._completed: Set[str] = set()
+        self._changes: Deque[Change] = deque(maxlen=change_log_size)
+        self._seq = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._todos)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return list(self._todos.values())
+
+    def get(self, todo_id: str) -> Optional[dict]:
+        return self._todos.get(todo_id)
+
+    def _log(self, todo_id: str, todo: Optional[dict]):
+        self._seq += 1
+        self._changes.append((self._seq, todo_id, dict(todo) if todo is not None else None))
+
+    def create(self, task: str) -> dict:
+        todo = {"id": str(uuid.uuid4()), "task": task, "completed": False}
+        with self._lock:
+            self._todos[todo["id"]] = todo
+            self._log(todo["id"], todo)
+        return todo
+
+    def toggle(self, todo_id: str) -> Optional[dict]:
+        with self._lock:
+            todo = self._todos.get(todo_id)
+            if todo is None:
+                return None
+            todo["completed"] = not todo["completed"]
+            if todo["completed"]:
+                self._completed.add(todo_id)
+            else:
+                self._completed.discard(todo_id)
+            self._log(todo_id, todo)
+            return todo
+
+    def update(self, todo_id: str, task: str) -> Optional[dict]:
+        with self._lock:
+            todo = self._todos.get(todo_id)
+            if todo is None:
+                return None
+            todo["task"] = task
+            self._log(todo_id, todo)
+            return todo
+
+    def delete(self, todo_id: str) -> bool:
+        with self._lock:
+            if self._todos.pop(todo_id, None) is None:
+                return False
+            self._completed.discard(todo_id)
+            self._log(todo_id, None)
+            return True
+
+    def delete_completed(self) -> int:
+        """Removes all completed todos and returns how many were removed."""
+        with self._lock:
+            removed = len(self._completed)
+            for todo_id in self._completed:
+                del self._todos[todo_id]
+                self._log(todo_id, None)
+            self._completed.clear()
+            return removed
+
+    def batch(self, operations) -> List[Tuple[bool, Optional[dict]]]:
+        """Applies (op, todo_id, task) operations in order, without other writers in between."""
+        with self._lock:
+            return [apply_operation(self, *operation) for operation in operations]
+
+    def last_seq(self) -> int:
+        return self._seq
+
+    def changes_since(self, since: int) -> Tuple[int, Optional[List[Change]]]:
+        """(last_seq, changes after since). Changes are None when the log no longer
+        reaches back to since and the client has to reload the full list."""
+        with self._lock:
+            oldest = self._changes[0][0] if self._changes else self._seq + 1
+            if since <= 0 or since < oldest - 1 or since > self._seq:
+                return self._seq, None
+            # The log is ordered by seq: skip from the right end back to since
+            newer = []
+            for change in reversed(self._changes):
+                if change[0] <= since:
+                    break
+                newer.append(change)
+            return self._seq, coalesce_changes(reversed(newer))
+
+
+def _row_to_todo(row) -> dict:
+    return {"id": row[0], "task": row[1], "completed": bool(row[2])}
+
+
+class SQLiteTodoStore:
+    """To-do storage in a SQLite file shared by all workers.
+
+    The database runs in WAL mode, so readers never block the single writer,
+    and every worker thread gets its own connection (sqlite3 also keeps a
+    per-connection cache of prepared statements, so the fixed SQL below is
+    compiled once). Triggers bump a version counter in todo_meta on every
+    change. With the cache enabled each process keeps the last full list
+    together with that version: a list request reads one row to check the
+    version and only re-reads the table after a change made by any worker.
+
+    Triggers also write every change into todo_changes, so the change log is
+    shared by all workers; its sequence is the AUTOINCREMENT key and a trigger
+    drops entries older than the last change_log_size.
+    """
+
+    def __init__(self, db_file: str = TODO_DB_FILE, cache: bool = TODO_CACHE,
+                 change_log_size: int = CHANGE_LOG_SIZE):
+        self.db_file = db_file
+        self.cache = cache
+        self._cached_list: Optional[Tuple[int, List[dict]]] = None
+        self._local = threading.local()
+        self._connect().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS todos (
+                position INTEGER PRIMARY KEY,  -- creation order for listing
+                id TEXT NOT NULL UNIQUE,
+                task TEXT NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS todos_completed ON todos (position) WHERE completed = 1;
+            CREATE TABLE IF NOT EXISTS todo_meta (version INTEGER NOT NULL);
+            INSERT INTO todo_meta (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM todo_meta);
+            CREATE TRIGGER IF NOT EXISTS todos_inserted AFTER INSERT ON todos
+                BEGIN UPDATE todo_meta SET version = version + 1; END;
+            CREATE TRIGGER IF NOT EXISTS todos_updated AFTER UPDATE ON todos
+                BEGIN UPDATE todo_meta SET version = version + 1; END;
+            CREATE TRIGGER IF NOT EXISTS todos_deleted AFTER DELETE ON todos
+                BEGIN UPDATE todo_meta SET version = version + 1; END;
+
+            CREATE TABLE IF NOT EXISTS todo_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                todo_id TEXT NOT NULL,
+                task TEXT,          -- NULL: the todo was deleted
+                completed INTEGER
+            );
+            CREATE TRIGGER IF NOT EXISTS todos_log_inserted AFTER INSERT ON todos
+                BEGIN INSERT INTO todo_changes (todo_id, task, completed) VALUES (NEW.id, NEW.task, NEW.completed); END;
+            CREATE TRIGGER IF NOT EXISTS todos_log_updated AFTER UPDATE ON todos
+                BEGIN INSERT INTO todo_changes (todo_id, task, completed) VALUES (NEW.id, NEW.task, NEW.completed); END;
+            CREATE TRIGGER IF NOT EXISTS todos_log_deleted AFTER DELETE ON todos
+                BEGIN INSERT INTO todo_changes (todo_id) VALUES (OLD.id); END;
+            """
+        )
+        # The bound is part of the trigger, so it is recreated with the current setting
+        self._connect().executescript(
+            f"""
+            DROP TRIGGER IF EXISTS todo_changes_pruned;
+            CREATE TRIGGER todo_changes_pruned AFTER INSERT ON todo_changes
+                BEGIN DELETE FROM todo_changes WHERE seq <= NEW.seq - {int(change_log_size)}; END;
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None, factory=TimedConnection)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM todos").fetchone()[0]
+
+    def list(self) -> List[dict]:
+        conn = self._connect()
+        if not self.cache:
+            return [_row_to_todo(row) for row in conn.execute("SELECT id, task, completed FROM todos ORDER BY position")]
+        # Version and rows are read from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute("SELECT version FROM todo_meta").fetchone()[0]
+            cached = self._cached_list
+            if cached is not None and cached[0] == version:
+                return list(cached[1])
+            todos = [_row_to_todo(row) for row in conn.execute("SELECT id, task, completed FROM todos ORDER BY position")]
+        finally:
+            conn.execute("COMMIT")
+        if cached is None or cached[0] < version:
+            self._cached_list = (version, todos)
+        return list(todos)
+
+    def get(self, todo_id: str) -> Optional[dict]:
+        row = self._connect().execute("SELECT id, task, completed FROM todos WHERE id = ?", (todo_id,)).fetchone()
+        return _row_to_todo(row) if row else None
+
+    def create(self, task: str) -> dict:
+        todo = {"id": str(uuid.uuid4()), "task": task, "completed": False}
+        self._connect().execute("INSERT INTO todos (id, task) VALUES (?, ?)", (todo["id"], task))
+        return todo
+
+    def toggle(self, todo_id: str) -> Optional[dict]:
+        # fetchall() steps the statement to completion, so the write commits right away
+        rows = self._connect().execute(
+            "UPDATE todos SET completed = 1 - completed WHERE id = ? RETURNING id, task, completed", (todo_id,)
+        ).fetchall()
+        return _row_to_todo(rows[0]) if rows else None
+
+    def update(self, todo_id: str, task: str) -> Optional[dict]:
+        rows = self._connect().execute(
+            "UPDATE todos SET task = ? WHERE id = ? RETURNING id, task, completed", (task, todo_id)
+        ).fetchall()
+        return _row_to_todo(rows[0]) if rows else None
+
+    def delete(self, todo_id: str) -> bool:
+        return self._connect().execute("DELETE FROM todos WHERE id = ?", (todo_id,)).rowcount > 0
+
+    def delete_completed(self) -> int:
+        return self._connect().execute("DELETE FROM todos WHERE completed = 1").rowcount
+
+    def batch(self, operations) -> List[Tuple[bool, Optional[dict]]]:
+        """Applies (op, todo_id, task) operations in order in one transaction."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            results = [apply_operation(self, *operation) for operation in operations]
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return results
+
+    def last_seq(self) -> int:
+        row = self._connect().execute("SELECT seq FROM sqlite_sequence WHERE name = 'todo_changes'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, since: int) -> Tuple[int, Optional[List[Change]]]:
+        """(last_seq, changes after since); changes are None if the log does not reach back to since."""
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            last = self.last_seq()
+            oldest = conn.execute("SELECT MIN(seq) FROM todo_changes").fetchone()[0] or last + 1
+            if since <= 0 or since < oldest - 1 or since > last:
+                return last, None
+            rows = conn.execute(
+                "SELECT seq, todo_id, task, completed FROM todo_changes WHERE seq > ? ORDER BY seq", (since,)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return last, coalesce_changes(
+            (seq, todo_id, None if task is None else _row_to_todo((todo_id, task, completed)))
+            for seq, todo_id, task, completed in rows
+        )
+
+
+def create_store():
+    """Creates the storage selected by TODO_STORAGE."""
+    if TODO_STORAGE == "sqlite":
+        return SQLiteTodoStore()
+    if TODO_STORAGE == "memory":
+        return TodoStore()
+    raise ValueError(f"Unknown storage mode TODO_STORAGE={TODO_STORAGE!r}")
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Annotated
@@ -6,6 +7,16 @@ from sqlmodel import SQLModel, Field, create_engine, Session, select, Relationsh
 from datetime import datetime, timezone
 import uuid
 import os
+import sys
+from pathlib import Path
+
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.credentials import password_hasher
+from common.metrics import install_metrics, instrument_sqlalchemy
+from common.serialization import FastJSONResponse
+from common.ratelimit import LoginThrottle
 
 app = FastAPI()
 
@@ -13,9 +24,16 @@ app = FastAPI()
 origins = ["http://localhost:3001"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
 # --- Настройка БД ---
 DB_FILE = "microblog.db"
 engine = create_engine(f"sqlite:///{DB_FILE}", echo=False)
+instrument_sqlalchemy(engine)  # время каждого SQL-запроса - в /metrics
 
 # --- Модели ---
 class User(SQLModel, table=True):
@@ -63,8 +81,8 @@ def init_db():
     with Session(engine) as session:
         if not session.exec(select(User)).first():
             session.add_all([
-                User(username="user1", password="password1"),
-                User(username="user2", password="password2"),
+                User(username="user1", password=password_hasher.hash_sync("password1")),
+                User(username="user2", password=password_hasher.hash_sync("password2")),
             ])
             session.commit()
 
@@ -81,15 +99,37 @@ def get_current_user(authorization: Annotated[str, Header()]) -> User:
             raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid token")
         return user
 
-@app.post("/api/login")
-def login(form_data: dict):
+def find_user(username) -> Optional[User]:
+    with Session(engine) as session:
+        return session.exec(select(User).where(User.username == username)).first()
+
+def update_password(user_id: int, password_hash: str):
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        user.password = password_hash
+        session.add(user)
+        session.commit()
+
+# Ограничение попыток входа по IP и имени пользователя - до проверки пароля
+login_throttle = LoginThrottle()
+
+@app.post("/api/login", dependencies=[Depends(login_throttle)])
+async def login(form_data: dict):
     username = form_data.get("username")
     password = form_data.get("password")
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.username == username)).first()
-        if not user or user.password != password:
-            raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Incorrect username or password")
-        return {"access_token": user.username, "token_type": "bearer", "user": {"id": user.id, "username": user.username}}
+    if not isinstance(password, str):
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Incorrect username or password")
+    # Запросы к БД - в пуле потоков: заблокированный файл SQLite не должен останавливать цикл событий
+    user = await run_in_threadpool(find_user, username)
+    # Хэш считается в отдельном пуле потоков; для неизвестного имени - по фиктивному
+    # хэшу, чтобы время ответа не выдавало, существует ли пользователь
+    password_ok, new_hash = await password_hasher.verify(user.password if user else None, password)
+    if not password_ok:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Incorrect username or password")
+    if new_hash:
+        # Старый пароль в открытом виде (или хэш со старыми параметрами) - сохраняем новый хэш
+        await run_in_threadpool(update_password, user.id, new_hash)
+    return {"access_token": user.username, "token_type": "bearer", "user": {"id": user.id, "username": user.username}}
 
 # --- Эндпоинты для постов ---
 @app.get("/api/posts", response_model=List[PostRead])
@@ -108,16 +148,18 @@ def list_posts(authorization: Annotated[str, Header()] = None):
             liked_by_me = False
             if current_user:
                 liked_by_me = session.exec(select(Like).where(Like.post_id == post.id, Like.user_id == current_user.id)).first() is not None
-            result.append(PostRead(
-                id=post.id,
-                text=post.text,
-                timestamp=post.timestamp,
-                owner_id=post.owner_id,
-                owner_username=post.owner.username if post.owner else "",
-                likes_count=likes_count,
-                liked_by_me=liked_by_me
-            ))
-        return result
+            result.append({
+                "id": post.id,
+                "text": post.text,
+                "timestamp": post.timestamp,
+                "owner_id": post.owner_id,
+                "owner_username": post.owner.username if post.owner else "",
+                "likes_count": likes_count,
+                "liked_by_me": liked_by_me
+            })
+        # Посты собраны из строк БД в формате PostRead: отдаем их через orjson,
+        # без повторной проверки каждого поста через response_model
+        return FastJSONResponse(result)
 
 @app.post("/api/posts", response_model=PostRead, status_code=201)
 def create_post(post_data: PostCreate, current_user: Annotated[User, Depends(get_current_user)]):
@@ -196,13 +238,15 @@ def user_posts(username: str, authorization: Annotated[str, Header()] = None):
             liked_by_me = False
             if current_user:
                 liked_by_me = session.exec(select(Like).where(Like.post_id == post.id, Like.user_id == current_user.id)).first() is not None
-            result.append(PostRead(
-                id=post.id,
-                text=post.text,
-                timestamp=post.timestamp,
-                owner_id=post.owner_id,
-                owner_username=user.username,
-                likes_count=likes_count,
-                liked_by_me=liked_by_me
-            ))
-        return result
\ No newline at end of file
+            result.append({
+                "id": post.id,
+                "text": post.text,
+                "timestamp": post.timestamp,
+                "owner_id": post.owner_id,
+                "owner_username": user.username,
+                "likes_count": likes_count,
+                "liked_by_me": liked_by_me
+            })
+        # Посты собраны из строк БД в формате PostRead: отдаем их через orjson,
+        # без повторной проверки каждого поста через response_model
+        return FastJSONResponse(result)
@@ -0,0 +1,308 @@
+"""Бенчмарки чтения постов блога.
+
+Запуск из папки backend:
+    python benchmark.py reads --posts 100000
+    python benchmark.py listing --posts 100000
+    python benchmark.py search --posts 100000
+    python benchmark.py startup --posts 5000
+    python benchmark.py reload --posts 5000 --changes 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from content import MarkdownContent
+from posts import PostStore, dump_json
+from search import SearchIndex
+
+CATEGORIES = ["Веб разработка", "Бэкенд разработка", "питон разработка", "Базы данных", "DevOps"]
+
+
+def make_posts(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "slug": f"post-{i}",
+            "title": f"Пост номер {i}",
+            "content": "Текст поста о веб-разработке. " * rng.randrange(5, 40),
+            "author": rng.choice(["Иванов Иван", "Петров Петр", "Сергеев Сергей"]),
+            "date": f"20{rng.randrange(15, 26)}-{rng.randrange(1, 13):02}-{rng.randrange(1, 29):02}",
+            "category": rng.choice(CATEGORIES),
+        }
+        for i in range(count)
+    ]
+
+
+def rate(operation, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        operation()
+    return repeat / (time.perf_counter() - started)
+
+
+# --- Прежний путь (поиск перебором и сериализация на каждый запрос) против готовых ответов ---
+def bench_reads(count: int, lookups: int):
+    posts = make_posts(count)
+    started = time.perf_counter()
+    store = PostStore(posts)
+    build_time = time.perf_counter() - started
+    slugs = [post["slug"] for post in random.Random(1).choices(posts, k=lookups)]
+
+    def legacy_post(slug):
+        for post in posts:
+            if post["slug"] == slug:
+                return json.dumps(post, ensure_ascii=False).encode()
+
+    def legacy_list():
+        return json.dumps([{"slug": post["slug"], "title": post["title"]} for post in posts], ensure_ascii=False).encode()
+
+    # Прежний поиск перебором слишком медленный на 100k - меряем на части выборки
+    legacy_sample = slugs[:max(1, lookups // 100)]
+    started = time.perf_counter()
+    for slug in legacy_sample:
+        legacy_post(slug)
+    legacy_post_rate = len(legacy_sample) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for slug in slugs:
+        store.post_response(slug)
+    post_rate = lookups / (time.perf_counter() - started)
+
+    legacy_list_rate = rate(legacy_list, 5)
+    store.list_response()  # первый запрос собирает тело списка
+    list_rate = rate(store.list_response, 100_000)
+    store.put(dict(posts[0], title="Новый заголовок"))
+    rebuild_rate = rate(lambda: (store.put(posts[0]), store.list_response()), 5)
+    newest_first = sorted(posts, key=lambda p: (p["date"], p["slug"]), reverse=True)
+    assert store.list_response()[0] == dump_json([{"slug": p["slug"], "title": p["title"]} for p in newest_first])
+
+    print(f"постов: {count:,} (индекс и готовые ответы: {build_time:.2f} с)")
+    print(f"  {'':28} {'прежний путь':>14} {'PostStore':>14}")
+    print(f"  {'пост по slug, чтений/с':28} {legacy_post_rate:14,.0f} {post_rate:14,.0f}")
+    print(f"  {'список постов, чтений/с':28} {legacy_list_rate:14,.0f} {list_rate:14,.0f}")
+    print(f"  изменение поста + пересборка списка: {1000 / rebuild_rate:.1f} мс")
+
+
+# --- Страница списка с фильтрами: перебор и сортировка против индексов по дате и категории ---
+def bench_listing(count: int, queries: int, limit: int):
+    posts = make_posts(count)
+    store = PostStore(posts)
+    rng = random.Random(3)
+    cases = []
+    for _ in range(queries):
+        category = rng.choice([None, *CATEGORIES])
+        year = rng.randrange(15, 26)
+        date_range = rng.choice([(None, None), (f"20{year}-01-01", f"20{year}-12-31")])
+        cases.append((category, *date_range, rng.choice([0, limit, 10 * limit])))
+
+    def legacy_page(category, date_from, date_to, offset):
+        matched = [
+            post for post in posts
+            if (category is None or post["category"].lower() == category.lower())
+            and (date_from is None or post["date"] >= date_from)
+            and (date_to is None or post["date"] <= date_to)
+        ]
+        matched.sort(key=lambda post: (post["date"], post["slug"]), reverse=True)
+        return [post["slug"] for post in matched[offset:offset + limit]], len(matched)
+
+    for case in cases[:20]:
+        assert store.page(*case, limit=limit) == legacy_page(*case)
+
+    legacy_sample = cases[:max(1, queries // 50)]
+    started = time.perf_counter()
+    for case in legacy_sample:
+        legacy_page(*case)
+    legacy_ms = (time.perf_counter() - started) / len(legacy_sample) * 1000
+
+    started = time.perf_counter()
+    for case in cases:
+        store.list_body(store.page(*case, limit=limit)[0])
+    index_ms = (time.perf_counter() - started) / len(cases) * 1000
+
+    new_posts = make_posts(1000, seed=4)
+    for post in new_posts:
+        post["slug"] = "new-" + post["slug"]
+    started = time.perf_counter()
+    for post in new_posts:
+        store.put(post)
+    put_us = (time.perf_counter() - started) / len(new_posts) * 1e6
+
+    print(f"постов: {count:,}, страница: {limit}, запросов: {queries:,}")
+    print(f"  перебор и сортировка: {legacy_ms:8.2f} мс на страницу")
+    print(f"  индексы PostStore:    {index_ms:8.3f} мс на страницу (с сериализацией)")
+    print(f"  добавление поста в индексы: {put_us:.1f} мкс")
+
+
+# --- Полнотекстовый поиск: перебор подстрокой против инвертированного индекса ---
+SYLLABLES = ["ка", "ро", "ми", "но", "те", "ла", "ви", "да", "ру", "сте", "про", "ген", "бо", "ли", "тор", "ма"]
+
+
+def make_texts(count: int, vocabulary_size: int, seed: int = 5) -> list:
+    """Тексты со словарем vocabulary_size слов с частотами по закону Ципфа."""
+    rng = random.Random(seed)
+    words = list({"".join(rng.choices(SYLLABLES, k=rng.randrange(2, 5))) for _ in range(vocabulary_size)})
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, [
+        (" ".join(rng.choices(words, weights, k=5)), " ".join(rng.choices(words, weights, k=rng.randrange(50, 300))))
+        for _ in range(count)
+    ]
+
+
+def index_size(index: SearchIndex) -> int:
+    """Байт в структурах индекса (без самих slug, они общие с PostStore)."""
+    size = sys.getsizeof(index._postings) + sys.getsizeof(index._terms) + sys.getsizeof(index._doc_ids)
+    size += sys.getsizeof(index._doc_slugs) + sys.getsizeof(index._doc_lengths)
+    for term, (docs, counts) in index._postings.items():
+        size += sys.getsizeof(term) + sys.getsizeof((docs, counts)) + sys.getsizeof(docs) + sys.getsizeof(counts)
+    return size
+
+
+def bench_search(count: int, queries: int, vocabulary_size: int):
+    words, texts = make_texts(count, vocabulary_size)
+    started = time.perf_counter()
+    index = SearchIndex()
+    for i, (title, content) in enumerate(texts):
+        index.add(f"post-{i}", title, content)
+    build_time = time.perf_counter() - started
+    index_mb = index_size(index) / 2**20
+
+    rng = random.Random(6)
+    # Редкие и частые слова, пары слов и префиксы по мере ввода
+    kinds = {
+        "одно слово": [rng.choice(words) + " " for _ in range(queries)],
+        "два слова": [f"{rng.choice(words)} {rng.choice(words[:1000])} " for _ in range(queries)],
+        "префикс": [rng.choice(words)[:rng.randrange(3, 6)] for _ in range(queries)],
+    }
+
+    def legacy_search(query):
+        query = query.strip().lower()
+        return [i for i, (title, content) in enumerate(texts) if query in title or query in content]
+
+    legacy_sample = kinds["одно слово"][:5]
+    started = time.perf_counter()
+    for query in legacy_sample:
+        legacy_search(query)
+    legacy_ms = (time.perf_counter() - started) / len(legacy_sample) * 1000
+
+    print(f"постов: {count:,}, слов в словаре: {len(words):,}")
+    print(f"  индекс: {build_time:.1f} с, {index_mb:.0f} МиБ")
+    print(f"  перебор подстрокой: {legacy_ms:.0f} мс на запрос")
+    print(f"  {'запрос':12} {'p50, мс':>9} {'p95, мс':>9}")
+    for kind, kind_queries in kinds.items():
+        timings = []
+        for query in kind_queries:
+            started = time.perf_counter()
+            index.search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(f"  {kind:12} {statistics.median(timings):9.2f} {p95:9.2f}")
+
+
+# --- Папка с Markdown-файлами: загрузка при старте и подхват изменений ---
+def write_markdown(directory: str, post: dict):
+    with open(os.path.join(directory, post["slug"] + ".md"), "w", encoding="utf-8") as f:
+        f.write(f"---\ntitle: {post['title']}\nauthor: {post['author']}\ndate: {post['date']}\n"
+                f"category: {post['category']}\n---\n\n# {post['title']}\n\n{post['content']}\n\n"
+                "- пункт списка\n- еще пункт\n\n```python\nprint('hello')\n```\n")
+
+
+def make_content_dir(directory: str, count: int) -> list:
+    posts = make_posts(count)
+    for post in posts:
+        write_markdown(directory, post)
+    return posts
+
+
+def timed_reload(content: MarkdownContent) -> tuple:
+    """(секунды, изменено постов, отрендерено файлов) для одной проверки папки."""
+    renders = content.renders
+    started = time.perf_counter()
+    updated = content.reload()
+    return time.perf_counter() - started, updated, content.renders - renders
+
+
+def bench_startup(count: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        make_content_dir(tmp, count)
+        content = MarkdownContent(tmp, PostStore())
+        startup, loaded, renders = timed_reload(content)
+        assert len(content.store) == loaded == count
+        idle, _, _ = timed_reload(content)
+        for entry in os.scandir(tmp):
+            os.utime(entry.path)
+        touched, _, touched_renders = timed_reload(content)
+
+        print(f"файлов: {count:,}")
+        print(f"  старт (разбор и рендер всех файлов): {startup:8.2f} с, отрендерено {renders:,}")
+        print(f"  проверка папки без изменений:        {idle * 1000:8.1f} мс")
+        print(f"  все файлы с новым mtime, тот же текст: {touched * 1000:6.1f} мс, отрендерено {touched_renders:,}")
+
+
+def bench_reload(count: int, changes: int, interval: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        posts = make_content_dir(tmp, count)
+        content = MarkdownContent(tmp, PostStore())
+        content.reload()
+        edited = random.Random(2).sample(posts, changes)
+        for post in edited:
+            post["title"] += " (правка)"
+            write_markdown(tmp, post)
+        # На некоторых ФС mtime грубый - гарантируем, что правка его поменяла
+        for post in edited:
+            os.utime(os.path.join(tmp, post["slug"] + ".md"), ns=(0, 0))
+        scan_time, updated, renders = timed_reload(content)
+        assert updated == renders == changes
+        assert all(content.store.get(post["slug"])["title"] == post["title"] for post in edited)
+
+        print(f"файлов: {count:,}, изменено: {changes}")
+        print(f"  проверка папки с изменениями: {scan_time * 1000:.1f} мс, отрендерено {renders}")
+        print(f"  задержка до обновления при опросе раз в {interval:g} с:"
+              f" в среднем {interval / 2 + scan_time:.2f} с, не больше {interval + scan_time:.2f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    reads = sub.add_parser("reads", help="чтений в секунду: перебор и сериализация против готовых ответов")
+    reads.add_argument("--posts", type=int, default=100_000)
+    reads.add_argument("--lookups", type=int, default=100_000)
+
+    listing = sub.add_parser("listing", help="страница списка с фильтрами: перебор против индексов")
+    listing.add_argument("--posts", type=int, default=100_000)
+    listing.add_argument("--queries", type=int, default=10_000)
+    listing.add_argument("--limit", type=int, default=20)
+
+    search = sub.add_parser("search", help="задержка поиска и память индекса")
+    search.add_argument("--posts", type=int, default=100_000)
+    search.add_argument("--queries", type=int, default=200)
+    search.add_argument("--vocabulary", type=int, default=50_000)
+
+    startup = sub.add_parser("startup", help="время загрузки папки с Markdown и проверки без изменений")
+    startup.add_argument("--posts", type=int, default=5000)
+
+    reload = sub.add_parser("reload", help="время подхвата измененных файлов")
+    reload.add_argument("--posts", type=int, default=5000)
+    reload.add_argument("--changes", type=int, default=10)
+    reload.add_argument("--interval", type=float, default=2.0)
+
+    args = parser.parse_args()
+    if args.command == "reads":
+        bench_reads(args.posts, args.lookups)
+    elif args.command == "listing":
+        bench_listing(args.posts, args.queries, args.limit)
+    elif args.command == "search":
+        bench_search(args.posts, args.queries, args.vocabulary)
+    elif args.command == "startup":
+        bench_startup(args.posts)
+    elif args.command == "reload":
+        bench_reload(args.posts, args.changes, args.interval)
+
+
+if __name__ == "__main__":
+    main()
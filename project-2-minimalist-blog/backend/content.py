@@ -0,0 +1,168 @@
+import asyncio
+import datetime
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import markdown
+
+from posts import PostStore
+
+POSTS_DIR = os.getenv("POSTS_DIR")  # папка с .md-файлами; без нее отдаются встроенные посты
+POSTS_POLL_INTERVAL = float(os.getenv("POSTS_POLL_INTERVAL", "2"))  # секунд между проверками папки
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables"]
+
+# Создание Markdown с расширениями стоит дороже рендера короткого поста,
+# поэтому один экземпляр переиспользуется (он не потокобезопасен - под локом)
+_markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+_markdown_lock = threading.Lock()
+
+
+def render_markdown(text: str) -> str:
+    with _markdown_lock:
+        return _markdown.reset().convert(text)
+
+
+def parse_front_matter(text: str) -> Tuple[Dict[str, str], str]:
+    """Отделяет блок "---" с полями "ключ: значение" в начале файла от текста поста."""
+    if not text.startswith("---"):
+        return {}, text
+    lines = text.split("\n")
+    for end in range(1, len(lines)):
+        if lines[end].rstrip() == "---":
+            break
+    else:
+        return {}, text
+    meta = {}
+    for line in lines[1:end]:
+        key, sep, value = line.partition(":")
+        if sep and key.strip():
+            meta[key.strip().lower()] = value.strip().strip("\"'")
+    return meta, "\n".join(lines[end + 1:]).lstrip("\n")
+
+
+@dataclass
+class FileState:
+    mtime_ns: int
+    size: int
+    digest: str
+    slug: str
+
+
+class MarkdownContent:
+    """Посты из папки с Markdown-файлами.
+
+    Каждый файл разбирается и рендерится в HTML один раз: при проверке папки
+    файл с прежними mtime и размером даже не читается, а файл с новым mtime,
+    но прежним содержимым (тот же хэш) не рендерится заново. Готовый пост
+    кладется в PostStore, удаленные файлы убираются из него.
+
+    Slug принадлежит первому загруженному файлу: другой файл с тем же slug
+    пропускается с предупреждением и подхватывается, когда владелец исчезнет
+    или сменит slug.
+    """
+
+    def __init__(self, directory: str, store: PostStore):
+        self.directory = directory
+        self.store = store
+        self._files: Dict[str, FileState] = {}
+        self._owners: Dict[str, str] = {}  # slug -> путь файла, пост из которого лежит в PostStore
+        self.renders = 0
+
+    def load_post(self, path: str, text: str, mtime_ns: int) -> dict:
+        meta, body = parse_front_matter(text)
+        slug = meta.get("slug") or os.path.splitext(os.path.basename(path))[0]
+        date = meta.get("date") or datetime.date.fromtimestamp(mtime_ns / 1e9).isoformat()
+        self.renders += 1
+        return {
+            "slug": slug,
+            "title": meta.get("title") or slug,
+            "content": body,
+            "author": meta.get("author", ""),
+            "date": date,
+            "category": meta.get("category", ""),
+            "html": render_markdown(body),
+        }
+
+    def scan(self) -> Tuple[List[Tuple[str, FileState, Optional[dict]]], List[str]]:
+        """Находит изменения в папке, ничего не меняя: (новые и измененные посты, удаленные файлы).
+
+        Читает и рендерит файлы, поэтому запускается в отдельном потоке.
+        """
+        changed = []
+        seen = set()
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".md") or not entry.is_file():
+                continue
+            path = entry.path
+            seen.add(path)
+            try:
+                stat = entry.stat()
+                state = self._files.get(path)
+                if state and state.mtime_ns == stat.st_mtime_ns and state.size == stat.st_size:
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                if state and state.digest == digest:
+                    changed.append((path, FileState(stat.st_mtime_ns, stat.st_size, digest, state.slug), None))
+                    continue
+                post = self.load_post(path, data.decode("utf-8"), stat.st_mtime_ns)
+            except (OSError, UnicodeDecodeError) as error:
+                # Файл могли удалить или сохранить не до конца - разберем при следующей проверке
+                print(f"Не удалось загрузить {path}: {error}")
+                continue
+            changed.append((path, FileState(stat.st_mtime_ns, stat.st_size, digest, post["slug"]), post))
+        removed = [path for path in self._files if path not in seen]
+        return changed, removed
+
+    def apply(self, changed, removed) -> int:
+        """Применяет найденное scan() к PostStore. Возвращает число измененных постов."""
+        updated = 0
+        for path in removed:
+            if self._release(path, self._files.pop(path).slug):
+                updated += 1
+        for path, state, post in changed:
+            old = self._files.get(path)
+            self._files[path] = state
+            if post is None:
+                continue
+            if old and old.slug != post["slug"] and self._release(path, old.slug):
+                updated += 1
+            owner = self._owners.get(post["slug"])
+            if owner is not None and owner != path:
+                print(f"Пост {path} пропущен: slug {post['slug']!r} уже у файла {owner}")
+                continue
+            self._owners[post["slug"]] = path
+            self.store.put(post)
+            updated += 1
+        return updated
+
+    def _release(self, path: str, slug: str) -> bool:
+        """Убирает пост файла path из PostStore, если slug принадлежал этому файлу."""
+        if self._owners.get(slug) != path:
+            return False
+        del self._owners[slug]
+        self.store.remove(slug)
+        # Пропущенные файлы с тем же slug перечитаем при следующей проверке
+        for other in [other for other, state in self._files.items() if state.slug == slug]:
+            del self._files[other]
+        return True
+
+    def reload(self) -> int:
+        return self.apply(*self.scan())
+
+    async def watch(self, interval: float = POSTS_POLL_INTERVAL):
+        """Проверяет папку раз в interval секунд. Файлы читаются в потоке, а
+        PostStore меняется только в цикле событий - там же, где его читают эндпоинты."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changed, removed = await asyncio.to_thread(self.scan)
+            except OSError as error:
+                print(f"Не удалось проверить папку {self.directory}: {error}")
+                continue
+            self.apply(changed, removed)
@@ -1,10 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+import asyncio
+import datetime
+import sys
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
+
+from content import POSTS_DIR, MarkdownContent, render_markdown
+from posts import PostStore, make_etag
+
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import etag_matches, install_compression
+from common.metrics import install_metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Посты из POSTS_DIR загружаются при старте, дальше папка проверяется в фоне
+    if content is None:
+        yield
+        return
+    content.reload()
+    watcher = asyncio.create_task(content.watch())
+    yield
+    watcher.cancel()
+    with suppress(asyncio.CancelledError):
+        await watcher
 
 # --- Конфигурация приложения ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # --- Настройка CORS ---
 origins = [
@@ -21,8 +47,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
 # --- Pydantic модели (структура данных) ---
 class PostBase(BaseModel):
     slug: str
@@ -33,6 +66,10 @@ class PostFull(PostBase):
     author: str
     date: str
     category: str
+    html: Optional[str] = None  # content, уже отрендеренный в HTML
+
+class SearchResult(PostBase):
+    score: float
 
 # --- База данных в памяти (простой список Python) ---
 fake_posts_db: List[PostFull] = [
@@ -62,21 +99,70 @@ fake_posts_db: List[PostFull] = [
     )
 ]
 
+# Индекс по slug и готовые JSON-ответы строятся один раз при загрузке.
+# С POSTS_DIR посты берутся из Markdown-файлов, иначе - встроенные выше.
+if POSTS_DIR:
+    post_store = PostStore()
+    content = MarkdownContent(POSTS_DIR, post_store)
+else:
+    post_store = PostStore(dict(post.model_dump(), html=render_markdown(post.content)) for post in fake_posts_db)
+    content = None
+
+def cached_response(request: Request, body: bytes, etag: str) -> Response:
+    """Готовое тело ответа с ETag; если у клиента та же версия - 304 без тела."""
+    # Сравнение слабое: при сжатии middleware отдает ETag клиенту как W/"..."
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 # --- Эндпоинты API ---
 
-# Отдает краткий список всех постов (slug и title)
+# Отдает краткий список постов (slug и title), новые сверху.
+# Без параметров - все посты; общее число постов под фильтром - в заголовке X-Total-Count.
 @app.get("/api/posts", response_model=List[PostBase])
-async def get_all_posts():
-    return fake_posts_db
+async def get_all_posts(
+    request: Request,
+    category: Optional[str] = None,
+    date_from: Optional[datetime.date] = Query(None, description="Посты не раньше этой даты"),
+    date_to: Optional[datetime.date] = Query(None, description="Посты не позже этой даты"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Количество постов на странице")
+):
+    if category in ("", "all"):
+        category = None
+    if category is None and date_from is None and date_to is None and offset == 0 and limit is None:
+        body, etag = post_store.list_response()
+        total = len(post_store)
+    else:
+        slugs, total = post_store.page(
+            category,
+            date_from.isoformat() if date_from else None,
+            date_to.isoformat() if date_to else None,
+            offset,
+            limit,
+        )
+        body = post_store.list_body(slugs)
+        etag = make_etag(body)
+    response = cached_response(request, body, etag)
+    response.headers["X-Total-Count"] = str(total)
+    return response
 
 # Отдает полную информацию о конкретном посте по его slug
 @app.get("/api/posts/{slug}", response_model=PostFull)
-async def get_post_by_slug(slug: str):
-    for post in fake_posts_db:
-        if post.slug == slug:
-            return post
-    raise HTTPException(status_code=404, detail="Post not found")
+async def get_post_by_slug(slug: str, request: Request):
+    response = post_store.post_response(slug)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return cached_response(request, *response)
+
+# Полнотекстовый поиск по заголовку и тексту; последнее слово ищется как префикс
+@app.get("/api/search", response_model=List[SearchResult])
+async def search_posts(
+    q: str = Query(..., max_length=200, description="Поисковый запрос"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    return post_store.search(q, limit)
 
 @app.get("/")
 async def root():
-    return {"message": "Blog API is running"}
\ No newline at end of file
+    return {"message": "Blog API is running"}
@@ -0,0 +1,150 @@
+import bisect
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from search import SearchIndex
+
+# Поля краткой записи в списке постов (как у модели PostBase)
+LIST_FIELDS = ("slug", "title")
+
+# Ключ индексов по дате: (date, slug). Даты в ISO-формате сравниваются как строки,
+# slug делает ключ уникальным и задает порядок постов с одной датой.
+DateKey = Tuple[str, str]
+
+
+def dump_json(data) -> bytes:
+    """JSON в том же виде, что отдает FastAPI (JSONResponse)."""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class PostStore:
+    """Посты блога с индексом по slug и готовыми ответами.
+
+    Посты лежат в словаре slug -> пост (в порядке добавления). Для каждого
+    поста при добавлении сразу сериализуется тело ответа и считается ETag,
+    так что запрос поста - это поиск в словаре без Pydantic и json.dumps.
+    Тело списка собирается заново лениво: при первом запросе после изменения,
+    поэтому массовая загрузка не пересобирает его на каждом посте.
+
+    Для списка постов (новые сверху) поддерживаются отсортированные по дате
+    ключи всех постов и отдельные списки ключей для каждой категории.
+    Страница с фильтром по категории и диапазону дат - это два bisect и срез,
+    ее цена зависит от размера страницы, а не от числа постов.
+
+    Поисковый индекс (SearchIndex) тоже обновляется при каждом изменении поста.
+    """
+
+    def __init__(self, posts: Iterable[dict] = ()):
+        self._posts: Dict[str, dict] = {}
+        self._responses: Dict[str, Tuple[bytes, str]] = {}
+        self._list_response: Optional[Tuple[bytes, str]] = None
+        self._by_date: List[DateKey] = []
+        self._by_category: Dict[str, List[DateKey]] = {}
+        self.search_index = SearchIndex()
+        # Начальная загрузка: индексы сортируются один раз, а не вставкой на каждый пост
+        for post in posts:
+            self._put(post)
+        for post in self._posts.values():
+            self._by_date.append(self._date_key(post))
+            self._by_category.setdefault(self._category_key(post["category"]), []).append(self._date_key(post))
+        self._by_date.sort()
+        for keys in self._by_category.values():
+            keys.sort()
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def get(self, slug: str) -> Optional[dict]:
+        return self._posts.get(slug)
+
+    @staticmethod
+    def _date_key(post: dict) -> DateKey:
+        return (post["date"], post["slug"])
+
+    @staticmethod
+    def _category_key(category: str) -> str:
+        return category.lower()
+
+    def _put(self, post: dict):
+        slug = post["slug"]
+        self._posts[slug] = post
+        body = dump_json(post)
+        self._responses[slug] = (body, make_etag(body))
+        self._list_response = None
+        self.search_index.add(slug, post["title"], post["content"])
+
+    def _index(self, post: dict):
+        key = self._date_key(post)
+        bisect.insort(self._by_date, key)
+        bisect.insort(self._by_category.setdefault(self._category_key(post["category"]), []), key)
+
+    def _unindex(self, post: dict):
+        key = self._date_key(post)
+        category = self._category_key(post["category"])
+        for keys in (self._by_date, self._by_category[category]):
+            del keys[bisect.bisect_left(keys, key)]
+        if not self._by_category[category]:
+            del self._by_category[category]
+
+    def put(self, post: dict):
+        """Добавляет пост или заменяет пост с тем же slug."""
+        old = self._posts.get(post["slug"])
+        if old is not None:
+            self._unindex(old)
+        self._put(post)
+        self._index(post)
+
+    def remove(self, slug: str) -> bool:
+        post = self._posts.pop(slug, None)
+        if post is None:
+            return False
+        del self._responses[slug]
+        self._unindex(post)
+        self.search_index.remove(slug)
+        self._list_response = None
+        return True
+
+    def page(self, category: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+             offset: int = 0, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """Slug постов страницы (новые сверху) и общее число постов под фильтром.
+
+        Даты - строки "ГГГГ-ММ-ДД", обе границы включительно.
+        """
+        keys = self._by_date if category is None else self._by_category.get(self._category_key(category), [])
+        low = bisect.bisect_left(keys, (date_from,)) if date_from else 0
+        # (date_to + "\0",) больше любого ключа с датой date_to и меньше следующих дат
+        high = bisect.bisect_left(keys, (date_to + "\0",)) if date_to else len(keys)
+        total = max(high - low, 0)
+        end = high - offset
+        start = max(low, end - limit) if limit is not None else low
+        if end <= start:
+            return [], total
+        return [slug for _, slug in reversed(keys[start:end])], total
+
+    # --- Готовые ответы: (тело, ETag) ---
+    def post_response(self, slug: str) -> Optional[Tuple[bytes, str]]:
+        return self._responses.get(slug)
+
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        """Посты по релевантности запросу: slug, title и оценка BM25."""
+        return [
+            {"slug": slug, "title": self._posts[slug]["title"], "score": score}
+            for slug, score in self.search_index.search(query, limit)
+        ]
+
+    def list_body(self, slugs: Iterable[str]) -> bytes:
+        posts = self._posts
+        return dump_json([{field: posts[slug][field] for field in LIST_FIELDS} for slug in slugs])
+
+    def list_response(self) -> Tuple[bytes, str]:
+        """Список всех постов, новые сверху."""
+        response = self._list_response
+        if response is None:
+            body = self.list_body(slug for _, slug in reversed(self._by_date))
+            response = self._list_response = (body, make_etag(body))
+        return response
@@ -0,0 +1,152 @@
+import bisect
+import heapq
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Параметры BM25
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2  # слово из заголовка считается как TITLE_WEIGHT вхождений
+MAX_PREFIX_TERMS = 50  # во сколько слов словаря раскрывается префикс последнего слова
+MAX_COUNT = 0xFFFF  # частоты хранятся в array('H')
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    """Инвертированный индекс по заголовку и тексту постов с ранжированием BM25.
+
+    Посты получают номера по порядку добавления, поэтому постинги слова - это
+    два массива: номера постов по возрастанию (array('I')) и частоты слова
+    в них (array('H')), и новый
+    пост просто дописывается в конец. Удаленный или измененный пост помечается
+    удаленным (измененный добавляется заново под новым номером), а когда
+    удаленных становится больше живых, постинги пересобираются без них.
+
+    Последнее слово запроса считается префиксом (поиск по мере ввода) и
+    раскрывается по отсортированному словарю.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_slugs: List[Optional[str]] = []  # номер поста -> slug, None у удаленных
+        self._doc_lengths = array("I")
+        self._doc_ids: Dict[str, int] = {}
+        self._deleted: Set[int] = set()
+        self._total_length = 0
+        self._terms: List[str] = []  # словарь по алфавиту, досортировывается лениво
+        self._new_terms: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def add(self, slug: str, title: str, content: str):
+        """Индексирует пост; пост с тем же slug заменяется."""
+        self.remove(slug)
+        counts = Counter(tokenize(content))
+        for token in tokenize(title):
+            counts[token] += TITLE_WEIGHT
+        doc = len(self._doc_slugs)
+        self._doc_slugs.append(slug)
+        length = sum(counts.values())
+        self._doc_lengths.append(length)
+        self._total_length += length
+        self._doc_ids[slug] = doc
+        for term, count in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = (array("I"), array("H"))
+                self._new_terms.append(term)
+            posting[0].append(doc)
+            posting[1].append(min(count, MAX_COUNT))
+
+    def remove(self, slug: str) -> bool:
+        doc = self._doc_ids.pop(slug, None)
+        if doc is None:
+            return False
+        self._doc_slugs[doc] = None
+        self._deleted.add(doc)
+        self._total_length -= self._doc_lengths[doc]
+        if len(self._deleted) > len(self._doc_ids):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Пересобирает постинги без удаленных постов, перенумеровывая живые."""
+        renumber = array("I", bytes(4 * len(self._doc_slugs)))
+        slugs, lengths = [], array("I")
+        for doc, slug in enumerate(self._doc_slugs):
+            if slug is not None:
+                renumber[doc] = len(slugs)
+                self._doc_ids[slug] = len(slugs)
+                slugs.append(slug)
+                lengths.append(self._doc_lengths[doc])
+        deleted = self._deleted
+        postings = {}
+        for term, (docs, counts) in self._postings.items():
+            kept = [(renumber[doc], count) for doc, count in zip(docs, counts) if doc not in deleted]
+            if kept:
+                postings[term] = (array("I", (doc for doc, _ in kept)), array("H", (count for _, count in kept)))
+        self._postings = postings
+        self._doc_slugs, self._doc_lengths = slugs, lengths
+        self._deleted = set()
+        self._terms = sorted(postings)
+        self._new_terms = []
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if self._new_terms:
+            self._terms.extend(self._new_terms)
+            self._terms.sort()
+            self._new_terms = []
+        terms = self._terms
+        start = bisect.bisect_left(terms, prefix)
+        expanded = []
+        for term in terms[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            if term in self._postings:
+                expanded.append(term)
+        return expanded
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """(slug, оценка) лучших limit постов, от более релевантных к менее."""
+        tokens = tokenize(query)
+        if not tokens or not self._doc_ids:
+            return []
+        terms = set(tokens[:-1])
+        if query[-1:].isalnum():
+            # Последнее слово еще набирается: ищем и его продолжения
+            terms.update(self._expand_prefix(tokens[-1]))
+        else:
+            terms.add(tokens[-1])
+
+        live = len(self._doc_ids)
+        average_length = self._total_length / live or 1  # у всех постов может не быть ни одного слова
+        k_base = K1 * (1 - B)
+        k_length = K1 * B / average_length
+        lengths = self._doc_lengths
+        deleted = self._deleted
+        scores: Dict[int, float] = {}
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            matches = zip(*posting)
+            if deleted:
+                # Частота слова в документах - только по живым постам, удаленные еще лежат в постингах
+                matches = [(doc, count) for doc, count in matches if doc not in deleted]
+                frequency = len(matches)
+            else:
+                frequency = len(posting[0])
+            idf = math.log(1 + (live - frequency + 0.5) / (frequency + 0.5))
+            for doc, count in matches:
+                scores[doc] = scores.get(doc, 0.0) + idf * count * (K1 + 1) / (count + k_base + k_length * lengths[doc])
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self._doc_slugs[doc], score) for doc, score in best]
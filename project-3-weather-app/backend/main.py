@@ -1,9 +1,16 @@
 import os
+import sys
+from pathlib import Path
 import httpx # Библиотека для асинхронных HTTP запросов
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv # Для загрузки переменных из .env файла
 
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.metrics import install_metrics, timed
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -19,10 +26,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
 # --- Получение API ключа и базового URL ---
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
-WEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
-FORECAST_BASE_URL = "https://api.openweathermap.org/data/2.5/forecast"
+# Адрес API можно подменить, например на локальный мок в нагрузочных тестах
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+WEATHER_BASE_URL = f"{OPENWEATHER_BASE_URL}/weather"
+FORECAST_BASE_URL = f"{OPENWEATHER_BASE_URL}/forecast"
 
 # --- Эндпоинт API ---
 @app.get("/api/weather/{city}")
@@ -39,8 +54,9 @@ async def get_weather(city: str):
     }
 
     # Асинхронно запрашиваем данные с погодного сервиса
-    async with httpx.AsyncClient() as client:
-        response = await client.get(WEATHER_BASE_URL, params=params)
+    with timed("http", "openweather_weather"):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(WEATHER_BASE_URL, params=params)
 
     # Обработка ошибок
     if response.status_code == 404:
@@ -76,8 +92,9 @@ async def get_forecast(city: str):
 
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(FORECAST_BASE_URL, params=params)
+    with timed("http", "openweather_forecast"):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(FORECAST_BASE_URL, params=params)
 
     if response.status_code == 404:
         raise HTTPException(status_code=404, detail="City not found")
@@ -126,8 +143,9 @@ async def get_coords(lat: float, lon: float):
     }
 
     # Асинхронно запрашиваем данные с погодного сервиса
-    async with httpx.AsyncClient() as client:
-        response = await client.get(WEATHER_BASE_URL, params=params)
+    with timed("http", "openweather_weather"):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(WEATHER_BASE_URL, params=params)
 
     # Обработка ошибок
     if response.status_code == 404:
@@ -0,0 +1,83 @@
+"""Бенчмарк редиректов: сколько переходов в секунду выдерживает хранилище.
+
+Запуск из папки backend:
+    python benchmark.py --workers 1 2 4 --links 10000 --seconds 5
+
+Каждый процесс имитирует воркер uvicorn: свое хранилище SQLiteURLStore
+(общий файл базы + собственный LRU-кэш) и цикл resolve + record_click,
+как в эндпоинте редиректа.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Общие модули (common/) лежат в корне репозитория; их импортирует storage.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from storage import SQLiteURLStore
+
+EXPIRY_DAYS = 30
+
+
+def prepare_db(db_file: str, links: int) -> list:
+    store = SQLiteURLStore(EXPIRY_DAYS, db_file=db_file, cache_size=0)
+    created_at = datetime.now().isoformat()
+    codes = [f"code{i}" for i in range(links)]
+    for code in codes:
+        store.create(code, f"https://example.com/{code}", created_at)
+    return codes
+
+
+def worker(db_file: str, codes: list, seconds: float, cache_size: int, result_queue):
+    store = SQLiteURLStore(EXPIRY_DAYS, db_file=db_file, cache_size=cache_size)
+    rnd = random.Random(os.getpid())
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            code = rnd.choice(codes)
+            link = store.resolve(code)
+            store.record_click(code, link)
+        done += 100
+    result_queue.put(done)
+
+
+def run(db_file: str, codes: list, workers: int, seconds: float, cache_size: int) -> float:
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(db_file, codes, seconds, cache_size, queue))
+        for _ in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    total = sum(queue.get() for _ in processes)
+    for p in processes:
+        p.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--links", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "urls.db")
+        codes = prepare_db(db_file, args.links)
+        print(f"{'workers':>8} {'cache':>8} {'redirects/s':>14}")
+        for workers in args.workers:
+            for cache_size in (0, args.cache_size):
+                rate = run(db_file, codes, workers, args.seconds, cache_size)
+                print(f"{workers:>8} {cache_size:>8} {rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import secrets
+import sys
 import time
 from datetime import datetime, timedelta
 from fastapi import FastAPI, HTTPException, Request
@@ -6,6 +7,15 @@ from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
 from typing import Optional
+from pathlib import Path
+
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория.
+# Путь добавляют только точки входа; storage.py тоже импортирует common
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.metrics import install_metrics
+
+from storage import create_store
 
 app = FastAPI()
 
@@ -19,13 +29,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- "База данных" в памяти (словарь Python) ---
-# Ключ - короткий код, значение - объект с данными ссылки
-url_db = {}
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+# До маршрута /{short_code}: иначе он перехватил бы /metrics
+install_metrics(app)
 
 # Константа для срока действия ссылок (в днях)
 LINK_EXPIRY_DAYS = 30
 
+# --- Хранилище ссылок ---
+# По умолчанию словарь в памяти; URL_STORAGE=sqlite включает общий для воркеров
+# файл SQLite (WAL) с LRU-кэшем в каждом процессе (см. storage.py)
+url_db = create_store(LINK_EXPIRY_DAYS)
+
 # --- Pydantic модели ---
 class URLCreate(BaseModel):
     long_url: HttpUrl  # Pydantic проверит, что это валидный URL
@@ -43,7 +61,10 @@ def create_short_url(url_data: URLCreate, request: Request):
     """Создает короткий код для длинного URL."""
     long_url = str(url_data.long_url)
     
-    # Определяем короткий код
+    current_time = datetime.now()
+    created_at = current_time.isoformat()
+
+    # Определяем короткий код и создаем запись в базе данных
     if url_data.custom_code:
         # Если предоставлен кастомный код
         short_code = url_data.custom_code.strip()
@@ -52,24 +73,15 @@ def create_short_url(url_data: URLCreate, request: Request):
         if not short_code or not short_code.replace('-', '').replace('_', '').isalnum():
             raise HTTPException(status_code=400, detail="Кастомный код должен содержать только буквы, цифры, дефисы и подчеркивания")
         
-        # Проверяем, что код не занят
-        if short_code in url_db:
+        # create() атомарно проверяет, что код не занят (в том числе другим воркером)
+        if not url_db.create(short_code, long_url, created_at):
             raise HTTPException(status_code=409, detail="Этот код уже занят")
     else:
-        # Генерируем случайный безопасный код
+        # Генерируем случайный безопасный код, пока не найдется свободный
         short_code = secrets.token_urlsafe(6)
-        # Убедимся, что код уникален
-        while short_code in url_db:
+        while not url_db.create(short_code, long_url, created_at):
             short_code = secrets.token_urlsafe(6)
 
-    # Создаем запись в базе данных с новой структурой
-    current_time = datetime.now()
-    url_db[short_code] = {
-        "long_url": long_url,
-        "clicks": 0,
-        "created_at": current_time.isoformat()
-    }
-
     # Формируем полный короткий URL для ответа
     base_url = str(request.base_url)
     short_url = f"{base_url}{short_code}"
@@ -77,31 +89,33 @@ def create_short_url(url_data: URLCreate, request: Request):
     return {
         "short_url": short_url,
         "clicks": 0,
-        "created_at": current_time.isoformat()
+        "created_at": created_at
     }
 
 @app.get("/{short_code}")
 def redirect_to_long_url(short_code: str):
     """Ищет длинный URL по короткому коду и перенаправляет на него."""
-    url_data = url_db.get(short_code)
-
-    if not url_data:
-        raise HTTPException(status_code=404, detail="Short URL not found")
-
-    # Проверяем срок действия ссылки
-    created_at = datetime.fromisoformat(url_data["created_at"])
-    expiry_date = created_at + timedelta(days=LINK_EXPIRY_DAYS)
-    
-    if datetime.now() > expiry_date:
-        # Удаляем просроченную ссылку из базы данных
-        del url_db[short_code]
-        raise HTTPException(status_code=404, detail="Link has expired")
-
-    # Увеличиваем счетчик кликов
-    url_data["clicks"] += 1
-
-    # Выполняем HTTP 307 Temporary Redirect
-    return RedirectResponse(url=url_data["long_url"])
+    # Вторая попытка нужна, если запись в кэше процесса устарела
+    for _ in range(2):
+        link = url_db.resolve(short_code)
+
+        if not link:
+            raise HTTPException(status_code=404, detail="Short URL not found")
+
+        # Проверяем срок действия ссылки (expires_at посчитан заранее)
+        if time.time() > link.expires_at:
+            # Удаляем просроченную ссылку из базы данных. Если ее уже заменили
+            # новой (запись из устаревшего кэша), ищем код еще раз
+            if not url_db.delete(short_code, link):
+                continue
+            raise HTTPException(status_code=404, detail="Link has expired")
+
+        # Увеличиваем счетчик кликов
+        if url_db.record_click(short_code, link):
+            # Выполняем HTTP 307 Temporary Redirect
+            return RedirectResponse(url=link.long_url)
+
+    raise HTTPException(status_code=404, detail="Short URL not found")
 
 @app.get("/api/stats/{short_code}")
 def get_url_stats(short_code: str):
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from common.metrics import TimedConnection
+
+# --- Настройки хранилища (через переменные окружения) ---
+# URL_STORAGE=memory  - словарь в памяти процесса (работает только с одним воркером)
+# URL_STORAGE=sqlite  - общий файл SQLite в режиме WAL, можно запускать несколько воркеров
+URL_STORAGE = os.getenv("URL_STORAGE", "memory")
+URL_DB_FILE = os.getenv("URL_DB_FILE", "urls.db")
+URL_CACHE_SIZE = int(os.getenv("URL_CACHE_SIZE", "10000"))
+
+
+class Link(NamedTuple):
+    """Неизменяемая часть записи о ссылке, которую можно кэшировать."""
+    long_url: str
+    created_at: str
+    expires_at: float  # unix-время окончания срока действия
+
+
+def make_link(long_url: str, created_at: str, expiry_days: int) -> Link:
+    expires_at = datetime.fromisoformat(created_at) + timedelta(days=expiry_days)
+    return Link(long_url, created_at, expires_at.timestamp())
+
+
+class MemoryURLStore:
+    """Хранилище в словаре Python - прежнее поведение, один процесс."""
+
+    def __init__(self, expiry_days: int):
+        self.expiry_days = expiry_days
+        self._links = {}
+        self._clicks = {}
+
+    def create(self, short_code: str, long_url: str, created_at: str) -> bool:
+        """Сохраняет ссылку. Возвращает False, если код уже занят."""
+        if short_code in self._links:
+            return False
+        self._links[short_code] = make_link(long_url, created_at, self.expiry_days)
+        self._clicks[short_code] = 0
+        return True
+
+    def resolve(self, short_code: str) -> Optional[Link]:
+        return self._links.get(short_code)
+
+    def record_click(self, short_code: str, link: Link) -> bool:
+        """Увеличивает счетчик кликов. False - запись уже удалена или заменена."""
+        if self._links.get(short_code) != link:
+            return False
+        self._clicks[short_code] += 1
+        return True
+
+    def get(self, short_code: str) -> Optional[dict]:
+        link = self._links.get(short_code)
+        if link is None:
+            return None
+        return {"long_url": link.long_url, "clicks": self._clicks[short_code], "created_at": link.created_at}
+
+    def delete(self, short_code: str, link: Link) -> bool:
+        """Удаляет именно эту запись. False - ее уже удалили или заменили."""
+        if self._links.get(short_code) != link:
+            return False
+        del self._links[short_code]
+        del self._clicks[short_code]
+        return True
+
+
+class SQLiteURLStore:
+    """Общий для всех воркеров индекс ссылок в SQLite (WAL) с LRU-кэшем в каждом процессе.
+
+    В кэше лежат только неизменяемые поля (long_url, created_at), поэтому чтение
+    для редиректа обычно не ходит в базу. Устаревшая запись в кэше (ссылку удалили
+    и код заняли заново в другом воркере) обнаруживается при обновлении счетчика:
+    UPDATE сверяет created_at и в этом случае не находит строку.
+    """
+
+    def __init__(self, expiry_days: int, db_file: str = URL_DB_FILE, cache_size: int = URL_CACHE_SIZE):
+        self.expiry_days = expiry_days
+        self.db_file = db_file
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Link]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # FastAPI выполняет обычные (def) эндпоинты в пуле потоков - у каждого потока свое соединение
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS links ("
+                " short_code TEXT PRIMARY KEY,"
+                " long_url TEXT NOT NULL,"
+                " clicks INTEGER NOT NULL DEFAULT 0,"
+                " created_at TEXT NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None, factory=TimedConnection)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- LRU-кэш процесса ---
+    def _cache_get(self, short_code: str) -> Optional[Link]:
+        with self._cache_lock:
+            link = self._cache.get(short_code)
+            if link is not None:
+                self._cache.move_to_end(short_code)
+            return link
+
+    def _cache_put(self, short_code: str, link: Link):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[short_code] = link
+            self._cache.move_to_end(short_code)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, short_code: str):
+        with self._cache_lock:
+            self._cache.pop(short_code, None)
+
+    # --- Операции хранилища ---
+    def create(self, short_code: str, long_url: str, created_at: str) -> bool:
+        """Сохраняет ссылку. Возвращает False, если код уже занят (проверка атомарна между воркерами)."""
+        cursor = self._connect().execute(
+            "INSERT OR IGNORE INTO links (short_code, long_url, clicks, created_at) VALUES (?, ?, 0, ?)",
+            (short_code, long_url, created_at),
+        )
+        if cursor.rowcount == 0:
+            return False
+        self._cache_put(short_code, make_link(long_url, created_at, self.expiry_days))
+        return True
+
+    def resolve(self, short_code: str) -> Optional[Link]:
+        link = self._cache_get(short_code)
+        if link is not None:
+            return link
+        row = self._connect().execute(
+            "SELECT long_url, created_at FROM links WHERE short_code = ?", (short_code,)
+        ).fetchone()
+        if row is None:
+            return None
+        link = make_link(row[0], row[1], self.expiry_days)
+        self._cache_put(short_code, link)
+        return link
+
+    def record_click(self, short_code: str, link: Link) -> bool:
+        """Увеличивает счетчик кликов. False - запись уже удалена или заменена."""
+        cursor = self._connect().execute(
+            "UPDATE links SET clicks = clicks + 1 WHERE short_code = ? AND created_at = ?",
+            (short_code, link.created_at),
+        )
+        if cursor.rowcount == 0:
+            self._cache_drop(short_code)
+            return False
+        return True
+
+    def get(self, short_code: str) -> Optional[dict]:
+        row = self._connect().execute(
+            "SELECT long_url, clicks, created_at FROM links WHERE short_code = ?", (short_code,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"long_url": row[0], "clicks": row[1], "created_at": row[2]}
+
+    def delete(self, short_code: str, link: Link) -> bool:
+        """Удаляет именно эту запись. False - ее уже удалили или заменили.
+
+        link может прийти из устаревшего кэша процесса: если код успели занять
+        заново в другом воркере, created_at не совпадет и новая ссылка останется.
+        """
+        cursor = self._connect().execute(
+            "DELETE FROM links WHERE short_code = ? AND created_at = ?", (short_code, link.created_at)
+        )
+        self._cache_drop(short_code)
+        return cursor.rowcount > 0
+
+
+def create_store(expiry_days: int):
+    """Создает хранилище в зависимости от URL_STORAGE."""
+    if URL_STORAGE == "sqlite":
+        return SQLiteURLStore(expiry_days)
+    if URL_STORAGE == "memory":
+        return MemoryURLStore(expiry_days)
+    raise ValueError(f"Неизвестный режим хранилища URL_STORAGE={URL_STORAGE!r}")
@@ -0,0 +1,296 @@
+"""Бенчмарки бэкенда опросов.
+
+Запуск из папки backend:
+    python benchmark.py fanout --clients 10000 --votes 50000
+    python benchmark.py votes --polls 1000 --votes 20000
+    python benchmark.py recovery
+    python benchmark.py stress --processes 8
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Общие модули (common/) лежат в корне репозитория; их импортируют counters.py и persistence.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from broadcast import PollBroadcaster
+from counters import SQLitePollStore
+from persistence import VoteJournal, apply_vote
+
+
+# --- Рассылка обновлений подписчикам ---
+async def bench_fanout(clients: int, votes: int, polls: int, rate: float):
+    broadcaster = PollBroadcaster(max_updates_per_second=rate)
+    received = 0
+
+    async def client(poll_id):
+        nonlocal received
+        subscriber = broadcaster.subscribe(poll_id)
+        while True:
+            await subscriber.queue.get()
+            received += 1
+
+    # Половина клиентов смотрит все опросы, половина - один конкретный
+    poll_ids = [f"poll{i}" for i in range(polls)]
+    tasks = [
+        asyncio.create_task(client(None if i % 2 else poll_ids[i % polls]))
+        for i in range(clients)
+    ]
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    counts = {}
+    for i in range(votes):
+        poll_id = poll_ids[i % polls]
+        option_key = f"option_{i % 4}"
+        counts[(poll_id, option_key)] = counts.get((poll_id, option_key), 0) + 1
+        broadcaster.publish_votes(poll_id, option_key, counts[(poll_id, option_key)])
+        if i % 100 == 0:
+            # Отдаем управление циклу событий, как это происходит между HTTP-запросами
+            await asyncio.sleep(0)
+    publish_time = time.perf_counter() - started
+
+    # Ждем последнюю рассылку и пока клиенты разберут очереди
+    await asyncio.sleep(2 / rate)
+    while any(not s.queue.empty() for group in broadcaster._subscribers.values() for s in group):
+        await asyncio.sleep(0.01)
+    total_time = time.perf_counter() - started
+
+    for task in tasks:
+        task.cancel()
+
+    naive = clients // 2 * votes + clients // 2 * votes // polls
+    print(f"клиентов: {clients}, опросов: {polls}, голосов: {votes}, рассылок/с не больше: {rate}")
+    print(f"  публикация одного голоса: {publish_time / votes * 1e6:8.2f} мкс")
+    print(f"  доставлено сообщений:     {received:,} за {total_time:.2f} с ({received / total_time:,.0f} сообщ./с)")
+    print(f"  без склейки было бы:      {naive:,} сообщений")
+
+
+# --- Голосов в секунду: перезапись файла против журнала ---
+def make_polls(count: int) -> dict:
+    polls = {}
+    for i in range(count):
+        poll_id = f"poll{i}"
+        polls[poll_id] = {
+            "id": poll_id,
+            "question": f"Вопрос {i}?",
+            "options": {f"option_{j}": {"label": f"Вариант {j}", "votes": 0} for j in range(4)},
+            "created_at": "2025-07-01T12:00:00",
+        }
+    return polls
+
+
+def bench_votes(poll_count: int, votes: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_file = os.path.join(tmp, "polls.json")
+        poll_ids = [f"poll{i}" for i in range(poll_count)]
+
+        # Прежний путь: json.dump всего словаря с indent=2 после каждого голоса
+        polls = make_polls(poll_count)
+        old_votes = min(votes, 200)
+        started = time.perf_counter()
+        for i in range(old_votes):
+            apply_vote(polls, poll_ids[i % poll_count], f"option_{i % 4}")
+            with open(snapshot_file, 'w', encoding='utf-8') as f:
+                json.dump(polls, f, ensure_ascii=False, indent=2)
+        old_rate = old_votes / (time.perf_counter() - started)
+
+        # Новый путь: счетчик в памяти + строка в журнал, запись на диск в фоне
+        polls = make_polls(poll_count)
+        journal = VoteJournal(snapshot_file, os.path.join(tmp, "polls.journal"), lambda: polls)
+
+        async def cast_votes():
+            started = time.perf_counter()
+            for i in range(votes):
+                poll_id, option_key = poll_ids[i % poll_count], f"option_{i % 4}"
+                apply_vote(polls, poll_id, option_key)
+                journal.record_vote(poll_id, option_key)
+                if i % 100 == 0:
+                    await asyncio.sleep(0)
+            handler_time = time.perf_counter() - started
+            await journal.close()
+            return handler_time, time.perf_counter() - started
+
+        handler_time, total_time = asyncio.run(cast_votes())
+
+    print(f"опросов: {poll_count}")
+    print(f"  перезапись файла на каждый голос: {old_rate:12,.0f} голосов/с")
+    print(f"  журнал, в обработчике:            {votes / handler_time:12,.0f} голосов/с")
+    print(f"  журнал, включая запись на диск:   {votes / total_time:12,.0f} голосов/с")
+
+
+# --- Восстановление после сбоя ---
+def check_journal_replay():
+    """Снимок + журнал, записанные вручную: какие записи применяются при загрузке."""
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_file, journal_file = os.path.join(tmp, "polls.json"), os.path.join(tmp, "polls.journal")
+        polls = make_polls(2)
+        polls["poll0"]["options"]["option_0"]["votes"] = 5
+        with open(snapshot_file, 'w', encoding='utf-8') as f:
+            json.dump({"journal_seq": 10, "polls": polls}, f)
+        new_poll = {**make_polls(3)["poll2"], "created_at": "2025-07-02T12:00:00"}
+        entries = [
+            {"poll": "poll0", "option": "option_0", "seq": 9},    # уже в снимке (сбой до очистки журнала)
+            {"poll": "poll0", "option": "option_0", "seq": 10},   # тоже
+            {"poll": "poll0", "option": "option_0", "seq": 11},
+            {"poll": "poll1", "option": "option_3", "seq": 12},
+            {"create": new_poll, "seq": 13},
+            {"poll": "poll2", "option": "option_1", "seq": 14},
+            {"poll": "missing", "option": "option_0", "seq": 15},  # опрос не найден - голос пропускается
+        ]
+        with open(journal_file, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+            f.write('{"poll": "poll1", "option": "opt')  # оборванная последняя строка
+
+        journal = VoteJournal(snapshot_file, journal_file, dict)
+        recovered = journal.load()
+        votes = {poll_id: {key: o["votes"] for key, o in poll["options"].items()} for poll_id, poll in recovered.items()}
+        assert votes == {
+            "poll0": {"option_0": 6, "option_1": 0, "option_2": 0, "option_3": 0},
+            "poll1": {"option_0": 0, "option_1": 0, "option_2": 0, "option_3": 1},
+            "poll2": {"option_0": 0, "option_1": 1, "option_2": 0, "option_3": 0},
+        }, votes
+        assert journal.seq == 15, journal.seq
+
+        # Журнал свернут в снимок: повторная загрузка дает то же самое, а новые
+        # записи продолжают нумерацию и не склеиваются с оборванной строкой
+        assert os.path.getsize(journal_file) == 0
+        again = VoteJournal(snapshot_file, journal_file, lambda: recovered)
+        assert again.load() == recovered and again.seq == 15
+        again.record_vote("poll1", "option_0")
+        asyncio.run(again.flush())
+        apply_vote(recovered, "poll1", "option_0")
+        assert VoteJournal(snapshot_file, journal_file, dict).load() == recovered
+    print("журнал: OK")
+
+
+def crashing_voter(tmp: str, votes: int, ready):
+    """Голосует, дожидается записи журнала и падает без финального снимка."""
+    polls = {}
+    journal = VoteJournal(os.path.join(tmp, "polls.json"), os.path.join(tmp, "polls.journal"),
+                          lambda: polls, flush_interval=0.01, snapshot_every=700)
+    polls.update(journal.load())
+    rnd = random.Random(1)
+
+    async def vote():
+        for _ in range(votes):
+            poll_id, option_key = f"poll{rnd.randrange(3)}", f"option_{rnd.randrange(4)}"
+            apply_vote(polls, poll_id, option_key)
+            journal.record_vote(poll_id, option_key)
+            if rnd.random() < 0.05:
+                await asyncio.sleep(0.01)
+        await journal.flush()
+
+    asyncio.run(vote())
+    # Имитируем оборванную при сбое запись в конце журнала
+    with open(os.path.join(tmp, "polls.journal"), 'a', encoding='utf-8') as f:
+        f.write('{"poll": "poll0", "opt')
+    ready.set()
+    os.kill(os.getpid(), 9)
+
+
+def check_recovery(votes: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        polls = make_polls(3)
+        VoteJournal(os.path.join(tmp, "polls.json"), os.path.join(tmp, "polls.journal"),
+                    lambda: polls).snapshot_sync()
+
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=crashing_voter, args=(tmp, votes, ready))
+        process.start()
+        process.join()
+        assert ready.is_set() and process.exitcode == -9, "процесс должен был упасть после записи журнала"
+
+        journal = VoteJournal(os.path.join(tmp, "polls.json"), os.path.join(tmp, "polls.journal"), dict)
+        recovered = journal.load()
+        total = sum(o["votes"] for poll in recovered.values() for o in poll["options"].values())
+        print(f"голосов отдано: {votes}, восстановлено: {total}, seq: {journal.seq}")
+        assert total == votes, "после восстановления число голосов должно совпадать"
+
+        # Повторная загрузка (журнал уже свернут в снимок) не должна ничего задвоить
+        again = VoteJournal(os.path.join(tmp, "polls.json"), os.path.join(tmp, "polls.journal"), dict).load()
+        assert again == recovered
+    print("OK")
+
+
+# --- Корректность счетчиков при параллельном голосовании ---
+def stress_voter(db_file: str, votes: int, seed: int, result_queue):
+    store = SQLitePollStore(db_file)
+    store.refresh()
+    rnd = random.Random(seed)
+    expected = [0] * 4
+    for _ in range(votes):
+        index = rnd.randrange(4)
+        store.vote("poll0", f"option_{index}")
+        expected[index] += 1
+    result_queue.put(expected)
+
+
+def check_stress(processes: int, votes: int):
+    # Счетчики в памяти меняются только в цикле событий; параллельно голосуют
+    # только воркеры с общим файлом SQLite
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "polls.db")
+        store = SQLitePollStore(db_file)
+        store.load(lambda: make_polls(1)["poll0"])
+        sqlite_votes = max(1, votes // 10)
+        queue = multiprocessing.Queue()
+        started = time.perf_counter()
+        voters = [multiprocessing.Process(target=stress_voter, args=(db_file, sqlite_votes, seed, queue))
+                  for seed in range(processes)]
+        for p in voters:
+            p.start()
+        expected = [0] * 4
+        for _ in voters:
+            for i, value in enumerate(queue.get()):
+                expected[i] += value
+        for p in voters:
+            p.join()
+        elapsed = time.perf_counter() - started
+        totals = store.totals("poll0")
+        print(f"sqlite: {processes} процессов x {sqlite_votes} голосов за {elapsed:.2f} с, итог {totals}")
+        assert totals == expected, f"ожидалось {expected}"
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fanout = sub.add_parser("fanout", help="рассылка изменений голосов подключенным клиентам")
+    fanout.add_argument("--clients", type=int, default=10000)
+    fanout.add_argument("--votes", type=int, default=50000)
+    fanout.add_argument("--polls", type=int, default=10)
+    fanout.add_argument("--rate", type=float, default=10)
+
+    votes = sub.add_parser("votes", help="голосов в секунду с записью на диск")
+    votes.add_argument("--polls", type=int, default=1000)
+    votes.add_argument("--votes", type=int, default=20000)
+
+    recovery = sub.add_parser("recovery", help="проверка восстановления из снимка и журнала после сбоя")
+    recovery.add_argument("--votes", type=int, default=5000)
+
+    stress = sub.add_parser("stress", help="проверка счетчиков при параллельном голосовании")
+    stress.add_argument("--processes", type=int, default=8)
+    stress.add_argument("--votes", type=int, default=20000)
+
+    args = parser.parse_args()
+    if args.command == "fanout":
+        asyncio.run(bench_fanout(args.clients, args.votes, args.polls, args.rate))
+    elif args.command == "votes":
+        bench_votes(args.polls, args.votes)
+    elif args.command == "recovery":
+        check_journal_replay()
+        check_recovery(args.votes)
+    elif args.command == "stress":
+        check_stress(args.processes, args.votes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+import json
+from typing import Dict, Optional, Set
+
+# --- Настройки рассылки ---
+MAX_UPDATES_PER_SECOND = 10  # не больше стольких рассылок в секунду, всплески голосов склеиваются
+SUBSCRIBER_QUEUE_SIZE = 32   # сколько неотправленных сообщений может накопить медленный клиент
+
+# Сообщение для клиента, который отстал: ему нужно заново запросить /api/polls
+RESYNC_MESSAGE = json.dumps({"type": "resync"})
+
+
+class Subscriber:
+    """Очередь сообщений одного подключенного клиента (WebSocket или SSE)."""
+    __slots__ = ("poll_id", "queue")
+
+    def __init__(self, poll_id: Optional[str], queue_size: int):
+        self.poll_id = poll_id  # None - подписка на все опросы
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: выбрасываем накопленное и просим перечитать опросы
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+
+
+class PollBroadcaster:
+    """Pub/sub для результатов опросов.
+
+    cast_vote только отмечает новое число голосов в pending - это O(1) и не зависит
+    от числа клиентов. Фоновая задача не чаще MAX_UPDATES_PER_SECOND раз в секунду
+    забирает накопленные изменения, один раз сериализует их и раскладывает готовую
+    строку по очередям подписчиков. Сообщения содержат итоговые значения счетчиков,
+    поэтому склеивать и пропускать промежуточные обновления безопасно.
+    """
+
+    def __init__(self, max_updates_per_second: float = MAX_UPDATES_PER_SECOND,
+                 queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.interval = 1 / max_updates_per_second
+        self.queue_size = queue_size
+        self._subscribers: Dict[Optional[str], Set[Subscriber]] = {}
+        self._pending_votes: Dict[str, Dict[str, int]] = {}
+        self._pending_events: list = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    # --- Подписка ---
+    def subscribe(self, poll_id: Optional[str] = None) -> Subscriber:
+        self._ensure_running()
+        subscriber = Subscriber(poll_id, self.queue_size)
+        self._subscribers.setdefault(poll_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        group = self._subscribers.get(subscriber.poll_id)
+        if group is not None:
+            group.discard(subscriber)
+            if not group:
+                del self._subscribers[subscriber.poll_id]
+
+    # --- Публикация ---
+    def publish_votes(self, poll_id: str, option_key: str, votes: int):
+        """Запоминает новое значение счетчика; клиенты получат его при следующей рассылке."""
+        self._pending_votes.setdefault(poll_id, {})[option_key] = votes
+        self._ensure_running()
+        self._wakeup.set()
+
+    def publish_event(self, event: dict):
+        """Событие для подписчиков всех опросов (например, создан новый опрос)."""
+        self._pending_events.append(event)
+        self._ensure_running()
+        self._wakeup.set()
+
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            self.flush()
+            # Ограничиваем частоту рассылок: все голоса за это время попадут в следующую
+            await asyncio.sleep(self.interval)
+
+    def flush(self):
+        """Рассылает накопленные изменения. Каждое сообщение сериализуется один раз."""
+        votes, self._pending_votes = self._pending_votes, {}
+        events, self._pending_events = self._pending_events, []
+
+        everyone = self._subscribers.get(None, ())
+        for event in events:
+            message = json.dumps(event, ensure_ascii=False)
+            for subscriber in everyone:
+                subscriber.push(message)
+
+        if not votes:
+            return
+        if everyone:
+            message = json.dumps({"type": "votes", "polls": votes})
+            for subscriber in everyone:
+                subscriber.push(message)
+        for poll_id, options in votes.items():
+            group = self._subscribers.get(poll_id)
+            if group:
+                message = json.dumps({"type": "votes", "polls": {poll_id: options}})
+                for subscriber in group:
+                    subscriber.push(message)
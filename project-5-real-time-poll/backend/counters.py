@@ -0,0 +1,348 @@
+import bisect
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from common.metrics import TimedConnection
+from persistence import VoteJournal
+
+# --- Режим хранения опросов (через переменные окружения) ---
+# POLL_STORAGE=memory - счетчики в памяти процесса + журнал и снимки на диске (один воркер)
+# POLL_STORAGE=sqlite - общий файл SQLite (WAL), можно запускать несколько воркеров
+POLL_STORAGE = os.getenv("POLL_STORAGE", "memory")
+POLLS_DB_FILE = os.getenv("POLLS_DB_FILE", "polls.db")
+
+
+def poll_definition(poll: dict) -> dict:
+    """Опрос без счетчиков: варианты хранят только подписи, голоса лежат в счетчиках."""
+    return {
+        "id": poll["id"],
+        "question": poll["question"],
+        "options": {key: {"label": option["label"]} for key, option in poll["options"].items()},
+        "created_at": poll["created_at"],
+    }
+
+
+def render_poll(definition: dict, counts: List[int], version: int) -> dict:
+    """Собирает опрос в прежнем формате ответа: {"options": {key: {"label", "votes"}}}."""
+    return {
+        "id": definition["id"],
+        "question": definition["question"],
+        "options": {
+            key: {"label": option["label"], "votes": votes}
+            for (key, option), votes in zip(definition["options"].items(), counts)
+        },
+        "created_at": definition["created_at"],
+        "version": version,
+    }
+
+
+class VoteCounters:
+    """Счетчики голосов в памяти процесса.
+
+    На каждый опрос - массив array('q'), где позиция соответствует порядку
+    вариантов. Хранилище в памяти вызывается только из цикла событий (см.
+    run_store в main.py), поэтому блокировки и шарды по потокам не нужны:
+    голос - одно увеличение элемента массива, чтение - копия массива.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, array] = {}
+
+    def add_poll(self, poll_id: str, counts: List[int]):
+        self._counts[poll_id] = array('q', counts)
+
+    def increment(self, poll_id: str, index: int) -> int:
+        """Добавляет голос и возвращает итоговое число голосов за вариант."""
+        counts = self._counts[poll_id]
+        counts[index] += 1
+        return counts[index]
+
+    def totals(self, poll_id: str) -> List[int]:
+        return self._counts[poll_id].tolist()
+
+
+class PollCatalog:
+    """Определения опросов в памяти процесса: индекс вариантов и порядок по created_at.
+
+    Общая часть обоих хранилищ. Порядок опросов хранится отсортированным списком
+    (created_at, poll_id), поэтому страница списка - это срез, а опрос по умолчанию
+    (самый ранний) берется без копирования всех ключей.
+    """
+
+    def __init__(self):
+        self.polls: Dict[str, dict] = {}
+        self._option_index: Dict[str, Dict[str, int]] = {}
+        self._order: List[Tuple[str, str]] = []
+
+    def _register(self, definition: dict):
+        poll_id = definition["id"]
+        self.polls[poll_id] = definition
+        self._option_index[poll_id] = {key: i for i, key in enumerate(definition["options"])}
+        bisect.insort(self._order, (definition["created_at"], poll_id))
+
+    @property
+    def default_poll_id(self) -> Optional[str]:
+        return self._order[0][1] if self._order else None
+
+    def page_ids(self, offset: int, limit: int) -> List[str]:
+        """ID опросов по возрастанию created_at для одной страницы списка."""
+        return [poll_id for _, poll_id in self._order[offset:offset + limit]]
+
+
+class MemoryPollStore(PollCatalog):
+    """Опросы в памяти одного процесса: VoteCounters + журнал и снимки (persistence.py).
+
+    Каждое изменение опроса (создание, голос) получает следующий номер версии.
+    _changed хранит опросы в порядке последнего изменения, поэтому changed_since()
+    идет с конца и останавливается на первой старой версии.
+
+    Все операции - в памяти, а журнал пишется в фоне, поэтому методы
+    вызываются прямо в цикле событий (blocking = False): журнал и версии
+    рассчитаны на один поток.
+    """
+
+    blocking = False
+
+    def __init__(self, snapshot_file: str, journal_file: str):
+        super().__init__()
+        self.counters = VoteCounters()
+        self.journal = VoteJournal(snapshot_file, journal_file, self.render_all)
+        self._version = 0
+        self._changed: "OrderedDict[str, int]" = OrderedDict()
+
+    def _add(self, poll: dict):
+        self._register(poll_definition(poll))
+        self.counters.add_poll(poll["id"], [option["votes"] for option in poll["options"].values()])
+        self._touch(poll["id"])
+
+    def _touch(self, poll_id: str):
+        self._version += 1
+        self._changed[poll_id] = self._version
+        self._changed.move_to_end(poll_id)
+
+    def load(self, make_default_poll: Callable[[], dict]):
+        """Загружает снимок и журнал; если данных на диске нет - создает опрос по умолчанию."""
+        loaded = self.journal.load()
+        if loaded is None:
+            self._add(make_default_poll())
+            self.journal.snapshot_sync()
+            return
+        # Продолжаем нумерацию версий из снимка; все опросы считаются измененными,
+        # так как голоса из журнала версий не несут
+        self._version = max((poll.get("version", 0) for poll in loaded.values()), default=0)
+        for poll in loaded.values():
+            self._add(poll)
+
+    def refresh(self):
+        """Все опросы и так в памяти этого процесса."""
+
+    def create(self, poll: dict):
+        self._add(poll)
+        self.journal.record_create(poll)
+
+    def vote(self, poll_id: str, option_key: str) -> int:
+        votes = self.counters.increment(poll_id, self._option_index[poll_id][option_key])
+        self._touch(poll_id)
+        # На диск голос попадет через журнал в фоне, обработчик не ждет записи файла
+        self.journal.record_vote(poll_id, option_key)
+        return votes
+
+    def current_version(self) -> int:
+        return self._version
+
+    def changed_since(self, since: int) -> List[str]:
+        """ID опросов, измененных после версии since, по возрастанию версии."""
+        result = []
+        for poll_id in reversed(self._changed):
+            if self._changed[poll_id] <= since:
+                break
+            result.append(poll_id)
+        result.reverse()
+        return result
+
+    def render(self, poll_id: str) -> dict:
+        return render_poll(self.polls[poll_id], self.counters.totals(poll_id), self._changed[poll_id])
+
+    def render_many(self, poll_ids: List[str]) -> Dict[str, dict]:
+        return {poll_id: self.render(poll_id) for poll_id in poll_ids}
+
+    def render_all(self) -> Dict[str, dict]:
+        return self.render_many(list(self.polls))
+
+    async def close(self):
+        await self.journal.close()
+
+
+class SQLitePollStore(PollCatalog):
+    """Опросы и счетчики в общем файле SQLite (WAL) для нескольких воркеров.
+
+    Каждый процесс увеличивает только свои строки vote_shards (шард = pid),
+    итог по варианту - сумма шардов. Определения опросов кэшируются в памяти
+    процесса; опросы, созданные другими воркерами, подгружаются в refresh()
+    по rowid, без перечитывания всей таблицы. Номер версии общий для всех
+    воркеров (таблица poll_meta) и меняется в той же транзакции, что и голос.
+
+    Методы выполняют запросы к базе, поэтому обработчики вызывают их в пуле
+    потоков (blocking = True): у каждого потока свое соединение.
+    """
+
+    blocking = True
+
+    def __init__(self, db_file: str = POLLS_DB_FILE):
+        super().__init__()
+        self.db_file = db_file
+        self._last_rowid = 0
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()  # refresh() из разных потоков не должен добавить опрос дважды
+        conn = self._connect()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS polls ("
+            " id TEXT PRIMARY KEY, question TEXT NOT NULL, options TEXT NOT NULL, created_at TEXT NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS vote_shards ("
+            " poll_id TEXT NOT NULL, option_index INTEGER NOT NULL, shard INTEGER NOT NULL,"
+            " votes INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (poll_id, option_index, shard)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS poll_meta (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO poll_meta (id, version) VALUES (0, 0);"
+        )
+        # База могла быть создана до появления версий
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(polls)")]
+        if "version" not in columns:
+            conn.execute("ALTER TABLE polls ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS polls_version ON polls (version)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None, factory=TimedConnection)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], object]):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _insert(self, conn: sqlite3.Connection, poll: dict):
+        labels = [[key, option["label"]] for key, option in poll["options"].items()]
+        conn.execute(
+            "INSERT INTO polls (id, question, options, created_at) VALUES (?, ?, ?, ?)",
+            (poll["id"], poll["question"], json.dumps(labels, ensure_ascii=False), poll["created_at"]),
+        )
+        self._touch(conn, poll["id"])
+
+    def _touch(self, conn: sqlite3.Connection, poll_id: str):
+        version = conn.execute("UPDATE poll_meta SET version = version + 1 RETURNING version").fetchone()[0]
+        conn.execute("UPDATE polls SET version = ? WHERE id = ?", (version, poll_id))
+
+    def load(self, make_default_poll: Callable[[], dict]):
+        """Загружает опросы; в пустой базе создает опрос по умолчанию (один на все воркеры)."""
+        def create_default(conn):
+            if conn.execute("SELECT 1 FROM polls LIMIT 1").fetchone() is None:
+                self._insert(conn, make_default_poll())
+
+        self._transaction(create_default)
+        self.refresh()
+
+    def refresh(self):
+        """Подгружает опросы, созданные после последнего обращения (в том числе другими воркерами)."""
+        with self._refresh_lock:
+            rows = self._connect().execute(
+                "SELECT rowid, id, question, options, created_at FROM polls WHERE rowid > ? ORDER BY rowid",
+                (self._last_rowid,),
+            ).fetchall()
+            for rowid, poll_id, question, options, created_at in rows:
+                self._register({
+                    "id": poll_id,
+                    "question": question,
+                    "options": {key: {"label": label} for key, label in json.loads(options)},
+                    "created_at": created_at,
+                })
+                self._last_rowid = rowid
+
+    def create(self, poll: dict):
+        self._transaction(lambda conn: self._insert(conn, poll))
+        self.refresh()
+
+    def vote(self, poll_id: str, option_key: str) -> int:
+        index = self._option_index[poll_id][option_key]
+
+        def add_vote(conn):
+            conn.execute(
+                "INSERT INTO vote_shards (poll_id, option_index, shard, votes) VALUES (?, ?, ?, 1)"
+                " ON CONFLICT (poll_id, option_index, shard) DO UPDATE SET votes = votes + 1",
+                (poll_id, index, os.getpid()),
+            )
+            self._touch(conn, poll_id)
+            return conn.execute(
+                "SELECT SUM(votes) FROM vote_shards WHERE poll_id = ? AND option_index = ?", (poll_id, index)
+            ).fetchone()[0]
+
+        return self._transaction(add_vote)
+
+    def current_version(self) -> int:
+        return self._connect().execute("SELECT version FROM poll_meta").fetchone()[0]
+
+    def changed_since(self, since: int) -> List[str]:
+        """ID опросов, измененных после версии since, по возрастанию версии."""
+        self.refresh()
+        rows = self._connect().execute(
+            "SELECT id FROM polls WHERE version > ? ORDER BY version", (since,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def totals(self, poll_id: str) -> List[int]:
+        result = [0] * len(self._option_index[poll_id])
+        for index, votes in self._connect().execute(
+            "SELECT option_index, SUM(votes) FROM vote_shards WHERE poll_id = ? GROUP BY option_index", (poll_id,)
+        ):
+            result[index] = votes
+        return result
+
+    def render(self, poll_id: str) -> dict:
+        version = self._connect().execute("SELECT version FROM polls WHERE id = ?", (poll_id,)).fetchone()[0]
+        return render_poll(self.polls[poll_id], self.totals(poll_id), version)
+
+    def render_many(self, poll_ids: List[str]) -> Dict[str, dict]:
+        return {poll_id: self.render(poll_id) for poll_id in poll_ids}
+
+    def render_all(self) -> Dict[str, dict]:
+        # Копия: параллельный refresh() в другом потоке может добавить опрос
+        definitions = list(self.polls.values())
+        counts = {definition["id"]: [0] * len(definition["options"]) for definition in definitions}
+        for poll_id, index, votes in self._connect().execute(
+            "SELECT poll_id, option_index, SUM(votes) FROM vote_shards GROUP BY poll_id, option_index"
+        ):
+            if poll_id in counts:
+                counts[poll_id][index] = votes
+        versions = dict(self._connect().execute("SELECT id, version FROM polls"))
+        return {
+            definition["id"]: render_poll(definition, counts[definition["id"]], versions[definition["id"]])
+            for definition in definitions
+        }
+
+    async def close(self):
+        """SQLite сам сохраняет каждое изменение, дописывать нечего."""
+
+
+def create_poll_store(snapshot_file: str, journal_file: str):
+    """Создает хранилище опросов в зависимости от POLL_STORAGE."""
+    if POLL_STORAGE == "sqlite":
+        return SQLitePollStore()
+    if POLL_STORAGE == "memory":
+        return MemoryPollStore(snapshot_file, journal_file)
+    raise ValueError(f"Неизвестный режим хранилища POLL_STORAGE={POLL_STORAGE!r}")
@@ -1,13 +1,33 @@
-import json
-import os
-from fastapi import FastAPI, HTTPException
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 import uuid
 from datetime import datetime
 
-app = FastAPI()
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория.
+# Путь добавляют только точки входа; counters.py и persistence.py тоже импортируют common
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.metrics import install_metrics
+from common.serialization import FastJSONResponse, SerializedCache
+
+from broadcast import PollBroadcaster
+from counters import create_poll_store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # При остановке сервера дописываем все накопленные голоса на диск
+    await store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- Настройка CORS ---
 origins = ["http://localhost:3001"]
@@ -19,11 +39,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Файл для сохранения данных ---
-POLLS_FILE = "polls.json"
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
+# --- Файлы для сохранения данных ---
+POLLS_FILE = "polls.json"              # периодический снимок всех опросов
+POLLS_JOURNAL_FILE = "polls.journal"   # журнал голосов после последнего снимка
 
-# --- "База данных" в памяти ---
-polls = {}
+# --- Хранилище опросов и счетчиков голосов ---
+# По умолчанию в памяти с журналом на диске; POLL_STORAGE=sqlite - общий
+# для нескольких воркеров файл SQLite (см. counters.py)
+store = create_poll_store(POLLS_FILE, POLLS_JOURNAL_FILE)
+
+# --- Рассылка изменений подключенным клиентам (WebSocket и SSE) ---
+broadcaster = PollBroadcaster()
+SSE_KEEPALIVE_SECONDS = 15
+
+# Полный список опросов сериализуется один раз на версию хранилища:
+# между голосами все клиенты, опрашивающие /api/polls, получают готовые байты
+polls_json = SerializedCache()
 
 # --- Pydantic модели ---
 class PollOption(BaseModel):
@@ -44,43 +81,95 @@ class PollResponse(BaseModel):
     id: str
     question: str
     options: Dict[str, Dict[str, int | str]]
+    created_at: str  # фронтенд показывает дату создания
+    version: int = 0  # номер последнего изменения опроса, см. /api/polls?since=
+
+class PaginatedPolls(BaseModel):
+    polls: List[PollResponse]
+    total: int
+    page: int
+    limit: int
+    total_pages: int
+
+# --- Загрузка данных ---
+def make_default_poll():
+    """Дефолтный опрос, который создается, если сохраненных опросов нет."""
+    default_poll_id = str(uuid.uuid4())
+    return {
+        "id": default_poll_id,
+        "question": "Ваш любимый фреймворк для бэкенда?",
+        "options": {
+            "fastapi": {"label": "FastAPI", "votes": 0},
+            "django": {"label": "Django", "votes": 0},
+            "flask": {"label": "Flask", "votes": 0},
+            "nodejs": {"label": "Node.js (Express)", "votes": 0}
+        },
+        "created_at": datetime.now().isoformat()
+    }
 
-# --- Функции для работы с файлом ---
 def load_polls_from_file():
-    """Загружает опросы из файла при запуске сервера."""
-    global polls
-    if os.path.exists(POLLS_FILE):
-        try:
-            with open(POLLS_FILE, 'r', encoding='utf-8') as f:
-                polls = json.load(f)
-        except Exception as e:
-            print(f"Ошибка при загрузке файла опросов: {e}")
-            polls = {}
-    else:
-        # Создаем дефолтный опрос, если файл не существует
-        default_poll_id = str(uuid.uuid4())
-        polls = {
-            default_poll_id: {
-                "id": default_poll_id,
-                "question": "Ваш любимый фреймворк для бэкенда?",
-                "options": {
-                    "fastapi": {"label": "FastAPI", "votes": 0},
-                    "django": {"label": "Django", "votes": 0},
-                    "flask": {"label": "Flask", "votes": 0},
-                    "nodejs": {"label": "Node.js (Express)", "votes": 0}
-                },
-                "created_at": datetime.now().isoformat()
-            }
-        }
-        save_polls_to_file()
-
-def save_polls_to_file():
-    """Сохраняет опросы в файл."""
+    """Загружает опросы из хранилища при запуске сервера."""
     try:
-        with open(POLLS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(polls, f, ensure_ascii=False, indent=2)
+        store.load(make_default_poll)
     except Exception as e:
-        print(f"Ошибка при сохранении файла опросов: {e}")
+        print(f"Ошибка при загрузке файла опросов: {e}")
+
+def find_poll(poll_id: str):
+    """Определение опроса по ID; опросы других воркеров подгружаются по запросу."""
+    if poll_id not in store.polls:
+        store.refresh()
+    return store.polls.get(poll_id)
+
+async def run_store(function: Callable, *args):
+    """Вызывает хранилище, не блокируя цикл событий.
+
+    SQLite ходит в базу - такие вызовы идут в пул потоков, иначе голосование
+    задерживало бы и рассылку подписчикам WebSocket/SSE. Хранилище в памяти
+    работает прямо в цикле событий: его операции короткие и не потокобезопасны.
+    Рассылка (broadcaster) остается в цикле событий в обоих случаях.
+    """
+    if store.blocking:
+        return await run_in_threadpool(function, *args)
+    return function(*args)
+
+def list_polls(since: Optional[int]) -> FastJSONResponse:
+    store.refresh()
+    version = store.current_version()
+    # Опросы собирает само хранилище, повторная проверка через response_model не нужна
+    if since is None or since > version:
+        # Без since (или с версией из будущего, например после сброса данных) - полный список
+        return polls_json.response(version, store.render_all)
+    return FastJSONResponse(store.render_many(store.changed_since(since)))
+
+def polls_page(page: int, limit: int) -> PaginatedPolls:
+    store.refresh()
+    total = len(store.polls)
+    total_pages = (total + limit - 1) // limit  # Округление вверх
+    poll_ids = store.page_ids((page - 1) * limit, limit)
+    return PaginatedPolls(
+        polls=list(store.render_many(poll_ids).values()),
+        total=total,
+        page=page,
+        limit=limit,
+        total_pages=total_pages
+    )
+
+def render_poll_or_404(poll_id: str) -> dict:
+    if find_poll(poll_id) is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    return store.render(poll_id)
+
+def add_vote(poll_id: str, option_key: str) -> Tuple[int, dict]:
+    """Голос за вариант: (итог по варианту, опрос после голоса)."""
+    poll = find_poll(poll_id)
+    if poll is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    if option_key not in poll["options"]:
+        raise HTTPException(status_code=404, detail="Option not found")
+
+    votes = store.vote(poll_id, option_key)
+    return votes, store.render(poll_id)
 
 # --- Загружаем данные при запуске ---
 load_polls_from_file()
@@ -88,16 +177,22 @@ load_polls_from_file()
 # --- Эндпоинты API ---
 
 @app.get("/api/polls", response_model=Dict[str, PollResponse])
-async def get_all_polls():
-    """Возвращает все опросы."""
-    return polls
+async def get_all_polls(since: Optional[int] = Query(None, ge=0, description="Вернуть только опросы с version больше этого")):
+    """Возвращает все опросы или только изменившиеся после версии since."""
+    return await run_store(list_polls, since)
+
+@app.get("/api/polls/page", response_model=PaginatedPolls)
+async def get_polls_page(
+    page: int = Query(1, ge=1, description="Номер страницы"),
+    limit: int = Query(10, ge=1, le=100, description="Количество опросов на странице")
+):
+    """Возвращает опросы постранично, в порядке создания."""
+    return await run_store(polls_page, page, limit)
 
 @app.get("/api/poll/{poll_id}", response_model=PollResponse)
 async def get_poll_data(poll_id: str):
     """Возвращает конкретный опрос по ID."""
-    if poll_id not in polls:
-        raise HTTPException(status_code=404, detail="Poll not found")
-    return polls[poll_id]
+    return await run_store(render_poll_or_404, poll_id)
 
 @app.post("/api/poll/create", response_model=PollResponse)
 async def create_poll(poll_request: CreatePollRequest):
@@ -120,41 +215,81 @@ async def create_poll(poll_request: CreatePollRequest):
         "created_at": datetime.now().isoformat()
     }
     
-    polls[poll_id] = new_poll
-    save_polls_to_file()
+    await run_store(store.create, new_poll)
+    broadcaster.publish_event({"type": "poll_created", "poll": new_poll})
     
     return new_poll
 
 @app.post("/api/poll/{poll_id}/vote/{option_key}", response_model=PollResponse)
 async def cast_vote(poll_id: str, option_key: str):
     """Принимает голос за один из вариантов конкретного опроса."""
-    if poll_id not in polls:
-        raise HTTPException(status_code=404, detail="Poll not found")
-    
-    poll = polls[poll_id]
-    if option_key not in poll["options"]:
-        raise HTTPException(status_code=404, detail="Option not found")
-
-    poll["options"][option_key]["votes"] += 1
-    save_polls_to_file()
+    votes, poll = await run_store(add_vote, poll_id, option_key)
+    broadcaster.publish_votes(poll_id, option_key, votes)
     return poll
 
 # --- Обратная совместимость со старым API ---
 @app.get("/api/poll", response_model=PollResponse)
 async def get_default_poll():
     """Возвращает первый доступный опрос (для обратной совместимости)."""
-    if not polls:
+    first_poll_id = store.default_poll_id
+    if first_poll_id is None:
         raise HTTPException(status_code=404, detail="No polls available")
     
-    # Возвращаем первый опрос
-    first_poll_id = list(polls.keys())[0]
-    return polls[first_poll_id]
+    # Возвращаем первый (самый ранний) опрос
+    return await run_store(store.render, first_poll_id)
 
 @app.post("/api/poll/vote/{option_key}", response_model=PollResponse)
 async def cast_vote_default(option_key: str):
     """Принимает голос за первый доступный опрос (для обратной совместимости)."""
-    if not polls:
+    first_poll_id = store.default_poll_id
+    if first_poll_id is None:
         raise HTTPException(status_code=404, detail="No polls available")
     
-    first_poll_id = list(polls.keys())[0]
-    return await cast_vote(first_poll_id, option_key)
\ No newline at end of file
+    return await cast_vote(first_poll_id, option_key)
+
+# --- Подписка на обновления вместо опроса сервера ---
+@app.websocket("/api/ws/polls")
+async def polls_websocket(websocket: WebSocket, poll_id: Optional[str] = None):
+    """Отправляет клиенту изменения голосов (все опросы или только poll_id)."""
+    await websocket.accept()
+    subscriber = broadcaster.subscribe(poll_id)
+
+    async def wait_disconnect():
+        # Входящие сообщения клиента не нужны, читаем их только чтобы заметить отключение
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    disconnected = asyncio.ensure_future(wait_disconnect())
+    try:
+        while True:
+            next_message = asyncio.ensure_future(subscriber.queue.get())
+            done, _ = await asyncio.wait({next_message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                next_message.cancel()
+                break
+            await websocket.send_text(next_message.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+@app.get("/api/polls/stream")
+async def polls_event_stream(poll_id: Optional[str] = None):
+    """То же самое через Server-Sent Events (EventSource в браузере)."""
+    async def event_stream():
+        subscriber = broadcaster.subscribe(poll_id)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Комментарий SSE, чтобы прокси не закрывали простаивающее соединение
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from common.metrics import timed
+
+# --- Настройки сохранения ---
+JOURNAL_FLUSH_INTERVAL = 0.05  # как часто (в секундах) дописывать накопленные голоса в журнал
+SNAPSHOT_INTERVAL = 30         # как часто сохранять полный снимок, если были изменения
+SNAPSHOT_EVERY = 10000         # ... или раньше, если в журнале накопилось столько записей
+
+
+def apply_vote(polls: dict, poll_id: str, option_key: str) -> Optional[int]:
+    """Засчитывает голос в словаре опросов. Возвращает новое число голосов или None."""
+    poll = polls.get(poll_id)
+    if poll is None or option_key not in poll["options"]:
+        return None
+    option = poll["options"][option_key]
+    option["votes"] += 1
+    return option["votes"]
+
+
+class VoteJournal:
+    """Отложенная запись (write-behind) опросов на диск.
+
+    Голос сразу попадает в словарь в памяти, а на диск уходит строкой в журнал
+    (append-only, JSON Lines). Фоновая задача раз в JOURNAL_FLUSH_INTERVAL
+    дописывает накопленные строки в отдельном потоке, не блокируя цикл событий.
+    Время от времени весь словарь сохраняется снимком (через временный файл и
+    os.replace), после чего журнал очищается.
+
+    У каждой записи журнала есть порядковый номер seq, а снимок хранит номер
+    последней учтенной записи. При загрузке применяются только записи новее
+    снимка, поэтому сбой между записью снимка и очисткой журнала не приводит
+    к двойному подсчету. Оборванная последняя строка журнала пропускается.
+    """
+
+    def __init__(self, snapshot_file: str, journal_file: str, get_polls: Callable[[], dict],
+                 flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+                 snapshot_interval: float = SNAPSHOT_INTERVAL,
+                 snapshot_every: int = SNAPSHOT_EVERY):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.get_polls = get_polls  # откуда брать актуальный словарь опросов для снимков
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self._snapshot_seq = 0
+        self._last_snapshot = time.monotonic()
+        self._buffer: list = []
+        self._task: Optional[asyncio.Task] = None
+        # Один поток для всех операций с диском: записи идут строго по порядку,
+        # даже если фоновую задачу отменили посреди записи
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="poll-journal")
+
+    # --- Загрузка ---
+    def load(self) -> Optional[dict]:
+        """Читает снимок и применяет к нему записи журнала. None - данных на диске нет."""
+        if not os.path.exists(self.snapshot_file) and not os.path.exists(self.journal_file):
+            return None
+        polls = {}
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if "polls" in data and "journal_seq" in data:
+                polls = data["polls"]
+                self.seq = data["journal_seq"]
+            else:
+                # Старый формат файла - просто словарь опросов
+                polls = data
+        self._snapshot_seq = self.seq
+        if os.path.exists(self.journal_file):
+            self._replay(polls)
+            # Сразу сворачиваем журнал в снимок: новые записи не должны попасть
+            # в файл после оборванной строки
+            self._write_snapshot(self._serialize(polls))
+        return polls
+
+    def _replay(self, polls: dict):
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Запись оборвалась при сбое - все, что дальше, тоже не дописано
+                    break
+                if entry["seq"] <= self._snapshot_seq:
+                    continue
+                if "create" in entry:
+                    poll = entry["create"]
+                    polls[poll["id"]] = poll
+                else:
+                    apply_vote(polls, entry["poll"], entry["option"])
+                self.seq = entry["seq"]
+
+    # --- Запись изменений ---
+    def record_vote(self, poll_id: str, option_key: str):
+        self._append({"poll": poll_id, "option": option_key})
+
+    def record_create(self, poll: dict):
+        self._append({"create": poll})
+
+    def _append(self, entry: dict):
+        self.seq += 1
+        entry["seq"] = self.seq
+        self._buffer.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._ensure_running()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Вызов вне цикла событий (скрипты, загрузка) - допишем при следующем flush()
+                return
+            self._task = loop.create_task(self._writer_loop())
+
+    async def _writer_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            snapshot_due = time.monotonic() - self._last_snapshot > self.snapshot_interval
+            if self.seq - self._snapshot_seq >= self.snapshot_every or (snapshot_due and self.seq != self._snapshot_seq):
+                await self.snapshot()
+
+    async def flush(self):
+        """Дописывает накопленные записи в журнал (в отдельном потоке)."""
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write_lines, lines)
+
+    def _write_lines(self, lines: list):
+        with timed("file", "journal_append"), open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _serialize(self, polls: dict) -> str:
+        # Все записи из буфера учтены в снимке, дописывать их в журнал уже не нужно
+        data = json.dumps({"journal_seq": self.seq, "polls": polls}, ensure_ascii=False)
+        self._buffer = []
+        self._snapshot_seq = self.seq
+        self._last_snapshot = time.monotonic()
+        return data
+
+    async def snapshot(self):
+        """Сохраняет снимок всех опросов и очищает журнал."""
+        # Сериализуем в цикле событий, чтобы словарь не менялся во время dumps,
+        # а на диск пишем в отдельном потоке
+        data = self._serialize(self.get_polls())
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write_snapshot, data)
+
+    def snapshot_sync(self):
+        """Синхронный вариант snapshot() - для запуска сервера и скриптов."""
+        self._write_snapshot(self._serialize(self.get_polls()))
+
+    def _write_snapshot(self, data: str):
+        with timed("file", "snapshot"):
+            tmp_file = self.snapshot_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+            # Снимок уже на диске; записи журнала с seq <= journal_seq при загрузке пропускаются
+            with open(self.journal_file, 'w', encoding='utf-8'):
+                pass
+
+    async def close(self):
+        """Останавливает фоновую запись и сохраняет итоговый снимок."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.snapshot()
@@ -55,13 +55,46 @@ export default function Home() {
     }
   };
 
-  // Основной эффект для поллинга
+  // Загружаем опросы один раз, дальше сервер сам присылает изменения (SSE)
   useEffect(() => {
-    fetchAllPolls(); // Получаем данные при первой загрузке
-    const intervalId = setInterval(fetchAllPolls, 3000); // Опрашиваем сервер каждые 3 секунды
+    fetchAllPolls();
+    const events = new EventSource(`${API_URL}/polls/stream`);
+
+    events.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'votes') {
+        // Приходят только изменившиеся счетчики: { pollId: { optionKey: votes } }
+        setAllPolls(prev => {
+          const next = { ...prev };
+          for (const [pollId, options] of Object.entries(message.polls as Record<string, Record<string, number>>)) {
+            const poll = next[pollId];
+            if (!poll) continue;
+            const updatedOptions = { ...poll.options };
+            for (const [optionKey, votes] of Object.entries(options)) {
+              if (updatedOptions[optionKey]) {
+                updatedOptions[optionKey] = { ...updatedOptions[optionKey], votes };
+              }
+            }
+            next[pollId] = { ...poll, options: updatedOptions };
+          }
+          return next;
+        });
+      } else if (message.type === 'poll_created') {
+        setAllPolls(prev => ({ ...prev, [message.poll.id]: message.poll }));
+      } else if (message.type === 'resync') {
+        fetchAllPolls();
+      }
+    };
+
+    // После переподключения часть изменений могла потеряться - перечитываем опросы
+    let connectedOnce = false;
+    events.onopen = () => {
+      if (connectedOnce) fetchAllPolls();
+      connectedOnce = true;
+    };
 
-    // Очищаем интервал при размонтировании компонента, чтобы избежать утечек памяти
-    return () => clearInterval(intervalId);
+    // Закрываем соединение при размонтировании компонента, чтобы избежать утечек
+    return () => events.close();
   }, []);
 
   const handleVote = async (pollId: string, optionKey: string) => {
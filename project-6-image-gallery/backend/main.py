@@ -1,10 +1,17 @@
 import os
+import sys
 import uuid
 import aiofiles
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List
+from pathlib import Path
+
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.metrics import install_metrics, timed
 
 app = FastAPI()
 
@@ -12,6 +19,12 @@ app = FastAPI()
 origins = ["http://localhost:3001"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
 # --- Путь для сохранения изображений ---
 IMAGE_DIR = "static/images/"
 os.makedirs(IMAGE_DIR, exist_ok=True)
@@ -50,9 +63,10 @@ async def upload_image(file: UploadFile = File(...)):
     # Асинхронно сохраняем файл
     try:
         from aiofiles.threadpool.binary import AsyncBufferedIOBase  # type: ignore
-        async with aiofiles.open(file_path, mode='wb') as out_file:  # type: ignore
-            out_file: AsyncBufferedIOBase
-            await out_file.write(content)
+        with timed("file", "write"):
+            async with aiofiles.open(file_path, mode='wb') as out_file:  # type: ignore
+                out_file: AsyncBufferedIOBase
+                await out_file.write(content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка сохранения файла: {e}")
 
@@ -65,9 +79,10 @@ async def upload_image(file: UploadFile = File(...)):
 async def get_images():
     """Возвращает список URL всех загруженных изображений."""
     try:
-        images = os.listdir(IMAGE_DIR)
-        # Фильтруем, чтобы случайно не отдать не-файлы
-        image_urls = [f"/static/images/{img}" for img in images if os.path.isfile(os.path.join(IMAGE_DIR, img))]
+        with timed("file", "list"):
+            images = os.listdir(IMAGE_DIR)
+            # Фильтруем, чтобы случайно не отдать не-файлы
+            image_urls = [f"/static/images/{img}" for img in images if os.path.isfile(os.path.join(IMAGE_DIR, img))]
         return image_urls
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка чтения директории изображений: {e}")
@@ -87,7 +102,8 @@ async def delete_image(filename: str):
             raise HTTPException(status_code=400, detail="Указанный путь не является файлом.")
         
         # Удаляем файл
-        os.remove(file_path)
+        with timed("file", "delete"):
+            os.remove(file_path)
         return {"message": "Изображение успешно удалено."}
     except HTTPException:
         raise
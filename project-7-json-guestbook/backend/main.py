@@ -1,19 +1,32 @@
 import json
 import uuid
 import os
+import sys
 from datetime import datetime, timezone
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+from pathlib import Path
 import aiofiles
 
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.metrics import install_metrics, timed
+
 app = FastAPI()
 
 # --- CORS ---
 origins = ["http://localhost:3001"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
 DB_FILE = "data/guestbook.json"
 
 # --- Создаем папку data если её нет ---
@@ -44,18 +57,21 @@ class PaginatedResponse(BaseModel):
 async def read_db() -> List[GuestbookEntry]:
     if not os.path.exists(DB_FILE):
         return []
-    async with aiofiles.open(DB_FILE, mode='r', encoding='utf-8') as f:
-        content = await f.read()
-        if not content:
-            return []
-        data = json.loads(content)
-        return [GuestbookEntry(**item) for item in data]
+    with timed("file", "read"):
+        async with aiofiles.open(DB_FILE, mode='r', encoding='utf-8') as f:
+            content = await f.read()
+    if not content:
+        return []
+    data = json.loads(content)
+    return [GuestbookEntry(**item) for item in data]
 
 async def write_db(data: List[GuestbookEntry]):
     # Преобразуем объекты Pydantic в словари для сериализации в JSON
     export_data = [item.model_dump(mode='json') for item in data]
-    async with aiofiles.open(DB_FILE, mode='w', encoding='utf-8') as f:
-        await f.write(json.dumps(export_data, indent=4, ensure_ascii=False))
+    content = json.dumps(export_data, indent=4, ensure_ascii=False)
+    with timed("file", "write"):
+        async with aiofiles.open(DB_FILE, mode='w', encoding='utf-8') as f:
+            await f.write(content)
 
 # --- Эндпоинты API ---
 @app.get("/api/entries", response_model=PaginatedResponse)
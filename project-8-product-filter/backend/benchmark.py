@@ -0,0 +1,273 @@
+"""Бенчмарки фильтрации каталога товаров.
+
+Запуск из папки backend:
+    python benchmark.py filter --products 10000 100000 1000000
+    python benchmark.py filter --engines index columnar
+    python benchmark.py ingest --products 1000000
+    python benchmark.py cache --products 1000000 --requests 2000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+from catalog import CatalogIndex
+from columnar import ColumnarCatalog
+from ingest import CatalogReloader, iter_products
+from query_cache import QueryCache, normalize_query
+
+CATEGORIES = ["Электроника", "Одежда", "Книги", "Дом", "Спорт", "Игрушки", "Сад", "Авто"]
+WORDS = [
+    "смартфон", "ноутбук", "наушники", "футболка", "джинсы", "книга", "часы", "худи",
+    "лампа", "кресло", "мяч", "рюкзак", "конструктор", "шланг", "коврик", "чайник",
+    "alpha", "probook", "soundwave", "chronos", "classic", "pro", "mini", "max",
+]
+
+# Типичные запросы страницы фильтров: (search, category, min_price, max_price, sort)
+QUERIES = [
+    (None, None, None, None, None),
+    (None, "Электроника", None, None, "price_asc"),
+    ("ноут", None, None, None, None),
+    ("soundwave", "Электроника", None, None, None),
+    ("часы", None, 100, 500, "price_desc"),
+    (None, None, 10, 20, "price_asc"),
+    ("ми", "Дом", None, None, None),
+    ("несуществующий", None, None, None, None),
+]
+
+# Только для сверки с прежней фильтрацией: неизвестная сортировка оставляет порядок каталога
+CHECK_QUERIES = QUERIES + [
+    (None, None, None, None, "bogus"),
+    ("ми", None, None, None, "bogus"),
+    (None, None, 10, 20, "bogus"),
+    (None, "Дом", 10, 500, "bogus"),
+]
+
+
+def make_products(count: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i + 1,
+            "name": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rng.randrange(1000)}",
+            "category": rng.choice(CATEGORIES),
+            "price": rng.randrange(100, 200000) / 100,
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_filter(products, search=None, category=None, min_price=None, max_price=None, sort=None):
+    """Прежняя фильтрация: копия списка и последовательные проходы по нему."""
+    filtered_products = products.copy()
+    if category and category.lower() != "all":
+        filtered_products = [p for p in filtered_products if p["category"].lower() == category.lower()]
+    if search:
+        filtered_products = [p for p in filtered_products if search.lower() in p["name"].lower()]
+    if min_price is not None:
+        filtered_products = [p for p in filtered_products if p["price"] >= min_price]
+    if max_price is not None:
+        filtered_products = [p for p in filtered_products if p["price"] <= max_price]
+    if sort == "price_asc":
+        filtered_products.sort(key=lambda x: x["price"])
+    elif sort == "price_desc":
+        filtered_products.sort(key=lambda x: x["price"], reverse=True)
+    return filtered_products
+
+
+def measure(filter_fn, query, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        filter_fn(*query)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+# --- Прежний путь против индекса и колонок на каталогах разного размера ---
+ENGINES = {
+    "index": CatalogIndex,
+    "columnar": ColumnarCatalog,
+}
+
+
+def bench_filter(sizes: List[int], engines: List[str], repeat: int):
+    for count in sizes:
+        tracemalloc.start()
+        products = make_products(count)
+        memory = {"legacy": tracemalloc.get_traced_memory()[0]}
+        tracemalloc.stop()
+        filters = {"legacy": lambda *q: legacy_filter(products, *q)}
+        build_times = {}
+        for name in engines:
+            started = time.perf_counter()
+            catalog = ENGINES[name](products)
+            build_times[name] = time.perf_counter() - started
+            del catalog
+            tracemalloc.start()
+            catalog = ENGINES[name](products)
+            memory[name] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            for query in CHECK_QUERIES:
+                assert catalog.filter(*query) == legacy_filter(products, *query), (name, query)
+            filters[name] = catalog.filter
+
+        print(f"товаров: {count:,}")
+        for name in filters:
+            built = f", построение {build_times[name]:.2f} с" if name in build_times else ""
+            print(f"  {name:10} память {memory[name] / 2**20:8.1f} МБ{built}")
+        print(f"  {'запрос, мс':60}" + "".join(f"{name:>10}" for name in filters))
+        totals = dict.fromkeys(filters, 0.0)
+        for query in QUERIES:
+            line = f"  {str(query):60}"
+            for name, filter_fn in filters.items():
+                ms = measure(filter_fn, query, repeat)
+                totals[name] += ms
+                line += f"{ms:10.2f}"
+            print(line)
+        print(f"  {'в среднем':60}" + "".join(f"{total / len(QUERIES):10.2f}" for total in totals.values()))
+
+
+# --- Потоковая загрузка из файла и пересборка на лету ---
+def write_catalog_files(products: List[dict], directory: str):
+    csv_path = os.path.join(directory, "catalog.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "name", "category", "price"])
+        writer.writeheader()
+        writer.writerows(products)
+    jsonl_path = os.path.join(directory, "catalog.jsonl")
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for product in products:
+            f.write(json.dumps(product, ensure_ascii=False) + "\n")
+    json_path = os.path.join(directory, "catalog.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(products, f, ensure_ascii=False)
+    return csv_path, jsonl_path, json_path
+
+
+def measure_load(load) -> tuple:
+    tracemalloc.start()
+    started = time.perf_counter()
+    catalog = load()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return catalog, elapsed, current, peak
+
+
+async def measure_swap(products: List[dict], path: str):
+    """Запросы во время пересборки: каждый видит целый каталог, старый или новый."""
+    reloader = CatalogReloader(CatalogIndex(products[:1000]), CatalogIndex, path)
+    reloader.reload()
+    seen, worst = set(), 0.0
+    while reloader.loading:
+        started = time.perf_counter()
+        catalog = reloader.catalog
+        catalog.filter(None, "Электроника", 10, 20)
+        seen.add(len(catalog))
+        worst = max(worst, time.perf_counter() - started)
+        await asyncio.sleep(0.001)
+    assert reloader.error is None, reloader.error
+    seen.add(len(reloader.catalog))
+    return reloader.version, sorted(seen), worst * 1000
+
+
+def bench_ingest(count: int):
+    products = make_products(count)
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path, jsonl_path, json_path = write_catalog_files(products, directory)
+        print(f"товаров: {count:,}")
+
+        def load_whole_json(engine):
+            with open(json_path, encoding="utf-8") as f:
+                return engine(json.load(f))
+
+        for engine_name, engine in ENGINES.items():
+            for name, load in (
+                ("JSON целиком", lambda: load_whole_json(engine)),
+                ("CSV потоком", lambda: engine(iter_products(csv_path))),
+                ("JSONL потоком", lambda: engine(iter_products(jsonl_path))),
+            ):
+                catalog, elapsed, current, peak = measure_load(load)
+                assert len(catalog) == count
+                del catalog
+                print(f"  {engine_name:9} {name:14} {elapsed:7.2f} с, "
+                      f"каталог {current / 2**20:7.1f} МБ, пик {peak / 2**20:7.1f} МБ")
+
+        version, sizes, worst_ms = asyncio.run(measure_swap(products, jsonl_path))
+        print(f"  пересборка в фоне: версия {version}, размеры каталога, видимые запросам: {sizes}, "
+              f"худший запрос во время сборки {worst_ms:.1f} мс")
+
+
+# --- Повторяющиеся запросы: страница выдачи с кэшем и без ---
+def visitor_queries(count: int, seed: int = 0) -> list:
+    """Запросы посетителей: популярные повторяются часто (закон Ципфа), плюс длинный хвост."""
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(QUERIES) + 1)]
+    queries = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            # Редкий запрос: случайное слово и диапазон цен, в разном регистре
+            word = rng.choice(WORDS)[:rng.randrange(3, 6)]
+            queries.append((word.upper() if rng.random() < 0.5 else word, None,
+                            rng.randrange(0, 1000), None, rng.choice(["price_asc", None])))
+        else:
+            queries.append(rng.choices(QUERIES, weights)[0])
+    return queries
+
+
+def bench_cache(count: int, requests: int, limit: int):
+    products = make_products(count)
+    queries = visitor_queries(requests)
+    print(f"товаров: {count:,}, запросов: {requests:,}, страница: {limit}")
+    for engine_name, engine in ENGINES.items():
+        catalog = engine(products)
+
+        started = time.perf_counter()
+        for query in queries:
+            catalog.rows(catalog.positions(*query)[:limit])
+        uncached = requests / (time.perf_counter() - started)
+
+        cache = QueryCache()
+        started = time.perf_counter()
+        for query in queries:
+            catalog.rows(cache.positions(catalog, 1, normalize_query(*query))[:limit])
+        cached = requests / (time.perf_counter() - started)
+        stats = cache.stats()
+        print(f"  {engine_name:9} без кэша {uncached:9,.0f} запр/с, с кэшем {cached:9,.0f} запр/с "
+              f"(попаданий {stats['hit_rate']:.0%}, записей {stats['entries']})")
+        del catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    filter_parser = sub.add_parser("filter", help="время запроса и память: прежний путь, индекс, колонки")
+    filter_parser.add_argument("--products", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    filter_parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    filter_parser.add_argument("--repeat", type=int, default=5)
+
+    ingest = sub.add_parser("ingest", help="загрузка каталога из CSV/JSONL и пересборка на лету")
+    ingest.add_argument("--products", type=int, default=1_000_000)
+
+    cache = sub.add_parser("cache", help="пропускная способность повторяющихся запросов с кэшем и без")
+    cache.add_argument("--products", type=int, default=1_000_000)
+    cache.add_argument("--requests", type=int, default=2000)
+    cache.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "filter":
+        bench_filter(args.products, args.engines, args.repeat)
+    elif args.command == "ingest":
+        bench_ingest(args.products)
+    elif args.command == "cache":
+        bench_cache(args.products, args.requests, args.limit)
+
+
+if __name__ == "__main__":
+    main()
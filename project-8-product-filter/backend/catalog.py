@@ -0,0 +1,182 @@
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+NGRAM = 3  # длина n-граммы в индексе поиска по подстроке
+# Движок фильтрации: index (CatalogIndex) или columnar (ColumnarCatalog на NumPy)
+CATALOG_ENGINE = os.getenv("CATALOG_ENGINE", "index")
+
+
+def ngrams(text: str) -> set:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class CatalogIndex:
+    """Каталог товаров с индексами, построенными один раз при загрузке.
+
+    Товар обозначается своей позицией в каталоге, индексы хранят позиции в array:
+    - названия в нижнем регистре и инвертированный индекс n-грамма -> позиции;
+    - категория -> позиции (списки по возрастанию, то есть в порядке каталога);
+    - позиции, отсортированные по цене, и сами цены по возрастанию для bisect.
+
+    Запрос начинается с самого короткого из подходящих списков позиций, а
+    остальные условия проверяются только на нем. Число товаров по категориям
+    (фасеты) и список категорий считаются при загрузке.
+    """
+
+    def __init__(self, products: Iterable[dict]):
+        self.products: List[dict] = []
+        self._names: List[str] = []
+        self._prices = array("d")
+        self._category_codes = array("I")
+        self._category_by_key: Dict[str, int] = {}  # категория в нижнем регистре -> код
+        self._category_names: List[str] = []        # код -> категория, как в каталоге
+        self._by_category: List[array] = []
+        self._ngrams: Dict[str, array] = defaultdict(lambda: array("I"))
+        for product in products:
+            self.add(product)
+        self.finish()
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def add(self, product: dict):
+        if type(product["price"]) is not float:
+            # Ответы отдаются без response_model: цена 550 должна уйти как 550.0,
+            # как раньше через модель Product и как в колоночном движке
+            product = {**product, "price": float(product["price"])}
+        position = len(self.products)
+        self.products.append(product)
+        name = product["name"].lower()
+        self._names.append(name)
+        self._prices.append(product["price"])
+
+        key = product["category"].lower()
+        code = self._category_by_key.get(key)
+        if code is None:
+            code = self._category_by_key[key] = len(self._category_names)
+            self._category_names.append(product["category"])
+            self._by_category.append(array("I"))
+        self._category_codes.append(code)
+        self._by_category[code].append(position)
+
+        index = self._ngrams
+        for gram in ngrams(name):
+            index[gram].append(position)
+
+    def finish(self):
+        """Строит индекс цен и фасеты после добавления всех товаров."""
+        prices = self._prices
+        self._price_order = array("I", sorted(range(len(prices)), key=prices.__getitem__))
+        self._sorted_prices = array("d", (prices[i] for i in self._price_order))
+        self.facets: Dict[str, int] = {
+            name: len(self._by_category[code])
+            for name, code in sorted((name, code) for code, name in enumerate(self._category_names))
+        }
+        self.categories: List[str] = list(self.facets)
+
+    def filter(
+        self,
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> List[dict]:
+        """Те же правила, что у прежней фильтрации списком, но по индексам."""
+        return self.rows(self.positions(search, category, min_price, max_price, sort))
+
+    def rows(self, positions: Sequence[int]) -> List[dict]:
+        """Товары по списку позиций (или срезу range)."""
+        if isinstance(positions, range):
+            return self.products[positions.start:positions.stop]
+        products = self.products
+        return [products[i] for i in positions]
+
+    def positions(
+        self,
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> Sequence[int]:
+        """Позиции подходящих товаров в порядке выдачи."""
+        # Неизвестная сортировка, как и в прежней фильтрации, оставляет порядок каталога
+        by_price = sort in ("price_asc", "price_desc")
+        # Кандидаты: (размер, источник). Источник - список позиций или границы среза по цене.
+        sources = []
+        code = None
+        if category and category.lower() != "all":
+            code = self._category_by_key.get(category.lower())
+            if code is None:
+                return range(0)
+            sources.append((len(self._by_category[code]), self._by_category[code]))
+
+        query = search.lower() if search else None
+        if query and len(query) >= NGRAM:
+            shortest = None
+            for gram in ngrams(query):
+                postings = self._ngrams.get(gram)
+                if postings is None:
+                    return range(0)
+                if shortest is None or len(postings) < len(shortest):
+                    shortest = postings
+            sources.append((len(shortest), shortest))
+
+        price_range = min_price is not None or max_price is not None
+        if price_range:
+            low = bisect_left(self._sorted_prices, min_price) if min_price is not None else 0
+            high = bisect_right(self._sorted_prices, max_price) if max_price is not None else len(self)
+            if low >= high:
+                return range(0)
+            sources.append((high - low, (low, high)))
+
+        prices = self._prices
+        if sources:
+            _, source = min(sources, key=lambda item: item[0])
+        else:
+            source = None
+        if source is None:
+            if not query and not by_price:
+                return range(len(self))
+            # Без ограничивающих индексов: при сортировке начинаем с уже упорядоченных по цене
+            positions = self._price_order.tolist() if by_price else list(range(len(self)))
+        elif isinstance(source, tuple):
+            positions = self._price_order[source[0]:source[1]].tolist()
+            price_range = False  # срез уже в нужном диапазоне цен
+            if not by_price:
+                positions.sort()  # обратно в порядок каталога
+        else:
+            positions = source.tolist()
+
+        # Пересечение с остальными условиями - проверкой по колонкам на коротком списке
+        if code is not None and source is not self._by_category[code]:
+            codes = self._category_codes
+            positions = [i for i in positions if codes[i] == code]
+        if query:
+            names = self._names
+            positions = [i for i in positions if query in names[i]]
+        if price_range:
+            low_price = min_price if min_price is not None else float("-inf")
+            high_price = max_price if max_price is not None else float("inf")
+            positions = [i for i in positions if low_price <= prices[i] <= high_price]
+
+        if sort == "price_asc":
+            positions.sort(key=prices.__getitem__)
+        elif sort == "price_desc":
+            positions.sort(key=prices.__getitem__, reverse=True)
+        return array("I", positions)
+
+
+def create_catalog(products: Iterable[dict]):
+    """Создает каталог в зависимости от CATALOG_ENGINE."""
+    if CATALOG_ENGINE == "columnar":
+        # NumPy нужен только колоночному движку
+        from columnar import ColumnarCatalog
+        return ColumnarCatalog(products)
+    if CATALOG_ENGINE == "index":
+        return CatalogIndex(products)
+    raise ValueError(f"Неизвестный движок каталога CATALOG_ENGINE={CATALOG_ENGINE!r}")
@@ -0,0 +1,134 @@
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+SEPARATOR = "\x00"  # разделитель строк в упакованной таблице названий
+
+
+def pack_strings(strings: List[str]):
+    """Упаковывает строки в одну: строка i - text[offsets[i]:offsets[i + 1] - 1]."""
+    lengths = np.fromiter((len(s) + 1 for s in strings), dtype=np.int64, count=len(strings))
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return SEPARATOR.join(strings) + SEPARATOR, offsets
+
+
+class ColumnarCatalog:
+    """Каталог товаров по колонкам NumPy вместо списка словарей.
+
+    id и цены - массивы int64/float64, категория - целочисленный код, названия
+    упакованы в одну строку с массивом смещений.
+    Фильтр собирает булеву маску из сравнений целых колонок, поиск по подстроке
+    идет по упакованной таблице названий в нижнем регистре, а найденные
+    смещения переводятся в номера строк через searchsorted. Словари товаров
+    создаются только для строк результата.
+    """
+
+    def __init__(self, products: Iterable[dict]):
+        # Колонки копятся в array, а не в списках Python: при потоковой загрузке
+        # памяти нужно почти столько же, сколько готовому каталогу
+        ids, prices, codes = array("q"), array("d"), array("i")
+        names: List[str] = []
+        category_by_key: Dict[str, int] = {}
+        category_names: List[str] = []
+        for product in products:
+            key = product["category"].lower()
+            code = category_by_key.get(key)
+            if code is None:
+                code = category_by_key[key] = len(category_names)
+                category_names.append(product["category"])
+            ids.append(product["id"])
+            prices.append(product["price"])
+            codes.append(code)
+            names.append(product["name"])
+
+        self._ids = np.frombuffer(ids, dtype=np.int64).copy()
+        self._prices = np.frombuffer(prices, dtype=np.float64).copy()
+        self._codes = np.frombuffer(codes, dtype=np.int32).copy()
+        del ids, prices, codes
+        self._category_by_key = category_by_key
+        self._category_names = category_names
+        self._names, self._offsets = pack_strings(names)
+        self._names_lower, self._lower_offsets = self._names.lower(), self._offsets
+        if len(self._names_lower) != len(self._names):
+            # lower() удлинил какие-то названия (например, "İ") - смещения считаем отдельно
+            self._names_lower, self._lower_offsets = pack_strings([name.lower() for name in names])
+        del names
+
+        counts = np.bincount(self._codes, minlength=len(category_names))
+        self.facets: Dict[str, int] = {
+            name: int(counts[code])
+            for name, code in sorted((name, code) for code, name in enumerate(category_names))
+        }
+        self.categories: List[str] = list(self.facets)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _search_mask(self, query: str) -> np.ndarray:
+        """Маска строк, в названии которых есть query (без учета регистра)."""
+        mask = np.zeros(len(self), dtype=bool)
+        if SEPARATOR in query:
+            return mask
+        starts = np.fromiter(
+            (match.start() for match in re.finditer(re.escape(query), self._names_lower)), dtype=np.int64
+        )
+        mask[np.searchsorted(self._lower_offsets, starts, side="right") - 1] = True
+        return mask
+
+    def rows(self, positions: np.ndarray) -> List[dict]:
+        """Собирает словари товаров для найденных строк."""
+        names, categories = self._names, self._category_names
+        return [
+            {"id": product_id, "name": names[start:end - 1], "category": categories[code], "price": price}
+            for product_id, start, end, code, price in zip(
+                self._ids[positions].tolist(),
+                self._offsets[positions].tolist(),
+                self._offsets[positions + 1].tolist(),
+                self._codes[positions].tolist(),
+                self._prices[positions].tolist(),
+            )
+        ]
+
+    def filter(
+        self,
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> List[dict]:
+        """Те же правила, что у CatalogIndex.filter, но масками по колонкам."""
+        return self.rows(self.positions(search, category, min_price, max_price, sort))
+
+    def positions(
+        self,
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> np.ndarray:
+        """Номера подходящих строк в порядке выдачи."""
+        mask = np.ones(len(self), dtype=bool)
+        if category and category.lower() != "all":
+            code = self._category_by_key.get(category.lower())
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            mask &= self._codes == code
+        if min_price is not None:
+            mask &= self._prices >= min_price
+        if max_price is not None:
+            mask &= self._prices <= max_price
+        if search:
+            mask &= self._search_mask(search.lower())
+
+        positions = np.flatnonzero(mask)
+        # Устойчивая сортировка: при равной цене сохраняется порядок каталога
+        if sort == "price_asc":
+            positions = positions[np.argsort(self._prices[positions], kind="stable")]
+        elif sort == "price_desc":
+            positions = positions[np.argsort(-self._prices[positions], kind="stable")]
+        return positions
@@ -0,0 +1,117 @@
+import asyncio
+import csv
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+# --- Настройки загрузки каталога ---
+CATALOG_FILE = os.getenv("CATALOG_FILE")  # CSV или JSONL с товарами; без него - встроенный PRODUCTS_DB
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")    # токен для эндпоинтов администрирования
+
+
+def _product(row: dict, source: str, line: int) -> dict:
+    """Приводит строку файла к словарю товара; при ошибке сообщает, где она."""
+    try:
+        product = {
+            "id": int(row["id"]),
+            "name": str(row["name"]),
+            "category": str(row["category"]),
+            "price": float(row["price"]),
+        }
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f"{source}:{line}: некорректный товар ({error!r})") from None
+    # float() принимает и "nan"/"inf": такая цена ломает сортировку и фильтры по цене
+    if not math.isfinite(product["price"]):
+        raise ValueError(f"{source}:{line}: цена не является конечным числом")
+    if product["price"] < 0:
+        raise ValueError(f"{source}:{line}: отрицательная цена")
+    return product
+
+
+def iter_products(path: str) -> Iterator[dict]:
+    """Читает товары из CSV (с заголовком id,name,category,price) или JSONL по одной строке.
+
+    Файл не загружается в память целиком: каталог строит индексы по мере
+    чтения, так что в памяти одновременно только сам каталог и одна строка.
+    """
+    suffix = Path(path).suffix.lower()
+    with open(path, encoding="utf-8", newline="") as f:
+        if suffix == ".csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield _product(row, path, reader.line_num)
+        elif suffix in (".jsonl", ".ndjson"):
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        raise ValueError(f"{path}:{line_number}: некорректный JSON") from None
+                    yield _product(row, path, line_number)
+        else:
+            raise ValueError(f"Неизвестный формат каталога: {path} (ожидается .csv или .jsonl)")
+
+
+class CatalogReloader:
+    """Текущий каталог и его пересборка в фоне с атомарной заменой.
+
+    Новый каталог строится в отдельном потоке из файла, пока запросы
+    обслуживает прежний. Готовый каталог подменяется одним присваиванием
+    атрибута: обработчик берет ссылку на каталог один раз, поэтому никогда не
+    видит наполовину построенный. При ошибке в файле остается прежний каталог,
+    а ошибка видна в статусе. Номер версии растет с каждой заменой.
+    """
+
+    def __init__(self, catalog, build: Callable[[Iterable[dict]], object], source: Optional[str] = None):
+        self.catalog = catalog
+        self.version = 1
+        self.source = source
+        self.loaded_at = time.time()
+        self.error: Optional[str] = None
+        self._build = build
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loading(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def reload(self) -> bool:
+        """Запускает пересборку из файла source. False, если она уже идет."""
+        if self.loading:
+            return False
+        if not self.source:
+            raise ValueError("Не задан файл каталога (CATALOG_FILE)")
+        self._task = asyncio.create_task(self._rebuild(self.source))
+        return True
+
+    async def _rebuild(self, source: str):
+        loop = asyncio.get_running_loop()
+        try:
+            catalog = await loop.run_in_executor(None, lambda: self._build(iter_products(source)))
+        except (OSError, ValueError, OverflowError, csv.Error) as error:
+            # csv.Error - например, поле CSV длиннее csv.field_size_limit();
+            # OverflowError - id или цена не помещаются в колонки int64/float64
+            self.error = str(error)
+            return
+        except Exception as error:
+            # Ошибка в фоновой задаче иначе потерялась бы: прежний каталог остается, причина - в статусе
+            print(f"Не удалось пересобрать каталог из {source}: {error!r}")
+            self.error = f"{type(error).__name__}: {error}"
+            return
+        self.catalog = catalog
+        self.version += 1
+        self.loaded_at = time.time()
+        self.error = None
+
+    def status(self) -> dict:
+        return {
+            "version": self.version,
+            "products": len(self.catalog),
+            "source": self.source,
+            "loading": self.loading,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+        }
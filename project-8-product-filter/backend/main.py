@@ -1,14 +1,43 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Depends, HTTPException, status, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+import base64
+import binascii
+import secrets
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
 
-app = FastAPI()
+from catalog import create_catalog
+from ingest import ADMIN_TOKEN, CATALOG_FILE, CatalogReloader
+from query_cache import QueryCache, normalize_query
+
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.metrics import install_metrics
+from common.serialization import FastJSONResponse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Большой каталог из файла грузится в фоне, сервер отвечает сразу
+    if CATALOG_FILE:
+        catalogs.reload()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS ---
 origins = ["http://localhost:3001"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
 # --- "База данных" в памяти ---
 PRODUCTS_DB = [
     {"id": 1, "name": "Смартфон Alpha", "category": "Электроника", "price": 550},
@@ -22,6 +51,37 @@ PRODUCTS_DB = [
     {"id": 9, "name": "Худи 'Логотип'", "category": "Одежда", "price": 60},
 ]
 
+# Индексы каталога строятся при загрузке; при пересборке каталог заменяется целиком
+catalogs = CatalogReloader(create_catalog([] if CATALOG_FILE else PRODUCTS_DB), create_catalog, CATALOG_FILE)
+
+# Популярные запросы не фильтруются заново: кэш позиций по каноническому запросу
+query_cache = QueryCache()
+
+def find_products(search, category, min_price, max_price, sort):
+    """Текущий каталог и позиции подходящих товаров в нем."""
+    catalog = catalogs.catalog
+    key = normalize_query(search, category, min_price, max_price, sort)
+    return catalog, query_cache.positions(catalog, catalogs.version, key)
+
+def encode_cursor(version: int, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Курсор -> (версия каталога, смещение)."""
+    try:
+        version, offset = (int(part) for part in base64.urlsafe_b64decode(cursor.encode()).decode().split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+    if offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+    return version, offset
+
+def admin_required(x_admin_token: Optional[str] = Header(None)):
+    """Пропускает только запросы с верным X-Admin-Token (без ADMIN_TOKEN эндпоинты закрыты)."""
+    # Сравниваем байты: compare_digest на строках с не-ASCII символами бросает TypeError
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Доступ запрещен")
+
 # --- Pydantic модели ---
 class Product(BaseModel):
     id: int
@@ -29,6 +89,12 @@ class Product(BaseModel):
     category: str
     price: float
 
+class ProductPage(BaseModel):
+    items: List[Product]
+    total: int
+    limit: int
+    next_cursor: Optional[str] = None
+
 # --- Эндпоинты API ---
 @app.get("/api/products", response_model=List[Product])
 async def filter_products(
@@ -39,33 +105,58 @@ async def filter_products(
     max_price: Optional[float] = Query(None, ge=0, description="Максимальная цена")
 ):
     """Фильтрует продукты по поисковому запросу, категории, цене и сортирует результаты."""
-    filtered_products = PRODUCTS_DB.copy()
+    catalog, positions = find_products(search, category, min_price, max_price, sort)
+    # Товары проверены при загрузке каталога: ответ сериализуется orjson без
+    # повторной проверки каждого элемента через response_model
+    return FastJSONResponse(catalog.rows(positions))
 
-    # Фильтрация по категории
-    if category and category.lower() != "all":
-        filtered_products = [p for p in filtered_products if p["category"].lower() == category.lower()]
-
-    # Фильтрация по поисковому запросу
-    if search:
-        filtered_products = [p for p in filtered_products if search.lower() in p["name"].lower()]
-
-    # Фильтрация по диапазону цен
-    if min_price is not None:
-        filtered_products = [p for p in filtered_products if p["price"] >= min_price]
-    
-    if max_price is not None:
-        filtered_products = [p for p in filtered_products if p["price"] <= max_price]
-
-    # Сортировка
-    if sort == "price_asc":
-        filtered_products.sort(key=lambda x: x["price"])
-    elif sort == "price_desc":
-        filtered_products.sort(key=lambda x: x["price"], reverse=True)
-
-    return filtered_products
+@app.get("/api/products/page", response_model=ProductPage)
+async def filter_products_page(
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    sort: Optional[str] = Query(None, description="Сортировка: price_asc, price_desc"),
+    min_price: Optional[float] = Query(None, ge=0, description="Минимальная цена"),
+    max_price: Optional[float] = Query(None, ge=0, description="Максимальная цена"),
+    limit: int = Query(20, ge=1, le=100, description="Количество товаров на странице"),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы")
+):
+    """То же, что /api/products, но постранично: следующая страница - по next_cursor."""
+    catalog, positions = find_products(search, category, min_price, max_price, sort)
+    offset = 0
+    if cursor:
+        version, offset = decode_cursor(cursor)
+        if version != catalogs.version:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Каталог обновился, запросите первую страницу заново")
+    end = offset + limit
+    return FastJSONResponse({
+        "items": catalog.rows(positions[offset:end]),
+        "total": len(positions),
+        "limit": limit,
+        "next_cursor": encode_cursor(catalogs.version, end) if end < len(positions) else None,
+    })
 
 @app.get("/api/categories", response_model=List[str])
 async def get_categories():
     """Возвращает список уникальных категорий."""
-    categories = sorted(list(set(p["category"] for p in PRODUCTS_DB)))
-    return categories
\ No newline at end of file
+    return catalogs.catalog.categories
+
+@app.get("/api/categories/facets", response_model=Dict[str, int])
+async def get_category_facets():
+    """Возвращает число товаров в каждой категории."""
+    return catalogs.catalog.facets
+
+@app.get("/api/admin/catalog", dependencies=[Depends(admin_required)])
+async def get_catalog_status():
+    """Возвращает версию, размер и состояние загрузки каталога, статистику кэша запросов."""
+    return {**catalogs.status(), "query_cache": query_cache.stats()}
+
+@app.post("/api/admin/catalog/reload", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(admin_required)])
+async def reload_catalog():
+    """Запускает пересборку каталога из CATALOG_FILE в фоне."""
+    try:
+        started = catalogs.reload()
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    if not started:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Пересборка каталога уже идет")
+    return catalogs.status()
@@ -0,0 +1,69 @@
+import os
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))  # сколько разных запросов помнить
+
+QueryKey = Tuple[Optional[str], Optional[str], Optional[float], Optional[float], Optional[str]]
+
+SORTS = ("price_asc", "price_desc")
+
+
+def normalize_query(search=None, category=None, min_price=None, max_price=None, sort=None) -> QueryKey:
+    """Приводит параметры к каноническому виду, не меняя результата фильтрации.
+
+    Поиск и категория сравниваются без учета регистра, "all" и пустые строки
+    означают отсутствие фильтра, неизвестная сортировка игнорируется - так
+    "Электроника" и "электроника" попадают в одну запись кэша.
+    """
+    category = category.lower() if category else None
+    return (
+        search.lower() if search else None,
+        None if category == "all" else category,
+        float(min_price) if min_price is not None else None,
+        float(max_price) if max_price is not None else None,
+        sort if sort in SORTS else None,
+    )
+
+
+class QueryCache:
+    """LRU-кэш результатов фильтра: канонический запрос -> позиции товаров в каталоге.
+
+    Хранятся только позиции (array/range/ndarray движка), а не словари
+    товаров, поэтому запись компактна и из нее дешево вырезать страницу.
+    Кэш привязан к версии каталога: после замены каталога он очищается.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[QueryKey, Sequence[int]]" = OrderedDict()
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def positions(self, catalog, version: int, key: QueryKey) -> Sequence[int]:
+        """Позиции для запроса key: из кэша или фильтром каталога версии version."""
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        positions = self._entries.get(key)
+        if positions is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return positions
+        self.misses += 1
+        positions = catalog.positions(*key)
+        self._entries[key] = positions
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return positions
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
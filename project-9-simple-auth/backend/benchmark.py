@@ -0,0 +1,240 @@
+"""Бенчмарки хранилища сессий.
+
+Запуск из папки backend:
+    python benchmark.py sessions --sessions 1000000
+    python benchmark.py verify --sessions 100000
+    python benchmark.py login --logins 200
+    python benchmark.py ratelimit --keys 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.credentials import PasswordHasher
+from common.ratelimit import SlidingWindowLimiter
+
+from sessions import SessionStore, SignedTokenStore, SQLiteRevocations
+
+LIFETIME = 3600
+
+
+# --- Память и скорость проверки токена на N активных сессиях ---
+def legacy_verify(tokens: dict, token: str):
+    """Прежняя проверка: словарь с ISO-строкой и разбор даты на каждый запрос."""
+    token_data = tokens.get(token)
+    if not token_data:
+        return None
+    created_at = datetime.fromisoformat(token_data["created_at"])
+    if (datetime.now(timezone.utc) - created_at).total_seconds() > LIFETIME:
+        del tokens[token]
+        return None
+    return token_data
+
+
+def measure_verify(verify, tokens: list, lookups: int) -> float:
+    sample = random.Random(0).choices(tokens, k=lookups)
+    started = time.perf_counter()
+    for token in sample:
+        verify(token)
+    return (time.perf_counter() - started) / lookups * 1e9
+
+
+def bench_sessions(count: int, lookups: int):
+    tracemalloc.start()
+    legacy = {}
+    for i in range(count):
+        legacy[str(uuid.uuid4())] = {
+            "username": f"user{i}",
+            "role": "user",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+    legacy_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    legacy_ns = measure_verify(lambda t: legacy_verify(legacy, t), list(legacy), lookups)
+    del legacy
+
+    tracemalloc.start()
+    store = SessionStore(LIFETIME)
+    tokens = [store.create(f"user{i}", "user").token for i in range(count)]
+    store_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    store_ns = measure_verify(store.get, tokens, lookups)
+    store.sliding = True
+    sliding_ns = measure_verify(store.get, tokens, lookups)
+    del store
+
+    # Очистка: все сессии уже просрочены, фоновая задача разбирает кучу целиком
+    expired = SessionStore(0)
+    for i in range(count):
+        expired.create(f"user{i}", "user")
+    started = time.perf_counter()
+    while expired.sweep(10000) == 10000:
+        pass
+    sweep_time = time.perf_counter() - started
+
+    print(f"сессий: {count:,}")
+    print(f"  память, dict + ISO-строки:        {legacy_memory / 2**20:8.1f} МБ")
+    print(f"  память, SessionStore (+ куча):    {store_memory / 2**20:8.1f} МБ")
+    print(f"  проверка токена, прежняя:         {legacy_ns:8.0f} нс")
+    print(f"  проверка токена, SessionStore:    {store_ns:8.0f} нс")
+    print(f"  проверка токена, со скольжением:  {sliding_ns:8.0f} нс")
+    print(f"  очистка всех просроченных:        {sweep_time:8.2f} с (осталось {len(expired)})")
+
+
+# --- Проверок токена в секунду на одно ядро: stateful против stateless ---
+def bench_verify(count: int, lookups: int):
+    print(f"сессий: {count:,}, проверок: {lookups:,}")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Stateless - в той же конфигурации, что в main.py: отзывы в общем файле SQLite
+        revocations = SQLiteRevocations(os.path.join(tmp, "revoked_tokens.db"))
+        stores = (
+            ("stateful (словарь)", SessionStore(LIFETIME)),
+            ("stateless (HMAC)", SignedTokenStore(LIFETIME, secrets.token_bytes(32), revocations)),
+        )
+        for name, store in stores:
+            tokens = [store.create(f"user{i}", "user").token for i in range(count)]
+            # Часть токенов отозвана - как после обычных выходов из системы
+            for token in tokens[::100]:
+                store.revoke(token)
+            ns = measure_verify(store.get, tokens, lookups)
+            print(f"  {name:20} {1e9 / ns:12,.0f} проверок/с ({ns:,.0f} нс)")
+
+
+# --- Пропускная способность входа и задержка цикла событий ---
+async def measure_login(hasher: PasswordHasher, stored: str, logins: int, in_executor: bool):
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        # Задача, которая хочет просыпаться каждую миллисекунду - как другие запросы сервера
+        while not done.is_set():
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    async def login():
+        if in_executor:
+            await hasher.verify(stored, "password")
+        else:
+            hasher.verify_sync(stored, "password")
+        await asyncio.sleep(0)
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick_task
+    lags.sort()
+    return logins / elapsed, lags[len(lags) // 2] * 1000, lags[int(len(lags) * 0.99)] * 1000, lags[-1] * 1000
+
+
+def bench_login(logins: int):
+    hasher = PasswordHasher()
+    stored = hasher.hash_sync("password")
+    print(f"scrypt N={hasher.n}, r={hasher.r}, p={hasher.p}; входов: {logins}")
+    print(f"  {'режим':24} {'входов/с':>10} {'лаг p50, мс':>12} {'p99, мс':>9} {'max, мс':>9}")
+    for name, in_executor in (("в обработчике", False), ("в пуле потоков", True)):
+        rate, p50, p99, worst = asyncio.run(measure_login(hasher, stored, logins, in_executor))
+        print(f"  {name:24} {rate:10.1f} {p50:12.2f} {p99:9.2f} {worst:9.2f}")
+
+
+# --- Ограничитель попыток входа: цена одной проверки и память на N ключей ---
+class SlidingLogLimiter:
+    """Наивный вариант для сравнения: очередь времен всех запросов на каждый ключ, без вытеснения."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._log = {}
+
+    def hit(self, key: str, now: float) -> float:
+        log = self._log.get(key)
+        if log is None:
+            log = self._log[key] = deque()
+        while log and log[0] <= now - self.window:
+            log.popleft()
+        if len(log) >= self.limit:
+            return log[0] + self.window - now
+        log.append(now)
+        return 0.0
+
+
+def bench_ratelimit(keys: int, checks: int):
+    limit, window = 5, 60.0
+    print(f"ключей: {keys:,}, лимит {limit} за {window:.0f} с")
+    for name, make in (
+        ("журнал времен (deque)", lambda: SlidingLogLimiter(limit, window)),
+        ("два счетчика + LRU", lambda: SlidingWindowLimiter(limit, window, max_keys=keys)),
+    ):
+        # Каждый ключ успел сделать несколько попыток - как IP при переборе паролей
+        tracemalloc.start()
+        limiter = make()
+        for attempt in range(3):
+            for i in range(keys):
+                limiter.hit(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", attempt * 10.0)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        sample = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+                  for i in random.Random(0).choices(range(keys), k=checks)]
+        started = time.perf_counter()
+        rejected = 0
+        now = 40.0
+        for key in sample:
+            rejected += limiter.hit(key, now) > 0
+        ns = (time.perf_counter() - started) / checks * 1e9
+        print(f"  {name:24} память {memory / 2**20:8.1f} МБ, проверка {ns:6.0f} нс, отказов {rejected:,}")
+        del limiter
+
+    # Вытеснение: поток уникальных ключей не раздувает память сверх max_keys
+    limiter = SlidingWindowLimiter(limit, window, max_keys=keys // 10)
+    for i in range(keys):
+        limiter.hit(f"spoofed-{i}", 0.0)
+    print(f"  после {keys:,} уникальных ключей при max_keys={keys // 10:,}: хранится {len(limiter):,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sessions = sub.add_parser("sessions", help="память и скорость проверки токенов")
+    sessions.add_argument("--sessions", type=int, default=1_000_000)
+    sessions.add_argument("--lookups", type=int, default=200_000)
+
+    verify = sub.add_parser("verify", help="проверок токена в секунду для stateful и stateless")
+    verify.add_argument("--sessions", type=int, default=100_000)
+    verify.add_argument("--lookups", type=int, default=200_000)
+
+    login = sub.add_parser("login", help="входов в секунду и задержка цикла событий при хэшировании")
+    login.add_argument("--logins", type=int, default=200)
+
+    ratelimit = sub.add_parser("ratelimit", help="цена проверки и память ограничителя попыток входа")
+    ratelimit.add_argument("--keys", type=int, default=1_000_000)
+    ratelimit.add_argument("--checks", type=int, default=200_000)
+
+    args = parser.parse_args()
+    if args.command == "sessions":
+        bench_sessions(args.sessions, args.lookups)
+    elif args.command == "verify":
+        bench_verify(args.sessions, args.lookups)
+    elif args.command == "login":
+        bench_login(args.logins)
+    elif args.command == "ratelimit":
+        bench_ratelimit(args.keys, args.checks)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,81 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from typing import Annotated, Dict, Optional
-import uuid
-from datetime import datetime, timedelta, timezone
+from typing import Annotated
+import asyncio
+import os
+import secrets
+import sys
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from pathlib import Path
 
-app = FastAPI()
+# Общие модули для всех бэкендов лежат в папке common/ в корне репозитория.
+# Путь добавляют только точки входа; sessions.py тоже импортирует common
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.compression import install_compression
+from common.credentials import password_hasher
+from common.metrics import install_metrics
+from common.ratelimit import LoginThrottle
+
+from sessions import Session, SessionStore, SignedTokenStore, SQLiteRevocations
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновая очистка брошенных сессий и, для stateless-токенов, выходы из других воркеров
+    tasks = [asyncio.create_task(TOKENS.run_sweeper())]
+    if isinstance(TOKENS, SignedTokenStore):
+        tasks.append(asyncio.create_task(TOKENS.run_sync()))
+    yield
+    for task in tasks:
+        task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS ---
 origins = ["http://localhost:3001"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# --- Сжатие ответов и ETag (до метрик, чтобы в них попадал размер сжатого ответа) ---
+install_compression(app)
+
+# --- Метрики (/metrics) и профилировщик ---
+install_metrics(app)
+
 # --- Фейковые пользователи с ролями ---
+# Пароли в открытом виде заменяются хэшем scrypt при первом успешном входе
 FAKE_USERS = {
     "user": {"username": "user", "password": "password", "role": "user"},
     "admin": {"username": "admin", "password": "adminpass", "role": "admin"},
 }
 
-# --- Хранилище токенов: token -> {username, created_at} ---
-TOKENS: Dict[str, Dict[str, str]] = {}
+# --- Хранилище токенов ---
+# TOKEN_MODE=stateful  - словарь token -> Session в памяти процесса (по умолчанию)
+# TOKEN_MODE=stateless - подписанные HMAC токены, проверка без общего состояния;
+#                        для нескольких воркеров задайте общий TOKEN_SECRET.
+#                        Отозванные при выходе токены лежат в общем файле
+#                        TOKEN_REVOCATION_DB; другие воркеры видят выход в
+#                        течение REVOCATION_SYNC_INTERVAL (проверка - по памяти)
+TOKEN_MODE = os.getenv("TOKEN_MODE", "stateful")
 TOKEN_LIFETIME = timedelta(hours=1)
+TOKEN_SLIDING_EXPIRATION = False  # True - каждый запрос с токеном продлевает сессию (только stateful)
+TOKEN_REVOCATION_DB = os.getenv("TOKEN_REVOCATION_DB", "revoked_tokens.db")
+
+if TOKEN_MODE == "stateless":
+    TOKEN_SECRET = os.getenv("TOKEN_SECRET")
+    # Без заданного секрета токены действуют только до перезапуска этого процесса
+    secret = TOKEN_SECRET.encode() if TOKEN_SECRET else secrets.token_bytes(32)
+    TOKENS = SignedTokenStore(TOKEN_LIFETIME.total_seconds(), secret, SQLiteRevocations(TOKEN_REVOCATION_DB))
+else:
+    TOKENS = SessionStore(TOKEN_LIFETIME.total_seconds(), sliding=TOKEN_SLIDING_EXPIRATION)
+
+async def run_tokens(function, *args):
+    """Вызывает revoke() хранилища токенов; если оно ходит в базу - в пуле потоков."""
+    if TOKENS.blocking:
+        return await run_in_threadpool(function, *args)
+    return function(*args)
 
 # --- Модель ответа для токена ---
 class Token(BaseModel):
@@ -37,45 +92,41 @@ async def token_verifier(authorization: Annotated[str, Header()]):
             detail="Invalid authentication scheme",
         )
     token = authorization.split(" ")[1]
-    token_data = TOKENS.get(token)
-    if not token_data:
+    # get() сам проверяет срок действия и удаляет устаревший токен
+    # get() не ходит в базу ни в одном режиме - вызываем прямо в цикле событий
+    session = TOKENS.get(token)
+    if not session:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
         )
-    # Проверка времени жизни токена
-    created_at = datetime.fromisoformat(token_data["created_at"])
-    if datetime.now(timezone.utc) - created_at > TOKEN_LIFETIME:
-        # Токен устарел, удаляем
-        del TOKENS[token]
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token expired",
-        )
-    return token_data
+    return session
 
 # --- Зависимость для проверки роли ---
-def admin_required(token_data=Depends(token_verifier)):
-    if token_data["role"] != "admin":
+def admin_required(token_data: Session = Depends(token_verifier)):
+    if token_data.role != "admin":
         raise HTTPException(status_code=403, detail="Требуется роль администратора")
     return token_data
 
 # --- Эндпоинты API ---
 
-@app.post("/api/login", response_model=Token)
+# Ограничение попыток входа по IP и имени пользователя - до проверки пароля
+login_throttle = LoginThrottle()
+
+@app.post("/api/login", response_model=Token, dependencies=[Depends(login_throttle)])
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
     """Проверяет логин/пароль и возвращает токен."""
     user = FAKE_USERS.get(form_data.username)
-    if user and form_data.password == user["password"]:
+    # Хэш считается в отдельном пуле потоков и не блокирует цикл событий.
+    # Для неизвестного имени он тоже считается - по фиктивному хэшу
+    password_ok, new_hash = await password_hasher.verify(user["password"] if user else None, form_data.password)
+    if password_ok:
+        if new_hash:
+            user["password"] = new_hash
         # Генерируем уникальный токен
-        token = str(uuid.uuid4())
-        TOKENS[token] = {
-            "username": user["username"],
-            "role": user["role"],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
+        session = TOKENS.create(user["username"], user["role"])
         return {
-            "access_token": token,
+            "access_token": session.token,
             "token_type": "bearer",
             "role": user["role"],
             "username": user["username"]
@@ -91,16 +142,15 @@ async def logout(authorization: Annotated[str, Header()]):
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authentication scheme")
     token = authorization.split(" ")[1]
-    if token in TOKENS:
-        del TOKENS[token]
+    await run_tokens(TOKENS.revoke, token)
     return {"message": "Вы успешно вышли"}
 
 @app.get("/api/secret-data")
-async def get_secret_data(token_data: Annotated[dict, Depends(token_verifier)]):
+async def get_secret_data(token_data: Annotated[Session, Depends(token_verifier)]):
     """Этот эндпоинт защищен. Доступ возможен только с валидным токеном."""
-    return {"message": f"Привет, {token_data['username']}! Секретное сообщение: 42."}
+    return {"message": f"Привет, {token_data.username}! Секретное сообщение: 42."}
 
 @app.get("/api/admin-data")
-async def get_admin_data(token_data: Annotated[dict, Depends(admin_required)]):
+async def get_admin_data(token_data: Annotated[Session, Depends(admin_required)]):
     """Только для админа."""
-    return {"message": f"Привет, {token_data['username']}! Это данные только для администратора."}
\ No newline at end of file
+    return {"message": f"Привет, {token_data.username}! Это данные только для администратора."}
\ No newline at end of file
@@ -0,0 +1,312 @@
+import abc
+import asyncio
+import base64
+import hashlib
+import hmac
+import heapq
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from common.metrics import TimedConnection
+
+SWEEP_INTERVAL = 60      # как часто (в секундах) фоновая задача удаляет просроченные сессии
+SWEEP_BATCH_SIZE = 10000  # сколько записей кучи разбирать за раз, не отдавая управление циклу событий
+REVOCATION_SYNC_INTERVAL = 1  # как часто (в секундах) подтягивать выходы из других воркеров
+
+
+class Session:
+    """Запись о сессии. __slots__ вместо словаря - заметно меньше памяти на миллионе сессий."""
+    __slots__ = ("token", "username", "role", "expires_at")
+
+    def __init__(self, token: str, username: str, role: str, expires_at: float):
+        self.token = token
+        self.username = username
+        self.role = role
+        self.expires_at = expires_at  # по часам хранилища: time.monotonic() или unix-время
+
+
+class ExpiringStore(abc.ABC):
+    """Общая для хранилищ фоновая очистка: периодически вызывает sweep().
+
+    blocking = True у хранилищ, которые ходят в базу: их методы вызываются
+    в пуле потоков, а не в цикле событий.
+    """
+
+    blocking = False
+
+    @abc.abstractmethod
+    def sweep(self, limit: Optional[int] = None) -> int:
+        """Удаляет просроченные записи (не больше limit). Возвращает, сколько разобрано."""
+
+    async def run_sweeper(self, interval: float = SWEEP_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            # Большую очередь просроченных разбираем частями, чтобы не задерживать запросы
+            while True:
+                if self.blocking:
+                    processed = await asyncio.to_thread(self.sweep, SWEEP_BATCH_SIZE)
+                else:
+                    processed = self.sweep(SWEEP_BATCH_SIZE)
+                if processed != SWEEP_BATCH_SIZE:
+                    break
+                await asyncio.sleep(0)
+
+
+class SessionStore(ExpiringStore):
+    """Хранилище токенов с индексом сроков действия.
+
+    Срок хранится числом по time.monotonic(), поэтому проверка токена - это
+    поиск в словаре и одно сравнение, без разбора дат. Сроки также лежат в
+    куче (expires_at, token): фоновая задача снимает с вершины все просроченные
+    записи, так что брошенные сессии удаляются, даже если токен больше никто
+    не предъявит.
+
+    Записи кучи не удаляются при выходе и не обновляются при продлении сессии:
+    при очистке запись для отсутствующей сессии просто выбрасывается, а для
+    продленной - возвращается в кучу с новым сроком.
+    """
+
+    def __init__(self, lifetime: float, sliding: bool = False):
+        self.lifetime = lifetime
+        self.sliding = sliding  # продлевать сессию при каждой успешной проверке
+        self._sessions: Dict[str, Session] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, username: str, role: str) -> Session:
+        token = str(uuid.uuid4())
+        session = Session(token, username, role, time.monotonic() + self.lifetime)
+        self._sessions[token] = session
+        heapq.heappush(self._expiry_heap, (session.expires_at, token))
+        return session
+
+    def get(self, token: str) -> Optional[Session]:
+        """Возвращает действующую сессию или None (просроченная сразу удаляется)."""
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now > session.expires_at:
+            del self._sessions[token]
+            return None
+        if self.sliding:
+            session.expires_at = now + self.lifetime
+        return session
+
+    def revoke(self, token: str):
+        self._sessions.pop(token, None)
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        """Удаляет просроченные сессии (не больше limit записей кучи). Возвращает, сколько разобрано."""
+        now = time.monotonic()
+        heap = self._expiry_heap
+        processed = 0
+        while heap and heap[0][0] <= now and processed != limit:
+            processed += 1
+            _, token = heapq.heappop(heap)
+            session = self._sessions.get(token)
+            if session is None:
+                continue
+            if session.expires_at > now:
+                # Сессию продлили - возвращаем в кучу с новым сроком
+                heapq.heappush(heap, (session.expires_at, token))
+                continue
+            del self._sessions[token]
+        return processed
+
+
+class MemoryRevocations:
+    """Отозванные id токенов (jti) в памяти процесса - только для одного воркера.
+
+    Сроки лежат в куче: запись удаляется, как только токен истек бы сам.
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, expires_at: int):
+        self._revoked[jti] = expires_at
+        heapq.heappush(self._heap, (expires_at, jti))
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def sync(self) -> int:
+        """Все отзывы и так в этом процессе."""
+        return 0
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        now = time.time()
+        heap = self._heap
+        processed = 0
+        while heap and heap[0][0] <= now and processed != limit:
+            processed += 1
+            _, jti = heapq.heappop(heap)
+            self._revoked.pop(jti, None)
+        return processed
+
+
+class SQLiteRevocations(MemoryRevocations):
+    """Отозванные id токенов в общем файле SQLite (WAL): выход виден всем воркерам.
+
+    Проверка идет только по множеству в памяти процесса, без запроса к базе.
+    Выход в этом воркере попадает в множество сразу, а выходы в других
+    воркерах подтягивает sync() - по id записей больше последнего прочитанного,
+    фоновая задача вызывает ее раз в REVOCATION_SYNC_INTERVAL секунд. Столько
+    же в худшем случае токен еще принимается другими воркерами после выхода.
+    """
+
+    blocking = True  # add, sync и sweep ходят в базу
+
+    def __init__(self, db_file: str):
+        super().__init__()
+        self.db_file = db_file
+        self._local = threading.local()
+        # sync() и sweep() из фоновой задачи и add() из обработчика выхода идут в разных потоках
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._connect().executescript(
+            "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, jti TEXT NOT NULL UNIQUE, expires_at INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at ON revoked_tokens (expires_at);"
+        )
+        self.sync()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None, factory=TimedConnection)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, jti: str, expires_at: int):
+        self._connect().execute(
+            "INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at)
+        )
+        with self._lock:
+            super().add(jti, expires_at)
+
+    def sync(self) -> int:
+        """Подтягивает записи, добавленные после прошлого вызова (в том числе другими воркерами)."""
+        # AUTOINCREMENT: id удаленных очисткой записей не переиспользуются, поэтому
+        # новые записи всегда больше прочитанного максимума
+        rows = self._connect().execute(
+            "SELECT id, jti, expires_at FROM revoked_tokens WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        with self._lock:
+            for _, jti, expires_at in rows:
+                if jti not in self._revoked:
+                    super().add(jti, expires_at)
+            if rows:
+                self._last_id = rows[-1][0]
+        return len(rows)
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        with self._lock:
+            processed = super().sweep(limit)
+        cursor = self._connect().execute(
+            "DELETE FROM revoked_tokens WHERE id IN"
+            " (SELECT id FROM revoked_tokens WHERE expires_at <= ? ORDER BY expires_at LIMIT ?)",
+            (int(time.time()), -1 if limit is None else limit),
+        )
+        return max(processed, cursor.rowcount)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SignedTokenStore(ExpiringStore):
+    """Stateless-токены: имя, роль и срок действия лежат в самом токене, подписанном HMAC-SHA256.
+
+    Проверка токена - только вычисления (подпись и срок), без общего словаря сессий,
+    поэтому токен, выданный одним воркером, принимает любой другой с тем же секретом.
+    Для выхода хранится только множество отозванных id токенов (jti); запись
+    удаляется, как только токен истек бы сам, так что память ограничена числом
+    выходов за время жизни токена. По умолчанию множество в памяти процесса
+    (MemoryRevocations): при нескольких воркерах выход в одном из них не виден
+    остальным, поэтому им нужен общий SQLiteRevocations. В обоих случаях get()
+    не обращается к базе; в базу ходят только revoke() и фоновые sweep()/sync()
+    (blocking относится к ним).
+    """
+
+    def __init__(self, lifetime: float, secret: bytes, revocations=None):
+        self.lifetime = lifetime
+        # Заготовка HMAC с уже обработанным ключом: copy() дешевле, чем hmac.new() на каждый токен
+        self._mac = hmac.new(secret, digestmod=hashlib.sha256)
+        self.revocations = MemoryRevocations() if revocations is None else revocations
+        self.blocking = getattr(self.revocations, "blocking", False)
+
+    def __len__(self) -> int:
+        return len(self.revocations)
+
+    async def run_sync(self, interval: float = REVOCATION_SYNC_INTERVAL):
+        """Периодически подтягивает отозванные токены из общего хранилища."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.blocking:
+                await asyncio.to_thread(self.revocations.sync)
+            else:
+                self.revocations.sync()
+
+    def _sign(self, payload: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(payload)
+        return mac.digest()
+
+    def create(self, username: str, role: str) -> Session:
+        jti = secrets.token_urlsafe(9)
+        expires_at = int(time.time() + self.lifetime)
+        # Имя пользователя последним: в нем может встретиться ":", остальные поля без него
+        payload = f"{jti}:{expires_at}:{role}:{username}".encode()
+        token = f"{_b64encode(payload)}.{_b64encode(self._sign(payload))}"
+        return Session(token, username, role, expires_at)
+
+    def _decode(self, token: str) -> Optional[Tuple[str, int, str, str]]:
+        """Проверяет подпись и возвращает (jti, expires_at, role, username) или None."""
+        payload_part, _, signature_part = token.partition(".")
+        try:
+            payload = _b64decode(payload_part)
+            signature = _b64decode(signature_part)
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        jti, expires_at, role, username = payload.decode().split(":", 3)
+        return jti, int(expires_at), role, username
+
+    def get(self, token: str) -> Optional[Session]:
+        """Возвращает сессию из токена или None, если подпись неверна, срок истек или токен отозван."""
+        claims = self._decode(token)
+        if claims is None:
+            return None
+        jti, expires_at, role, username = claims
+        if time.time() > expires_at or jti in self.revocations:
+            return None
+        return Session(token, username, role, expires_at)
+
+    def revoke(self, token: str):
+        claims = self._decode(token)
+        if claims is None or time.time() > claims[1]:
+            return
+        self.revocations.add(claims[0], claims[1])
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        """Забывает отозванные токены, которые уже истекли сами. Возвращает, сколько разобрано."""
+        return self.revocations.sweep(limit)